@@ -1,61 +1,82 @@
 import os
-import pandas as pd
+import sys
 
 # Rutas base
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 ZEEK_LOGS_DIR = os.path.join(BASE_DIR, "zeek_logs", "ataques")
 INFORME_PATH = os.path.join(ZEEK_LOGS_DIR, "informe_logs_ataques.txt")
 
-# Diccionario para almacenar resumen
-resumen_logs = {}
-
-# Recorre los subdirectorios (uno por cada traza de ataque)
-for subdir in os.listdir(ZEEK_LOGS_DIR):
-    ruta_subdir = os.path.join(ZEEK_LOGS_DIR, subdir)
-    if os.path.isdir(ruta_subdir):
-        for archivo in os.listdir(ruta_subdir):
-            if archivo.endswith(".log"):
-                ruta_log = os.path.join(ruta_subdir, archivo)
-                try:
-                    with open(ruta_log, "r") as f:
-                        lineas = f.readlines()
-                    
-                    # Extrae nombres de columnas desde línea #fields
-                    campos = None
-                    for l in lineas:
-                        if l.startswith("#fields"):
-                            campos = l.strip().split("\t")[1:]
-                            break
-
-                    # Si no se encontraron campos, omitir
-                    if not campos:
-                        continue
-
-                    # Carga en DataFrame
-                    df = pd.read_csv(ruta_log, sep="\t", comment="#", names=campos)
-                    n_registros = len(df)
-                    muestra = df.head(2).to_string(index=False)
-
-                    resumen_logs.setdefault(archivo, {
-                        "total": 0,
-                        "columnas": campos,
-                        "muestras": []
-                    })
-                    resumen_logs[archivo]["total"] += n_registros
-                    resumen_logs[archivo]["muestras"].append(muestra)
-
-                except Exception as e:
-                    print(f"Error leyendo {ruta_log}: {e}")
-
-# Escribe informe en .txt
-with open(INFORME_PATH, "w") as out:
-    for log, info in resumen_logs.items():
-        out.write(f"LOG: {log}\n")
-        out.write(f"Total registros: {info['total']}\n")
-        out.write(f"Columnas: {', '.join(info['columnas'])}\n")
-        out.write("Ejemplo de registros:\n")
-        for muestra in info["muestras"][:3]:
-            out.write(muestra + "\n")
-        out.write("-" * 60 + "\n\n")
-
-print(f"Informe generado en: {INFORME_PATH}")
+# Lector de logs Zeek compartido (TSV o JSON, planos o rotados .gz/.zst)
+sys.path.append(os.path.join(os.path.dirname(BASE_DIR), "dataset"))
+from zeek_reader import map_zeek_logs, iter_zeek_log, zeek_log_type
+
+
+def resumir_log(ruta_log, n_muestra=2):
+    """
+    Resume un log por bloques en el proceso hijo: (columnas, registros, muestra en texto), o None
+    si no tiene campos. Al padre solo vuelve el resumen, no el DataFrame completo.
+    Devuelve el error como texto para no detener el resto.
+    """
+    try:
+        campos, n_registros, muestra = None, 0, None
+        for chunk in iter_zeek_log(ruta_log):
+            if campos is None:
+                campos = list(chunk.columns)
+                muestra = chunk.head(n_muestra).to_string(index=False)
+            n_registros += len(chunk)
+        return None if campos is None else (campos, n_registros, muestra)
+    except Exception as e:
+        return str(e)
+
+
+def main():
+    # Diccionario para almacenar resumen
+    resumen_logs = {}
+
+    # Recorre los subdirectorios (uno por cada traza de ataque)
+    rutas = []
+    for subdir in sorted(os.listdir(ZEEK_LOGS_DIR)):
+        ruta_subdir = os.path.join(ZEEK_LOGS_DIR, subdir)
+        if os.path.isdir(ruta_subdir):
+            for archivo in sorted(os.listdir(ruta_subdir)):
+                if zeek_log_type(archivo):
+                    rutas.append(os.path.join(ruta_subdir, archivo))
+
+    # Descompresión y análisis en paralelo, un proceso por archivo
+    for ruta_log, resumen in map_zeek_logs(rutas, resumir_log, n_jobs=-1):
+        if isinstance(resumen, str):
+            print(f"Error leyendo {ruta_log}: {resumen}")
+            continue
+
+        # Si no se encontraron campos, omitir
+        if resumen is None:
+            continue
+
+        # Los logs rotados (conn.00:00:00-01:00:00.log.gz) se agrupan con su tipo
+        archivo = f"{zeek_log_type(ruta_log)}.log"
+        campos, n_registros, muestra = resumen
+
+        resumen_logs.setdefault(archivo, {
+            "total": 0,
+            "columnas": campos,
+            "muestras": []
+        })
+        resumen_logs[archivo]["total"] += n_registros
+        resumen_logs[archivo]["muestras"].append(muestra)
+
+    # Escribe informe en .txt
+    with open(INFORME_PATH, "w") as out:
+        for log, info in resumen_logs.items():
+            out.write(f"LOG: {log}\n")
+            out.write(f"Total registros: {info['total']}\n")
+            out.write(f"Columnas: {', '.join(info['columnas'])}\n")
+            out.write("Ejemplo de registros:\n")
+            for muestra in info["muestras"][:3]:
+                out.write(muestra + "\n")
+            out.write("-" * 60 + "\n\n")
+
+    print(f"Informe generado en: {INFORME_PATH}")
+
+
+if __name__ == "__main__":
+    main()
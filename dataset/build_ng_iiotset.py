@@ -0,0 +1,253 @@
+import sys
+import os
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.append(os.path.join(project_root, 'features'))
+
+import argparse
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from flow_window_features import capture_window_features, WINDOW_FEATURES
+from zeek_reader import iter_zeek_log, read_zeek_log, find_zeek_logs, map_zeek_logs
+from stratified_sampler import StratifiedReservoirSampler
+from streaming_dedup import StreamingDeduplicator
+
+
+# Distribución objetivo del NG-IIoTset (manteniendo ±5% de variación respecto al original)
+TARGET_DISTRIBUTION = {
+    'normal': 10662000,
+    'backdoor': 30000,
+    'ddos_http': 240000,
+    'ddos_icmp': 2850000,
+    'ddos_tcp_syn': 2100000,
+    'ddos_udp': 3100000,
+    'os_fingerprint': 5000,
+    'mitm_arp_dns': 6000,
+    'password': 1000000,
+    'port_scan': 45000,
+    'ransomware': 25000,
+    'sql_injection': 60000,
+    'upload': 50000,
+    'vuln_scan': 150000,
+    'xss': 25000
+}
+
+# Columnas a extraer de cada tipo de log
+LOG_COLUMNS = {
+    'conn': ['uid', 'ts', 'id.orig_h', 'id.resp_h', 'id.resp_p', 'proto', 'service',
+             'conn_state', 'duration', 'orig_bytes', 'resp_bytes', 'orig_pkts',
+             'resp_pkts', 'ip_proto'],
+    'dns': ['uid', 'query', 'answers', 'qtype_name', 'rcode', 'rcode_name'],
+    'mqtt_connect': ['uid', 'connect_status', 'client_id'],
+    'mqtt_publish': ['uid', 'topic', 'payload'],
+    'modbus': ['uid', 'func', 'pdu_type', 'exception'],
+    'http': ['uid', 'method', 'uri', 'user_agent', 'host',
+             'request_body_len', 'response_body_len', 'status_code'],
+    'files': ['uid', 'fuid', 'source', 'mime_type', 'filename',
+              'seen_bytes', 'total_bytes', 'md5', 'sha1', 'sha256'],
+    'weird': ['uid', 'name'],
+}
+
+ATTACK_MAPPING = {
+    "Backdoor_attack": "backdoor",
+    "DDoS HTTP Flood": "ddos_http",
+    "DDoS ICMP Flood": "ddos_icmp",
+    "DDoS TCP SYN Flood": "ddos_tcp_syn",
+    "DDoS UDP Flood": "ddos_udp",
+    "MITM": "mitm_arp_dns",
+    "OS Fingerprinting": "os_fingerprint",
+    "Password": "password",
+    "Port Scanning": "port_scan",
+    "Ransomware": "ransomware",
+    "SQL injection": "sql_injection",
+    "Uploading": "upload",
+    "Vulnerability scanner": "vuln_scan",
+    "XSS": "xss"
+}
+
+
+def determine_attack_type(file_path: str) -> str:
+    """Tipo de ataque a partir de la ruta del log."""
+    for key, value in ATTACK_MAPPING.items():
+        if key in file_path:
+            return value
+
+    # Si no se encuentra correspondencia, buscar en los nombres de carpeta
+    for part in file_path.split(os.sep):
+        for key, value in ATTACK_MAPPING.items():
+            if key.lower() in part.lower():
+                return value
+
+    return "unknown_attack"
+
+
+def _read_log_for_uids(log_file: str, columns: List[str], uids: pd.Index, chunk_size: int) -> pd.DataFrame:
+    """Registros de un log cuyos uid están en la muestra (se ejecuta en un proceso aparte)."""
+    parts = []
+    for chunk in iter_zeek_log(log_file, columns, chunk_size):
+        if 'uid' not in chunk.columns:
+            break
+        chunk = chunk[chunk['uid'].isin(uids)]
+        if not chunk.empty:
+            parts.append(chunk)
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
+class NGIIoTsetBuilder:
+    """
+    Construcción del NG-IIoTset en streaming: los conn.log se leen por bloques, se les
+    añaden las características de ventana y pasan por un muestreo estratificado con
+    reservorio, de forma que la memoria depende del tamaño de la muestra y no del de los logs.
+    Los demás logs se unen después, solo para los uid muestreados.
+    """
+
+    def __init__(self, normal_logs_dir: str, attack_logs_dir: str,
+                 target_distribution: Optional[Dict[str, int]] = None,
+                 chunk_size: int = 500000, seed: int = 42, window_seconds: float = 60.0,
+                 deduplicate: bool = False, n_jobs: int = 1):
+        """
+        Inicializa el constructor.
+
+        Args:
+            normal_logs_dir: Directorio de logs Zeek de tráfico normal
+            attack_logs_dir: Directorio de logs Zeek de ataques
+            target_distribution: Registros objetivo por tipo de tráfico
+            chunk_size: Filas por bloque de lectura
+            seed: Semilla del muestreo
+            window_seconds: Longitud de la ventana deslizante por host
+            deduplicate: Descartar registros de conexión duplicados exactos antes del muestreo
+            n_jobs: Procesos para descomprimir y analizar logs en paralelo (uno por fichero;
+                    con n_jobs > 1 cada conn.log se carga entero en su proceso)
+        """
+        self.normal_logs_dir = normal_logs_dir
+        self.attack_logs_dir = attack_logs_dir
+        self.target_distribution = target_distribution or TARGET_DISTRIBUTION
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self.window_seconds = window_seconds
+        self.deduplicate = deduplicate
+        self.n_jobs = n_jobs
+
+    def _labeled_conn_files(self) -> List[tuple]:
+        """(ruta, isAttack, typeAttack) de cada conn.log."""
+        files = [(path, 0, 'normal') for path in find_zeek_logs(self.normal_logs_dir, 'conn')]
+        files += [(path, 1, determine_attack_type(path)) for path in find_zeek_logs(self.attack_logs_dir, 'conn')]
+        return files
+
+    def _conn_chunks(self, paths: List[str]):
+        """
+        (ruta, bloques) de cada conn.log en orden. En paralelo, cada fichero se descomprime
+        y analiza entero en un proceso y aquí se divide en los mismos bloques que en secuencial
+        (la ventana ordena por ts dentro de cada bloque, así que el resultado es idéntico).
+        """
+        if self.n_jobs == 1:
+            for path in paths:
+                yield path, iter_zeek_log(path, LOG_COLUMNS['conn'], self.chunk_size)
+            return
+        for path, df in map_zeek_logs(paths, read_zeek_log, LOG_COLUMNS['conn'], self.chunk_size, n_jobs=self.n_jobs):
+            chunks = (df.iloc[start:start + self.chunk_size].copy() for start in range(0, len(df), self.chunk_size))
+            yield path, chunks
+
+    def sample_conn_logs(self) -> pd.DataFrame:
+        """Una pasada sobre los conn.log: etiquetado, ventana temporal y muestreo estratificado."""
+        sampler = StratifiedReservoirSampler(self.target_distribution, seed=self.seed)
+        deduplicator = StreamingDeduplicator() if self.deduplicate else None
+        files = self._labeled_conn_files()
+        print(f"Procesando {len(files)} archivos conn.log...")
+
+        labels = {}
+        for path, is_attack, attack_type in files:
+            if attack_type not in self.target_distribution:
+                print(f"  - {path}: tipo '{attack_type}' fuera de la distribución objetivo, se omite")
+                continue
+            labels[path] = (is_attack, attack_type)
+
+        for path, chunks in self._conn_chunks(list(labels)):
+            is_attack, attack_type = labels[path]
+            if deduplicator is not None:
+                chunks = map(deduplicator.filter, chunks)
+            # Cada captura es un escenario independiente: estado de ventana propio,
+            # que continúa entre los bloques del mismo archivo
+            for chunk in capture_window_features(chunks, self.window_seconds):
+                chunk['isAttack'] = is_attack
+                chunk['typeAttack'] = attack_type
+                sampler.add(chunk)
+
+        if deduplicator is not None:
+            print(f"Registros conn duplicados descartados: {deduplicator.duplicates:,}")
+        print("Aplicando muestreo estratificado personalizado...")
+        return sampler.result()
+
+    def _collect_log(self, log_type: str, uids: pd.Index) -> pd.DataFrame:
+        """
+        Registros de un tipo de log cuyos uid están en la muestra, uno por uid (el primero, como
+        en la unión de stream_merge): con varios registros por uid, la unión posterior multiplicaría
+        las filas de conn ya muestreadas y la distribución final dejaría de ser la objetivo.
+        """
+        paths = find_zeek_logs(self.normal_logs_dir, log_type) + find_zeek_logs(self.attack_logs_dir, log_type)
+        parts = [df for _, df in map_zeek_logs(paths, _read_log_for_uids, LOG_COLUMNS[log_type], uids,
+                                               self.chunk_size, n_jobs=self.n_jobs)
+                 if not df.empty]
+        if parts:
+            return pd.concat(parts, ignore_index=True).drop_duplicates('uid', keep='first')
+        return pd.DataFrame()
+
+    def build(self) -> Optional[pd.DataFrame]:
+        """Construye el dataset final."""
+        final_df = self.sample_conn_logs()
+        if final_df.empty:
+            print("Error: No se pudieron procesar los archivos conn.log")
+            return None
+        print(f"Muestra creada con {len(final_df)} registros (ventana: {WINDOW_FEATURES})")
+
+        uids = pd.Index(final_df['uid'].dropna().unique())
+        for log_type in ['dns', 'mqtt_connect', 'mqtt_publish', 'modbus', 'http', 'files', 'weird']:
+            print(f"Procesando archivos {log_type}.log...")
+            log_df = self._collect_log(log_type, uids)
+            if not log_df.empty:
+                print(f"  - Encontrados {len(log_df)} registros de la muestra, fusionando...")
+                final_df = pd.merge(final_df, log_df, on='uid', how='left')
+
+        print("Realizando limpieza final...")
+        for col in final_df.columns:
+            # Con pandas 3 las columnas de texto son de dtype str, no object
+            if pd.api.types.is_numeric_dtype(final_df[col]):
+                final_df[col] = final_df[col].fillna(0)
+            else:
+                final_df[col] = final_df[col].fillna('unknown')
+
+        final_df = final_df.reset_index(drop=True)
+        print(f"Dataset personalizado creado con {len(final_df)} registros")
+        return final_df
+
+
+def main():
+    """Construcción del NG-IIoTset desde los logs Zeek con memoria acotada."""
+    parser = argparse.ArgumentParser(description="Construcción del NG-IIoTset con muestreo estratificado en streaming")
+    parser.add_argument('--normal-logs', default=os.path.join(project_root, 'Zeek-Pipeline', 'zeek_logs', 'normal'))
+    parser.add_argument('--attack-logs', default=os.path.join(project_root, 'Zeek-Pipeline', 'zeek_logs', 'ataques'))
+    parser.add_argument('--output', default=os.path.join(project_root, 'data', 'NG-IIoTset.csv'))
+    parser.add_argument('--chunk-size', type=int, default=500000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--window-seconds', type=float, default=60.0)
+    parser.add_argument('--dedup', action='store_true', help="Descartar conexiones duplicadas antes del muestreo")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Procesos para descomprimir y analizar logs en paralelo (-1 = todos los núcleos)")
+    args = parser.parse_args()
+
+    builder = NGIIoTsetBuilder(args.normal_logs, args.attack_logs, chunk_size=args.chunk_size,
+                               seed=args.seed, window_seconds=args.window_seconds, deduplicate=args.dedup,
+                               n_jobs=args.jobs)
+    df = builder.build()
+    if df is None:
+        sys.exit(1)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    df.to_csv(args.output, index=False)
+    print(f"Dataset guardado en: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
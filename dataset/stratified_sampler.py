@@ -0,0 +1,180 @@
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class _ClassReservoir:
+    """
+    Reservorio (algoritmo R) de una clase: como máximo `capacity` filas en memoria.
+    Las filas se guardan en un buffer NumPy por columna, reservado por duplicación hasta
+    `capacity` (coste de llenado lineal), y las filas aceptadas se escriben en su hueco sin
+    copiar el resto del reservorio. El DataFrame se construye una sola vez en frame().
+    """
+
+    __slots__ = ('capacity', 'seen', 'size', 'columns', 'dtypes', 'buffers', 'rng')
+
+    def __init__(self, capacity: int, rng: np.random.Generator):
+        self.capacity = capacity
+        self.seen = 0
+        self.size = 0
+        self.columns: Optional[List[str]] = None
+        self.dtypes: Dict[str, object] = {}
+        self.buffers: Dict[str, np.ndarray] = {}
+        self.rng = rng
+
+    def _reserve(self, chunk: pd.DataFrame, needed: int):
+        """Buffers con sitio para `needed` filas (creados con las columnas del primer bloque)."""
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self.dtypes = chunk.dtypes.to_dict()
+            allocated = min(self.capacity, max(needed, 1024))
+            self.buffers = {col: np.empty(allocated, dtype=self._numpy_dtype(chunk[col].dtype))
+                            for col in self.columns}
+            return
+        allocated = len(next(iter(self.buffers.values())))
+        if needed > allocated:
+            allocated = min(self.capacity, max(needed, 2 * allocated))
+            for col, buffer in self.buffers.items():
+                grown = np.empty(allocated, dtype=buffer.dtype)
+                grown[:self.size] = buffer[:self.size]
+                self.buffers[col] = grown
+
+    @staticmethod
+    def _numpy_dtype(dtype) -> np.dtype:
+        """Tipo NumPy del buffer: el de la columna si es nativo, object si no (str, categorías...)."""
+        return dtype if isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM' else np.dtype(object)
+
+    def _write(self, slots: np.ndarray, chunk: pd.DataFrame, rows: np.ndarray):
+        """Escribe las filas `rows` del bloque en los huecos `slots` del reservorio."""
+        for col in self.columns:
+            buffer = self.buffers[col]
+            values = chunk[col].to_numpy()[rows] if col in chunk.columns else np.full(len(rows), np.nan)
+            if values.dtype != buffer.dtype:
+                # Tipos que cambian entre bloques (p.ej. enteros que reciben NaN): se amplía el buffer
+                common = (np.result_type(buffer.dtype, values.dtype)
+                          if buffer.dtype.kind in 'biuf' and values.dtype.kind in 'biuf' else np.dtype(object))
+                if common != buffer.dtype:
+                    buffer = self.buffers[col] = buffer.astype(common)
+            buffer[slots] = values
+
+    def add(self, chunk: pd.DataFrame):
+        n = len(chunk)
+        if n == 0 or self.capacity == 0:
+            self.seen += n
+            return
+
+        # 1. Llenado: las primeras `capacity` filas entran directamente
+        n_fill = min(max(self.capacity - self.seen, 0), n)
+        if n_fill:
+            self._reserve(chunk, self.size + n_fill)
+            self._write(np.arange(self.size, self.size + n_fill), chunk, np.arange(n_fill))
+            self.size += n_fill
+
+        # 2. Sustitución: la fila en la posición global p entra con probabilidad capacity / (p + 1)
+        rest = n - n_fill
+        if rest:
+            positions = np.arange(self.seen + n_fill, self.seen + n, dtype=np.int64)
+            slots = np.floor(self.rng.random(rest) * (positions + 1)).astype(np.int64)
+            accepted = np.flatnonzero(slots < self.capacity)
+            if len(accepted):
+                # Si varias filas del bloque caen en el mismo hueco, gana la última (como en la versión secuencial)
+                slot_values = slots[accepted][::-1]
+                _, last = np.unique(slot_values, return_index=True)
+                accepted = accepted[::-1][last]
+                # Sustitución posicional en su hueco: la muestra no depende del tamaño de bloque
+                self._write(slots[accepted], chunk, n_fill + accepted)
+
+        self.seen += n
+
+    def frame(self) -> Optional[pd.DataFrame]:
+        """Filas del reservorio como DataFrame, con los tipos de columna del origen cuando es posible."""
+        if self.columns is None:
+            return None
+        data = {}
+        for col in self.columns:
+            values = pd.Series(self.buffers[col][:self.size], name=col)
+            dtype = self.dtypes[col]
+            if values.dtype != dtype:
+                try:
+                    values = values.astype(dtype)
+                except (TypeError, ValueError):
+                    pass
+            data[col] = values
+        return pd.DataFrame(data)
+
+
+class StratifiedReservoirSampler:
+    """
+    Muestreo estratificado en streaming: un reservorio por clase con su número objetivo de filas.
+    Procesa los bloques del lector de logs en una sola pasada, con memoria proporcional
+    al tamaño de la muestra (no al del origen) y resultado determinista para una semilla.
+    """
+
+    def __init__(self, target_counts: Dict[str, int], label_column: str = 'typeAttack', seed: int = 42):
+        """
+        Inicializa el muestreador.
+
+        Args:
+            target_counts: Filas objetivo por clase (las clases no incluidas se descartan)
+            label_column: Columna con la clase
+            seed: Semilla
+        """
+        self.target_counts = dict(target_counts)
+        self.label_column = label_column
+        self.seed = seed
+        # Un generador por clase: el resultado no depende de cómo se intercalen las clases
+        self._reservoirs = {
+            label: _ClassReservoir(count, np.random.default_rng([seed, zlib.crc32(label.encode('utf-8'))]))
+            for label, count in self.target_counts.items()
+        }
+
+    def add(self, chunk: pd.DataFrame):
+        """Procesa un bloque de filas etiquetadas."""
+        if chunk.empty:
+            return
+        for label, group in chunk.groupby(self.label_column, sort=False, observed=True):
+            reservoir = self._reservoirs.get(label)
+            if reservoir is not None:
+                reservoir.add(group)
+
+    @property
+    def seen_counts(self) -> Dict[str, int]:
+        """Filas vistas por clase."""
+        return {label: reservoir.seen for label, reservoir in self._reservoirs.items()}
+
+    def result(self) -> pd.DataFrame:
+        """
+        Muestra final. Las clases con menos filas que su objetivo se completan duplicando
+        registros (copias completas más un resto aleatorio), como en la construcción original.
+        """
+        parts = []
+        for label, target in self.target_counts.items():
+            reservoir = self._reservoirs[label]
+            subset = reservoir.frame()
+            print(f"  - {label}: {reservoir.seen} registros originales, objetivo {target}")
+
+            if subset is None or subset.empty:
+                print(f"    ¡Advertencia! No hay registros del tipo {label}")
+                continue
+
+            if reservoir.seen > target:
+                print(f"    Reduciendo mediante muestreo a {len(subset)} registros")
+                parts.append(subset)
+                continue
+
+            factor = target // len(subset)
+            remainder = target % len(subset)
+            if factor > 1:
+                remaining = subset.sample(n=remainder, random_state=self.seed)
+                sampled = pd.concat([subset] * factor + [remaining])
+                print(f"    Aumentando mediante duplicación a {len(sampled)} registros")
+            else:
+                sampled = subset
+                print(f"    Manteniendo los {len(sampled)} registros originales")
+            parts.append(sampled)
+
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,245 @@
+import sys
+import os
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.append(os.path.join(project_root, 'features'))
+
+import heapq
+import argparse
+import itertools
+from collections import deque, OrderedDict
+from typing import Dict, List, Any, Optional, Iterator, Iterable, Sequence, Tuple
+
+import pandas as pd
+
+from flow_window_features import add_window_features, SlidingWindowAggregator
+from zeek_reader import iter_zeek_log, find_zeek_logs
+from build_ng_iiotset import LOG_COLUMNS
+
+
+# Logs de protocolo que se unen a conn por uid
+PROTOCOL_LOGS = ('modbus', 'mqtt_connect', 'mqtt_publish')
+
+
+def reorder_stream(events: Iterable[Tuple], tolerance: float, lookahead: int) -> Iterator[Tuple]:
+    """
+    Reordena por ts un flujo casi ordenado con un buffer acotado (heap): un evento sale cuando
+    el flujo ya ha avanzado `tolerance` segundos más allá de él, o cuando el buffer supera
+    `lookahead` eventos. Zeek escribe cada conexión al cerrarla, pero su ts es el de inicio.
+
+    Args:
+        events: Tuplas (ts, ...) con un contador único en la segunda posición
+        tolerance: Desorden tolerado en segundos
+        lookahead: Eventos máximos en el buffer
+    """
+    heap: List[Tuple] = []
+    max_ts = float('-inf')
+    for event in events:
+        heapq.heappush(heap, event)
+        if event[0] > max_ts:
+            max_ts = event[0]
+        while heap and (heap[0][0] <= max_ts - tolerance or len(heap) > lookahead):
+            yield heapq.heappop(heap)
+    while heap:
+        yield heapq.heappop(heap)
+
+
+class MultiSensorMerger:
+    """
+    Fusión k-way ordenada por ts de los logs Zeek de varios sensores: cada log de cada sensor
+    se reordena con un buffer acotado y se corrige su desfase de reloj; los flujos resultantes
+    se fusionan con un heap en un único flujo temporal. Los registros de protocolo (modbus, mqtt)
+    se unen a su conexión por uid dentro de una ventana temporal, y las conexiones salen en orden
+    con las características de ventana calculadas sobre el flujo conjunto (el mismo agregador que
+    en inferencia), algo que no es posible concatenando los archivos de cada sensor.
+    """
+
+    def __init__(self, sensor_dirs: Dict[str, str], protocol_logs: Sequence[str] = PROTOCOL_LOGS,
+                 clock_offsets: Optional[Dict[str, float]] = None, skew_tolerance: float = 5.0,
+                 lookahead: int = 10000, join_window: float = 60.0, max_pending: int = 200000,
+                 chunk_size: int = 100000, window_seconds: float = 60.0,
+                 aggregator: Optional[SlidingWindowAggregator] = None):
+        """
+        Inicializa la fusión.
+
+        Args:
+            sensor_dirs: Directorio de logs de cada sensor (nombre → ruta)
+            protocol_logs: Tipos de log a unir a conn por uid
+            clock_offsets: Segundos a sumar al ts de cada sensor (desfase de reloj conocido)
+            skew_tolerance: Desorden tolerado dentro de cada log y entre sensores (segundos)
+            lookahead: Eventos máximos en el buffer de reordenación de cada log
+            join_window: Segundos que una conexión espera a sus registros de protocolo
+            max_pending: Conexiones máximas esperando la unión (cota de memoria)
+            chunk_size: Filas por bloque de lectura
+            window_seconds: Ventana de las características por host
+            aggregator: Agregador de ventana a continuar (p.ej. el del pipeline en vivo)
+        """
+        self.sensor_dirs = dict(sensor_dirs)
+        self.protocol_logs = tuple(protocol_logs)
+        self.clock_offsets = dict(clock_offsets or {})
+        self.skew_tolerance = skew_tolerance
+        self.lookahead = lookahead
+        self.join_window = join_window
+        self.max_pending = max_pending
+        self.chunk_size = chunk_size
+        self.aggregator = aggregator or SlidingWindowAggregator(window_seconds)
+        self.columns = LOG_COLUMNS['conn'] + ['sensor'] + [
+            col for log_type in self.protocol_logs for col in LOG_COLUMNS[log_type] if col != 'uid'
+        ]
+        self._seq = itertools.count()
+        self.stats = {'conn': 0, 'protocol': 0, 'late': 0, 'joined': 0, 'unmatched': 0, 'max_pending': 0}
+
+    def _log_events(self, sensor: str, log_type: str) -> Iterator[Tuple]:
+        """Eventos (ts, seq, tipo, registro) de un tipo de log de un sensor, en orden de archivo."""
+        columns = LOG_COLUMNS[log_type] if log_type == 'conn' else ['ts'] + LOG_COLUMNS[log_type]
+        offset = self.clock_offsets.get(sensor, 0.0)
+        for path in find_zeek_logs(self.sensor_dirs[sensor], log_type):
+            for chunk in iter_zeek_log(path, columns, self.chunk_size):
+                if 'ts' not in chunk.columns or 'uid' not in chunk.columns:
+                    break
+                chunk = chunk[chunk['ts'].notna()]
+                ts = chunk['ts'].to_numpy(dtype=float) + offset
+                records = chunk.to_dict('records')
+                for t, record in zip(ts.tolist(), records):
+                    record['ts'] = t
+                    if log_type == 'conn':
+                        record['sensor'] = sensor
+                    yield t, next(self._seq), log_type, record
+
+    def _streams(self) -> List[Iterator[Tuple]]:
+        """Un flujo reordenado por (sensor, tipo de log)."""
+        streams = []
+        for sensor in self.sensor_dirs:
+            for log_type in ('conn',) + self.protocol_logs:
+                streams.append(reorder_stream(self._log_events(sensor, log_type),
+                                              self.skew_tolerance, self.lookahead))
+        return streams
+
+    def iter_events(self) -> Iterator[Tuple]:
+        """Eventos de todos los sensores y logs fusionados por ts (heap k-way)."""
+        last_ts = float('-inf')
+        for event in heapq.merge(*self._streams()):
+            ts = event[0]
+            if ts < last_ts - self.skew_tolerance:
+                # Fuera de la tolerancia: se procesa igual (el agregador admite desorden leve)
+                self.stats['late'] += 1
+            elif ts > last_ts:
+                last_ts = ts
+            yield event
+
+    def iter_joined(self) -> Iterator[Dict[str, Any]]:
+        """
+        Registros conn en orden de ts con los campos de sus registros de protocolo (por uid).
+        Cada conexión espera join_window segundos de flujo a sus registros; de varios registros
+        del mismo tipo y uid se conserva el primero. Los registros de protocolo anteriores a su
+        conexión (desfase entre sensores) esperan también join_window segundos.
+        """
+        pending: "deque[Dict[str, Any]]" = deque()
+        pending_by_uid: Dict[str, Dict[str, Any]] = {}
+        orphans: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        stats = self.stats
+
+        def attach(conn: Dict[str, Any], log_type: str, record: Dict[str, Any]):
+            joined = conn.setdefault('_joined', set())
+            if log_type in joined:
+                return
+            joined.add(log_type)
+            for key, value in record.items():
+                if key not in ('uid', 'ts'):
+                    conn.setdefault(key, value)
+            stats['joined'] += 1
+
+        def release(conn: Dict[str, Any]) -> Dict[str, Any]:
+            if pending_by_uid.get(conn['uid']) is conn:
+                del pending_by_uid[conn['uid']]
+            conn.pop('_joined', None)
+            return conn
+
+        for ts, _, log_type, record in self.iter_events():
+            uid = record.get('uid')
+            if log_type == 'conn':
+                stats['conn'] += 1
+                orphan = orphans.pop(uid, None)
+                if orphan is not None:
+                    for orphan_type, orphan_record in orphan[1].items():
+                        attach(record, orphan_type, orphan_record)
+                pending.append(record)
+                pending_by_uid[uid] = record
+                stats['max_pending'] = max(stats['max_pending'], len(pending))
+            else:
+                stats['protocol'] += 1
+                conn = pending_by_uid.get(uid)
+                if conn is not None:
+                    attach(conn, log_type, record)
+                else:
+                    orphan = orphans.get(uid)
+                    if orphan is None:
+                        orphans[uid] = orphan = (ts, {})
+                    orphan[1].setdefault(log_type, record)
+
+            while pending and (pending[0]['ts'] + self.join_window <= ts or len(pending) > self.max_pending):
+                yield release(pending.popleft())
+            cutoff = ts - self.join_window
+            while orphans:
+                uid, (orphan_ts, _) = next(iter(orphans.items()))
+                if orphan_ts >= cutoff:
+                    break
+                del orphans[uid]
+                stats['unmatched'] += 1
+
+        while pending:
+            yield release(pending.popleft())
+        stats['unmatched'] += len(orphans)
+
+    def iter_frames(self, batch_size: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        Flujo fusionado por bloques de batch_size conexiones, con las características de ventana.
+        Los bloques salen ya ordenados, así que el resultado es el mismo que actualizando
+        el agregador registro a registro.
+        """
+        batch = []
+        for record in self.iter_joined():
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield self._frame(batch)
+                batch = []
+        if batch:
+            yield self._frame(batch)
+
+    def _frame(self, batch: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Bloque con las mismas columnas siempre (NaN si no hubo registro de protocolo)."""
+        df = pd.DataFrame.from_records(batch, columns=self.columns)
+        return add_window_features(df, aggregator=self.aggregator)
+
+
+def main():
+    """Fusiona los logs de varios sensores en un único CSV ordenado por ts."""
+    parser = argparse.ArgumentParser(description="Fusión k-way ordenada por ts de logs Zeek de varios sensores")
+    parser.add_argument('--sensor', action='append', required=True, metavar='NOMBRE=DIRECTORIO',
+                        help="Directorio de logs de un sensor (repetible)")
+    parser.add_argument('--offset', action='append', default=[], metavar='NOMBRE=SEGUNDOS',
+                        help="Desfase de reloj a sumar al ts de un sensor")
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--skew-tolerance', type=float, default=5.0)
+    parser.add_argument('--join-window', type=float, default=60.0)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    sensor_dirs = dict(item.split('=', 1) for item in args.sensor)
+    offsets = {name: float(value) for name, value in (item.split('=', 1) for item in args.offset)}
+    merger = MultiSensorMerger(sensor_dirs, clock_offsets=offsets, skew_tolerance=args.skew_tolerance,
+                               join_window=args.join_window)
+
+    first = True
+    for frame in merger.iter_frames(args.batch_size):
+        frame.to_csv(args.output, mode='w' if first else 'a', header=first, index=False)
+        first = False
+
+    stats = merger.stats
+    print(f"Conexiones: {stats['conn']} | registros de protocolo unidos: {stats['joined']}/{stats['protocol']} "
+          f"| sin conexión: {stats['unmatched']} | fuera de tolerancia: {stats['late']}")
+    print(f"Flujo fusionado guardado en: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
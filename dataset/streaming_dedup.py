@@ -0,0 +1,171 @@
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def row_fingerprints(df: pd.DataFrame) -> np.ndarray:
+    """
+    Huella de 64 bits por fila sobre todas las columnas (sin el índice).
+    Las columnas categóricas se resumen por valor, no por código, así que la huella
+    es estable entre bloques con categorías distintas, y las numéricas como float64
+    (un bloque con NaN lee como float la misma columna que otro lee como entero).
+    """
+    numeric = [col for col in df.columns
+               if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+               and df[col].dtype != np.float64]
+    if numeric:
+        df = df.astype({col: np.float64 for col in numeric})
+    return pd.util.hash_pandas_object(df, index=False).to_numpy(dtype=np.uint64)
+
+
+class StreamingDeduplicator:
+    """
+    Eliminación de filas duplicadas exactas en una sola pasada por bloques.
+    Guarda solo las huellas de 64 bits ya vistas (array ordenado, ~8 bytes por fila única),
+    con un filtro de Bloom opcional delante para evitar búsquedas de filas nuevas.
+    La probabilidad de colisión de huellas es despreciable (~n²/2⁶⁵ para n filas únicas).
+    """
+
+    def __init__(self, bloom_bits: int = 0, bloom_hashes: int = 4, merge_threshold: int = 1 << 20):
+        """
+        Inicializa el deduplicador.
+
+        Args:
+            bloom_bits: Tamaño del filtro de Bloom en bits (0 = sin filtro)
+            bloom_hashes: Número de funciones hash del filtro
+            merge_threshold: Huellas pendientes acumuladas antes de fusionarlas en el array ordenado
+        """
+        self.merge_threshold = merge_threshold
+        self._seen = np.empty(0, dtype=np.uint64)
+        self._pending: List[np.ndarray] = []  # arrays ordenados aún sin fusionar
+        self._pending_size = 0
+
+        self.bloom_hashes = bloom_hashes
+        self._bloom_size = np.uint64(bloom_bits) if bloom_bits > 0 else None
+        self._bloom = np.zeros((bloom_bits + 7) // 8, dtype=np.uint8) if bloom_bits > 0 else None
+
+        self.rows_in = 0
+        self.rows_out = 0
+
+    @property
+    def duplicates(self) -> int:
+        """Filas descartadas hasta ahora."""
+        return self.rows_in - self.rows_out
+
+    @property
+    def unique_rows(self) -> int:
+        return len(self._seen) + self._pending_size
+
+    @property
+    def memory_bytes(self) -> int:
+        """Memoria del conjunto de huellas (y del filtro de Bloom)."""
+        bloom = self._bloom.nbytes if self._bloom is not None else 0
+        return self._seen.nbytes + sum(p.nbytes for p in self._pending) + bloom
+
+    def _bloom_positions(self, fingerprints: np.ndarray) -> np.ndarray:
+        """Posiciones del filtro por huella (doble hashing: h1 + i·h2)."""
+        h1 = fingerprints
+        h2 = (fingerprints >> np.uint64(32)) | np.uint64(1)
+        i = np.arange(self.bloom_hashes, dtype=np.uint64)[:, None]
+        with np.errstate(over='ignore'):
+            return (h1[None, :] + i * h2[None, :]) % self._bloom_size
+
+    def _bloom_contains(self, fingerprints: np.ndarray) -> np.ndarray:
+        positions = self._bloom_positions(fingerprints)
+        bits = (self._bloom[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=0).astype(bool)
+
+    def _bloom_add(self, fingerprints: np.ndarray):
+        positions = self._bloom_positions(fingerprints).ravel()
+        np.bitwise_or.at(self._bloom, positions >> np.uint64(3),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+
+    @staticmethod
+    def _in_sorted(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+        if len(sorted_values) == 0:
+            return np.zeros(len(values), dtype=bool)
+        pos = np.searchsorted(sorted_values, values)
+        pos[pos == len(sorted_values)] = 0
+        return sorted_values[pos] == values
+
+    def _contains(self, fingerprints: np.ndarray) -> np.ndarray:
+        """Máscara de huellas ya vistas."""
+        found = np.zeros(len(fingerprints), dtype=bool)
+        candidates = np.arange(len(fingerprints))
+        if self._bloom is not None:
+            candidates = candidates[self._bloom_contains(fingerprints)]
+        if len(candidates) == 0:
+            return found
+        values = fingerprints[candidates]
+        hit = self._in_sorted(self._seen, values)
+        for pending in self._pending:
+            hit |= self._in_sorted(pending, values)
+        found[candidates] = hit
+        return found
+
+    def _add(self, fingerprints: np.ndarray):
+        """Registra huellas nuevas (únicas y no vistas); fusiona cuando hay suficientes pendientes."""
+        if len(fingerprints) == 0:
+            return
+        self._pending.append(np.sort(fingerprints))
+        self._pending_size += len(fingerprints)
+        if self._bloom is not None:
+            self._bloom_add(fingerprints)
+        if self._pending_size >= self.merge_threshold:
+            self._seen = np.sort(np.concatenate([self._seen, *self._pending]))
+            self._pending = []
+            self._pending_size = 0
+
+    def unique_mask(self, fingerprints: np.ndarray) -> np.ndarray:
+        """
+        Máscara de filas a conservar de un bloque (primera aparición de cada huella,
+        teniendo en cuenta los bloques anteriores) y registro de las nuevas.
+        """
+        keep = np.zeros(len(fingerprints), dtype=bool)
+        if len(fingerprints) == 0:
+            return keep
+        uniques, first = np.unique(fingerprints, return_index=True)
+        new = ~self._contains(uniques)
+        keep[first[new]] = True
+        self._add(uniques[new])
+        self.rows_in += len(fingerprints)
+        self.rows_out += int(new.sum())
+        return keep
+
+    def filter(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Bloque sin las filas ya vistas (conserva la primera aparición)."""
+        return chunk[self.unique_mask(row_fingerprints(chunk))]
+
+    def iter_filter(self, chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Aplica filter a una secuencia de bloques."""
+        for chunk in chunks:
+            chunk = self.filter(chunk)
+            if not chunk.empty:
+                yield chunk
+
+
+def read_csv_deduplicated(path: str, chunk_size: int = 500000, bloom_bits: int = 0,
+                          deduplicator: Optional[StreamingDeduplicator] = None, **read_csv_kwargs) -> pd.DataFrame:
+    """
+    Lee un CSV por bloques descartando las filas duplicadas exactas al vuelo,
+    de modo que los duplicados nunca llegan a ocupar memoria.
+
+    Args:
+        path: Ruta del CSV
+        chunk_size: Filas por bloque
+        bloom_bits: Tamaño del filtro de Bloom (0 = sin filtro)
+        deduplicator: Deduplicador a usar (para consultar sus estadísticas después)
+        **read_csv_kwargs: Argumentos adicionales para pd.read_csv
+
+    Returns:
+        DataFrame sin duplicados, con índice consecutivo
+    """
+    deduplicator = deduplicator or StreamingDeduplicator(bloom_bits=bloom_bits)
+    # low_memory=False: tipos homogéneos por bloque, para que la huella de un valor no dependa del bloque
+    read_csv_kwargs.setdefault('low_memory', False)
+    with pd.read_csv(path, chunksize=chunk_size, **read_csv_kwargs) as reader:
+        parts = list(deduplicator.iter_filter(reader))
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts, ignore_index=True)
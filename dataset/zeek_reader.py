@@ -0,0 +1,258 @@
+import io
+import os
+import re
+import glob
+import gzip
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple, Sequence, Callable, Any
+
+import pandas as pd
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # decodificador rápido opcional
+    _json_loads = json.loads
+
+try:
+    import zstandard
+except ImportError:  # solo necesario para logs rotados .zst
+    zstandard = None
+
+
+# Logs Zeek: conn.log y rotados (conn.00:00:00-01:00:00.log), opcionalmente comprimidos
+_LOG_NAME = re.compile(r'^(?P<type>[^.]+)(\.[^/]*)?\.log(\.gz|\.zst)?$')
+
+
+def open_zeek_log(log_file: str, mode: str = 'rt'):
+    """
+    Abre un log Zeek, descomprimiéndolo al vuelo si es .gz o .zst.
+
+    Args:
+        log_file: Ruta del log
+        mode: 'rt' (texto UTF-8) o 'rb'
+    """
+    if log_file.endswith('.gz'):
+        if 'b' in mode:
+            return gzip.open(log_file, 'rb')
+        return gzip.open(log_file, 'rt', encoding='utf-8', errors='replace')
+    if log_file.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError(f"Leer {log_file} requiere zstandard (pip install zstandard)")
+        raw = zstandard.ZstdDecompressor().stream_reader(open(log_file, 'rb'), closefd=True)
+        if 'b' in mode:
+            return raw
+        return io.TextIOWrapper(raw, encoding='utf-8', errors='replace')
+    if 'b' in mode:
+        return open(log_file, 'rb')
+    return open(log_file, 'r', encoding='utf-8', errors='replace')
+
+
+def zeek_log_type(log_file: str) -> Optional[str]:
+    """Tipo de log (conn, dns, ...) a partir del nombre del fichero, o None si no es un log Zeek."""
+    match = _LOG_NAME.match(os.path.basename(log_file))
+    return match.group('type') if match else None
+
+
+def detect_zeek_format(log_file: str) -> Optional[str]:
+    """'tsv' o 'json' según la primera línea no vacía del log (None si está vacío)."""
+    with open_zeek_log(log_file) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                return 'json' if line.startswith('{') else 'tsv'
+    return None
+
+
+def read_zeek_header(log_file: str) -> Tuple[Optional[List[str]], Optional[str]]:
+    """
+    Lee la cabecera de un log Zeek en formato TSV.
+
+    Returns:
+        (nombres de campos, separador), o (None, None) si no es un log Zeek válido
+    """
+    headers = None
+    separator = None
+    with open_zeek_log(log_file) as f:
+        for line in f:
+            if not line.startswith('#'):
+                break
+            if line.startswith('#separator'):
+                separator_value = line.strip().split(' ')[1]
+                if separator_value.startswith('\\x'):
+                    separator = bytes.fromhex(separator_value[2:]).decode('utf-8')
+                else:
+                    separator = separator_value.encode().decode('unicode_escape')
+            elif line.startswith('#fields'):
+                headers = line.rstrip('\n').split(separator or '\t')[1:]
+                break
+    return headers, separator
+
+
+def _iter_tsv_log(log_file: str, columns: Optional[Sequence[str]], chunk_size: int) -> Iterator[pd.DataFrame]:
+    headers, separator = read_zeek_header(log_file)
+    if headers is None or separator is None:
+        return
+
+    usecols = None
+    if columns is not None:
+        usecols = [col for col in columns if col in headers]
+        if not usecols:
+            return
+
+    # pandas descomprime .gz/.zst según la extensión
+    reader = pd.read_csv(
+        log_file,
+        comment='#',
+        sep=separator,
+        names=headers,
+        usecols=usecols,
+        na_values=['-'],
+        quoting=3,
+        on_bad_lines='skip',
+        low_memory=False,
+        encoding='utf-8',
+        encoding_errors='replace',
+        compression='infer',
+        chunksize=chunk_size
+    )
+    with reader:
+        for chunk in reader:
+            if usecols is not None:
+                chunk = chunk[usecols]  # usecols no conserva el orden pedido
+            yield chunk
+
+
+def _json_frame(lines: List[bytes], columns: Optional[Sequence[str]]) -> pd.DataFrame:
+    """
+    Bloque de líneas JSON → DataFrame con tipos de columna: se decodifica el bloque entero
+    en una sola llamada y los conjuntos/vectores se unen con ',' como en el formato TSV.
+    """
+    try:
+        records = _json_loads(b'[' + b','.join(lines) + b']')
+    except ValueError:
+        # Alguna línea truncada o corrupta: decodificar una a una y descartar las inválidas
+        records = []
+        for line in lines:
+            try:
+                records.append(_json_loads(line))
+            except ValueError:
+                continue
+
+    if columns is None:
+        columns = list(dict.fromkeys(key for record in records for key in record))
+    df = pd.DataFrame.from_records(records, columns=list(columns))
+
+    for col in df.columns:
+        values = df[col]
+        if values.dtype == object and values.map(lambda v: isinstance(v, list)).any():
+            df[col] = values.map(lambda v: ','.join(map(str, v)) if isinstance(v, list) else v)
+    # ts en ISO 8601 (json.timestamps=JSON::TS_ISO8601) → epoch, como en TSV
+    if 'ts' in df.columns and not pd.api.types.is_numeric_dtype(df['ts']):
+        # format='ISO8601' admite precisión de fracción variable entre filas; la resta evita depender
+        # de la unidad interna (ns o us según la versión de pandas) y deja NaT como NaN
+        ts = pd.to_datetime(df['ts'], utc=True, errors='coerce', format='ISO8601')
+        df['ts'] = (ts - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)
+    return df
+
+
+def _iter_json_log(log_file: str, columns: Optional[Sequence[str]], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    En JSON Zeek omite los campos vacíos, así que no hay cabecera con la que descartar columnas:
+    las pedidas siempre están (NaN si faltan) y, sin columnas pedidas, se fijan con el primer bloque.
+    """
+    with open_zeek_log(log_file, 'rb') as f:
+        lines = []
+        for line in f:
+            line = line.strip()
+            if not line.startswith(b'{'):
+                continue
+            lines.append(line)
+            if len(lines) >= chunk_size:
+                chunk = _json_frame(lines, columns)
+                columns = list(chunk.columns)
+                lines = []
+                yield chunk
+        if lines:
+            yield _json_frame(lines, columns)
+
+
+def iter_zeek_log(log_file: str, columns: Optional[Sequence[str]] = None,
+                  chunk_size: int = 500000) -> Iterator[pd.DataFrame]:
+    """
+    Lee un log Zeek (TSV o JSON, plano o comprimido .gz/.zst) por bloques de chunk_size filas,
+    sin cargarlo entero en memoria.
+
+    Args:
+        log_file: Ruta del log
+        columns: Columnas a conservar (en TSV, las que no existan en el log se ignoran;
+                 en JSON, sin cabecera, quedan a NaN)
+        chunk_size: Filas por bloque
+
+    Yields:
+        DataFrames con las columnas seleccionadas ('-' o campo ausente se lee como NaN)
+    """
+    log_format = detect_zeek_format(log_file)
+    if log_format == 'json':
+        yield from _iter_json_log(log_file, columns, chunk_size)
+    elif log_format == 'tsv':
+        yield from _iter_tsv_log(log_file, columns, chunk_size)
+
+
+def read_zeek_log(log_file: str, columns: Optional[Sequence[str]] = None,
+                  chunk_size: int = 500000) -> pd.DataFrame:
+    """Log Zeek completo como DataFrame (vacío si no es un log válido)."""
+    chunks = list(iter_zeek_log(log_file, columns, chunk_size))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def map_zeek_logs(log_files: Sequence[str], fn: Callable[..., Any], *args,
+                  n_jobs: int = 1) -> Iterator[Tuple[str, Any]]:
+    """
+    Aplica fn(log_file, *args) a cada log en procesos independientes (descompresión y análisis
+    en paralelo) y devuelve los resultados en el orden de log_files. Como mucho hay 2·n_jobs
+    resultados en vuelo, para acotar la memoria.
+
+    Args:
+        log_files: Rutas de los logs
+        fn: Función de nivel de módulo (serializable) a aplicar a cada log
+        *args: Argumentos adicionales de fn
+        n_jobs: Procesos (1 = secuencial en este proceso, -1 = todos los núcleos)
+
+    Yields:
+        (ruta, resultado de fn)
+    """
+    if n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs <= 1 or len(log_files) <= 1:
+        for log_file in log_files:
+            yield log_file, fn(log_file, *args)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        pending = []
+        for log_file in log_files:
+            pending.append((log_file, executor.submit(fn, log_file, *args)))
+            if len(pending) >= 2 * n_jobs:
+                path, future = pending.pop(0)
+                yield path, future.result()
+        for path, future in pending:
+            yield path, future.result()
+
+
+def read_zeek_logs(log_files: Sequence[str], columns: Optional[Sequence[str]] = None,
+                   n_jobs: int = 1) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """Lee varios logs completos en paralelo (un proceso por fichero), en orden."""
+    return map_zeek_logs(log_files, read_zeek_log, columns, n_jobs=n_jobs)
+
+
+def find_zeek_logs(logs_dir: str, log_type: str) -> List[str]:
+    """
+    Logs de un tipo (conn, dns, ...) bajo logs_dir, incluidos los rotados y comprimidos
+    (conn.log, conn.00:00:00-01:00:00.log.gz, conn.log.zst...), en orden determinista.
+    """
+    candidates = glob.glob(os.path.join(glob.escape(logs_dir), '**', f'{log_type}.*'), recursive=True)
+    return sorted(path for path in candidates if zeek_log_type(path) == log_type and os.path.isfile(path))
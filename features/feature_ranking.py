@@ -0,0 +1,185 @@
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.feature_selection import mutual_info_classif
+
+
+def stratified_subsample(y: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Índices de una submuestra estratificada de ~size filas: cada clase conserva su
+    proporción y al menos una fila.
+    """
+    classes, y_codes, counts = np.unique(y, return_inverse=True, return_counts=True)
+    if size >= len(y):
+        return np.arange(len(y))
+    fraction = size / len(y)
+    order = np.argsort(y_codes, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    indices = []
+    for start, count in zip(starts, counts):
+        n = min(count, max(1, int(round(count * fraction))))
+        indices.append(order[start + rng.choice(count, size=n, replace=False)])
+    return np.sort(np.concatenate(indices))
+
+
+def bin_features(X: pd.DataFrame, n_bins: int = 64) -> np.ndarray:
+    """
+    Codifica cada columna como enteros 0..k-1 (k <= n_bins + 1): las columnas con pocos valores
+    distintos (categóricas ya codificadas, flags, puertos frecuentes) se factorizan y las
+    continuas se discretizan por cuantiles. Los valores ausentes (NaN) van a un código propio,
+    el siguiente al último, para que su información mutua no se mezcle con la de otro valor.
+
+    Returns:
+        Matriz (filas x columnas) de códigos int32, en orden Fortran (columnas contiguas)
+    """
+    codes = np.empty(X.shape, dtype=np.int32, order='F')
+    for j, col in enumerate(X.columns):
+        values = X[col].to_numpy()
+        missing = pd.isna(values)
+        uniques = pd.unique(values)
+        if len(uniques) <= n_bins:
+            column, levels = pd.factorize(values)  # NaN factorizado como -1
+            n_codes = len(levels)
+        else:
+            values = values.astype(np.float64)
+            edges = np.unique(np.nanquantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]))
+            column = np.searchsorted(edges, values, side='right')
+            n_codes = len(edges) + 1
+        if missing.any():
+            column[missing] = n_codes
+        codes[:, j] = column
+    return codes
+
+
+def histogram_mutual_info(x_codes: np.ndarray, y_codes: np.ndarray, n_classes: int) -> float:
+    """
+    Información mutua (en nats, como mutual_info_classif) entre dos variables discretas
+    a partir de su histograma conjunto.
+    """
+    n_x = int(x_codes.max()) + 1 if len(x_codes) else 1
+    joint = np.bincount(x_codes.astype(np.int64) * n_classes + y_codes, minlength=n_x * n_classes)
+    joint = joint.reshape(n_x, n_classes).astype(np.float64) / len(x_codes)
+    p_x = joint.sum(axis=1, keepdims=True)
+    p_y = joint.sum(axis=0, keepdims=True)
+    nonzero = joint > 0
+    return float(np.sum(joint[nonzero] * np.log(joint[nonzero] / (p_x @ p_y)[nonzero])))
+
+
+def _subsample_mi(X_sub: np.ndarray, y_sub: np.ndarray, discrete: bool, seed: int) -> float:
+    return float(mutual_info_classif(X_sub.reshape(-1, 1), y_sub, discrete_features=[discrete],
+                                     random_state=seed)[0])
+
+
+class MutualInfoRanker:
+    """
+    Ranking rápido de características por información mutua para datasets grandes.
+
+    Modos:
+        'histogram': MI exacta sobre códigos enteros pre-discretizados (bincount conjunto),
+                     en segundos incluso con millones de filas.
+        'subsample': mutual_info_classif (kNN) sobre varias submuestras estratificadas,
+                     con media e intervalo de confianza del 95% entre submuestras.
+
+    En ambos modos cada característica se calcula en paralelo (joblib).
+    """
+
+    def __init__(self, mode: str = 'histogram', n_bins: int = 64, n_subsamples: int = 5,
+                 subsample_size: int = 50000, n_jobs: int = -1, random_state: int = 42):
+        """
+        Inicializa el ranking.
+
+        Args:
+            mode: 'histogram' o 'subsample'
+            n_bins: Intervalos por característica continua (modo histogram)
+            n_subsamples: Número de submuestras (modo subsample)
+            subsample_size: Filas por submuestra (modo subsample)
+            n_jobs: Procesos en paralelo (-1 = todos los núcleos)
+            random_state: Semilla
+        """
+        if mode not in ('histogram', 'subsample'):
+            raise ValueError(f"Modo no soportado: {mode}")
+        self.mode = mode
+        self.n_bins = n_bins
+        self.n_subsamples = n_subsamples
+        self.subsample_size = subsample_size
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self._codes_cache: Optional[tuple] = None
+
+    def _binned(self, X: pd.DataFrame) -> np.ndarray:
+        """Códigos de X, reutilizados si se rankea el mismo X contra varios objetivos."""
+        if self._codes_cache is not None and self._codes_cache[0] is X:
+            return self._codes_cache[1]
+        codes = bin_features(X, self.n_bins)
+        self._codes_cache = (X, codes)
+        return codes
+
+    def rank(self, X: pd.DataFrame, y, discrete_features: Union[str, List[bool]] = 'auto') -> pd.DataFrame:
+        """
+        Calcula la MI de cada columna de X con y.
+
+        Args:
+            X: Características (numéricas o ya codificadas)
+            y: Objetivo (etiquetas de clase)
+            discrete_features: Columnas discretas para el modo subsample ('auto' = todas continuas,
+                               como mutual_info_classif sobre matrices densas)
+
+        Returns:
+            DataFrame (feature, mi[, mi_std, ci_low, ci_high]) ordenado por MI descendente
+        """
+        _, y_codes = np.unique(np.asarray(y), return_inverse=True)
+        y_codes = y_codes.astype(np.int64)
+        if self.mode == 'histogram':
+            result = self._rank_histogram(X, y_codes)
+        else:
+            result = self._rank_subsample(X, y_codes, discrete_features)
+        return result.sort_values('mi', ascending=False).reset_index(drop=True)
+
+    def _rank_histogram(self, X: pd.DataFrame, y_codes: np.ndarray) -> pd.DataFrame:
+        codes = self._binned(X)
+        n_classes = int(y_codes.max()) + 1
+        mi = Parallel(n_jobs=self.n_jobs, prefer='threads')(
+            delayed(histogram_mutual_info)(codes[:, j], y_codes, n_classes) for j in range(codes.shape[1])
+        )
+        return pd.DataFrame({'feature': X.columns, 'mi': mi})
+
+    def _rank_subsample(self, X: pd.DataFrame, y_codes: np.ndarray,
+                        discrete_features: Union[str, List[bool]]) -> pd.DataFrame:
+        discrete = [False] * X.shape[1] if isinstance(discrete_features, str) else list(discrete_features)
+        values = X.to_numpy(dtype=np.float64)
+        subsamples = [stratified_subsample(y_codes, self.subsample_size,
+                                           np.random.default_rng([self.random_state, i]))
+                      for i in range(self.n_subsamples)]
+
+        mi = Parallel(n_jobs=self.n_jobs)(
+            delayed(_subsample_mi)(values[idx, j], y_codes[idx], discrete[j], self.random_state)
+            for idx in subsamples for j in range(X.shape[1])
+        )
+        mi = np.asarray(mi).reshape(len(subsamples), X.shape[1])
+
+        mean = mi.mean(axis=0)
+        std = mi.std(axis=0, ddof=1) if len(subsamples) > 1 else np.zeros(X.shape[1])
+        half_width = 1.96 * std / np.sqrt(len(subsamples))
+        return pd.DataFrame({
+            'feature': X.columns,
+            'mi': mean,
+            'mi_std': std,
+            'ci_low': np.maximum(mean - half_width, 0.0),
+            'ci_high': mean + half_width
+        })
+
+    def rank_targets(self, X: pd.DataFrame, targets: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """
+        MI con varios objetivos (p.ej. binario y multiclase) y su media.
+
+        Returns:
+            DataFrame (feature, mi_<objetivo>..., avg_mi) ordenado por avg_mi descendente
+        """
+        merged = pd.DataFrame({'feature': X.columns})
+        for name, y in targets.items():
+            ranking = self.rank(X, y)
+            merged = merged.merge(ranking[['feature', 'mi']].rename(columns={'mi': f'mi_{name}'}), on='feature')
+        merged['avg_mi'] = merged[[f'mi_{name}' for name in targets]].mean(axis=1)
+        return merged.sort_values('avg_mi', ascending=False).reset_index(drop=True)
@@ -0,0 +1,209 @@
+import math
+from collections import deque, OrderedDict
+from typing import Dict, Tuple, Optional, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+
+# Estados Zeek en los que el originador solo envió SYN (intento sin respuesta o rechazado)
+SYN_ONLY_STATES = frozenset({'S0', 'REJ'})
+
+# Características por clave: origen (id.orig_h) y destino (id.resp_h)
+WINDOW_FEATURE_SUFFIXES = ['distinct_ports', 'conn_rate', 'syn_only_ratio', 'bytes_per_s']
+WINDOW_FEATURES = ([f'win_orig_{s}' for s in WINDOW_FEATURE_SUFFIXES] +
+                   [f'win_resp_{s}' for s in WINDOW_FEATURE_SUFFIXES])
+
+
+class _HostWindow:
+    """
+    Estado de ventana deslizante de un host: buffer circular de flujos
+    y contadores acumulados que se actualizan al entrar y salir cada flujo.
+    """
+
+    __slots__ = ('flows', 'port_counts', 'syn_only', 'total_bytes', 'last_ts')
+
+    def __init__(self):
+        self.flows = deque()            # (ts, puerto, syn_only, bytes)
+        self.port_counts: Dict[int, int] = {}
+        self.syn_only = 0
+        self.total_bytes = 0.0
+        self.last_ts = float('-inf')
+
+    def add(self, ts: float, port: int, syn_only: bool, n_bytes: float):
+        self.flows.append((ts, port, syn_only, n_bytes))
+        self.port_counts[port] = self.port_counts.get(port, 0) + 1
+        self.syn_only += syn_only
+        self.total_bytes += n_bytes
+        if ts > self.last_ts:
+            self.last_ts = ts
+
+    def expire(self, cutoff: float):
+        """Saca de la ventana los flujos anteriores a cutoff (O(1) amortizado)."""
+        flows = self.flows
+        while flows and flows[0][0] < cutoff:
+            _, port, syn_only, n_bytes = flows.popleft()
+            remaining = self.port_counts[port] - 1
+            if remaining:
+                self.port_counts[port] = remaining
+            else:
+                del self.port_counts[port]
+            self.syn_only -= syn_only
+            self.total_bytes -= n_bytes
+
+    def features(self, window: float) -> Tuple[float, float, float, float]:
+        n_flows = len(self.flows)
+        return (
+            float(len(self.port_counts)),
+            n_flows / window,
+            self.syn_only / n_flows if n_flows else 0.0,
+            max(self.total_bytes, 0.0) / window
+        )
+
+
+def _as_float(value) -> float:
+    """Valor numérico de un campo Zeek en bruto ('123', 123, '-', None...); NaN si no es numérico."""
+    if value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class SlidingWindowAggregator:
+    """
+    Agregador incremental de flujos por ventana temporal, con clave id.orig_h e id.resp_h.
+    Calcula puertos destino distintos, tasa de conexiones, proporción de intentos solo-SYN
+    y bytes por segundo con trabajo O(1) amortizado por flujo. Se usa igual en la
+    construcción del dataset (add_window_features) y en inferencia en streaming (update).
+    """
+
+    def __init__(self, window_seconds: float = 60.0, idle_sweep_every: int = 10000):
+        """
+        Inicializa el agregador.
+
+        Args:
+            window_seconds: Longitud de la ventana deslizante
+            idle_sweep_every: Cada cuántos flujos se eliminan los hosts inactivos
+        """
+        self.window = float(window_seconds)
+        self.idle_sweep_every = idle_sweep_every
+        self._orig: "OrderedDict[str, _HostWindow]" = OrderedDict()
+        self._resp: "OrderedDict[str, _HostWindow]" = OrderedDict()
+        self._updates = 0
+        self._max_ts = float('-inf')
+
+    def _touch(self, table: "OrderedDict[str, _HostWindow]", key: str) -> _HostWindow:
+        state = table.get(key)
+        if state is None:
+            state = table[key] = _HostWindow()
+        else:
+            table.move_to_end(key)
+        return state
+
+    def _sweep_idle(self):
+        """Elimina hosts sin flujos dentro de la ventana (los menos recientes están al principio)."""
+        cutoff = self._max_ts - self.window
+        for table in (self._orig, self._resp):
+            while table:
+                key, state = next(iter(table.items()))
+                if state.last_ts >= cutoff:
+                    break
+                del table[key]
+
+    def update(self, ts: float, orig_h: str, resp_h: str, resp_p: int,
+               conn_state: Optional[str], orig_bytes: float = 0.0, resp_bytes: float = 0.0) -> Tuple[float, ...]:
+        """
+        Añade un registro de conn.log y devuelve las características de ventana
+        (en el orden de WINDOW_FEATURES) incluyendo el propio flujo.
+        Los registros pueden llegar ligeramente desordenados: cada host expira
+        según su marca de tiempo más reciente.
+        """
+        syn_only = conn_state in SYN_ONLY_STATES
+        n_bytes = 0.0
+        for value in (orig_bytes, resp_bytes):
+            value = _as_float(value)
+            if value == value:  # None/NaN/'-' cuentan como 0
+                n_bytes += value
+        port = _as_float(resp_p)
+        port = -1 if port != port else int(port)  # NaN/'-' → -1
+
+        orig_state = self._touch(self._orig, orig_h)
+        orig_state.add(ts, port, syn_only, n_bytes)
+        orig_state.expire(orig_state.last_ts - self.window)
+
+        resp_state = self._touch(self._resp, resp_h)
+        resp_state.add(ts, port, syn_only, n_bytes)
+        resp_state.expire(resp_state.last_ts - self.window)
+
+        if ts > self._max_ts:
+            self._max_ts = ts
+        self._updates += 1
+        if self._updates % self.idle_sweep_every == 0:
+            self._sweep_idle()
+
+        return orig_state.features(self.window) + resp_state.features(self.window)
+
+    @property
+    def active_hosts(self) -> Tuple[int, int]:
+        """Número de hosts origen y destino con estado en memoria."""
+        return len(self._orig), len(self._resp)
+
+
+def add_window_features(df: pd.DataFrame, window_seconds: float = 60.0,
+                        aggregator: Optional[SlidingWindowAggregator] = None) -> pd.DataFrame:
+    """
+    Añade las columnas WINDOW_FEATURES a un DataFrame de conn.log
+    (columnas ts, id.orig_h, id.resp_h, id.resp_p, conn_state, orig_bytes, resp_bytes),
+    procesando los flujos en orden temporal con el mismo agregador que en inferencia.
+
+    Args:
+        df: DataFrame con registros de conn.log
+        window_seconds: Longitud de la ventana deslizante
+        aggregator: Agregador a reutilizar para continuar el estado entre bloques
+            consecutivos de un mismo log (por defecto, uno nuevo)
+
+    Returns:
+        El mismo DataFrame con las características de ventana añadidas (sin copiarlo)
+    """
+    if aggregator is None:
+        aggregator = SlidingWindowAggregator(window_seconds)
+    order = np.argsort(df['ts'].to_numpy(dtype=np.float64), kind='stable')
+
+    ts = df['ts'].to_numpy(dtype=np.float64)[order]
+    orig_h = df['id.orig_h'].astype(str).to_numpy()[order]
+    resp_h = df['id.resp_h'].astype(str).to_numpy()[order]
+    resp_p = pd.to_numeric(df['id.resp_p'], errors='coerce').to_numpy(dtype=np.float64)[order]
+    conn_state = df['conn_state'].to_numpy()[order]
+    orig_bytes = pd.to_numeric(df['orig_bytes'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)[order]
+    resp_bytes = pd.to_numeric(df['resp_bytes'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)[order]
+
+    values = np.empty((len(df), len(WINDOW_FEATURES)), dtype=np.float64)
+    update = aggregator.update
+    for i in range(len(df)):
+        values[order[i]] = update(ts[i], orig_h[i], resp_h[i], resp_p[i],
+                                  conn_state[i], orig_bytes[i], resp_bytes[i])
+
+    for j, column in enumerate(WINDOW_FEATURES):
+        df[column] = values[:, j].astype(np.float32)
+    return df
+
+
+def capture_window_features(chunks: Iterable[pd.DataFrame], window_seconds: float = 60.0) -> Iterator[pd.DataFrame]:
+    """
+    Características de ventana de una captura (un conn.log) leída por bloques. El ámbito del estado
+    de ventana es siempre la captura: cada una es un escenario independiente, con su propio
+    agregador que continúa entre sus bloques. Lo usan la construcción del dataset (script y notebook)
+    y la reproducción de logs, para que la misma característica signifique lo mismo en ambos.
+
+    Args:
+        chunks: Bloques consecutivos de un mismo conn.log
+        window_seconds: Longitud de la ventana deslizante
+
+    Yields:
+        Cada bloque con las columnas WINDOW_FEATURES añadidas
+    """
+    aggregator = SlidingWindowAggregator(window_seconds)
+    for chunk in chunks:
+        yield add_window_features(chunk, window_seconds, aggregator=aggregator)
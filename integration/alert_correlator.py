@@ -0,0 +1,122 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Sequence
+
+
+class _AlertState:
+    """Estado compacto de un par (host origen, etiqueta de ataque)."""
+
+    __slots__ = ('first_seen', 'last_seen', 'total', 'window_start', 'window_count', 'level', 'suppressed')
+
+    def __init__(self, now: float):
+        self.first_seen = now
+        self.last_seen = now
+        self.total = 0
+        self.window_start = now
+        self.window_count = 0
+        self.level = 0
+        self.suppressed = 0
+
+
+class AlertCorrelator:
+    """
+    Correlación y deduplicación de alertas por (host origen, etiqueta de ataque).
+    Solo emite una alerta cuando el par aparece por primera vez (o tras expirar su TTL)
+    o cuando su tasa en la ventana supera un nuevo umbral; el resto se suprimen
+    y se contabilizan para la siguiente alerta emitida.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, rate_window_seconds: float = 60.0,
+                 rate_thresholds: Sequence[int] = (10, 100, 1000), max_entries: int = 100000):
+        """
+        Inicializa el correlador.
+
+        Args:
+            ttl_seconds: Inactividad tras la cual se olvida un par (host, ataque)
+            rate_window_seconds: Ventana para medir la tasa de detecciones
+            rate_thresholds: Umbrales crecientes de detecciones por ventana que generan alerta
+            max_entries: Tamaño máximo de la tabla de estado
+        """
+        self.ttl = ttl_seconds
+        self.rate_window = rate_window_seconds
+        self.rate_thresholds = tuple(sorted(rate_thresholds))
+        self.max_entries = max_entries
+        self._states: "OrderedDict[Tuple[str, str], _AlertState]" = OrderedDict()
+        self.emitted = 0
+        self.suppressed = 0
+
+    def _evict(self, now: float):
+        """Elimina estados caducados (la tabla está ordenada por última actividad)."""
+        cutoff = now - self.ttl
+        states = self._states
+        while states:
+            key, state = next(iter(states.items()))
+            if state.last_seen >= cutoff and len(states) < self.max_entries:
+                break
+            del states[key]
+
+    def observe(self, source_host: str, attack_label: str, timestamp: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Registra una detección y decide si debe emitirse una alerta.
+
+        Args:
+            source_host: Host origen (id.orig_h)
+            attack_label: Etiqueta de ataque predicha
+            timestamp: Momento de la detección (epoch); por defecto, ahora
+
+        Returns:
+            Decisión con 'emit', 'reason', 'count' y 'suppressed_since_last'
+        """
+        now = time.time() if timestamp is None else timestamp
+        key = (source_host, attack_label)
+        self._evict(now)
+
+        state = self._states.get(key)
+        reason = None
+        if state is None:
+            state = self._states[key] = _AlertState(now)
+            reason = 'new'
+        else:
+            self._states.move_to_end(key)
+
+        # Ventana de tasa
+        if now - state.window_start >= self.rate_window:
+            state.window_start = now
+            state.window_count = 0
+            state.level = 0
+
+        state.last_seen = now
+        state.total += 1
+        state.window_count += 1
+
+        level = state.level
+        while level < len(self.rate_thresholds) and state.window_count >= self.rate_thresholds[level]:
+            level += 1
+        if level > state.level:
+            state.level = level
+            reason = reason or 'rate_threshold'
+
+        if reason is None:
+            state.suppressed += 1
+            self.suppressed += 1
+            return {'emit': False, 'reason': 'suppressed', 'count': state.total,
+                    'suppressed_since_last': state.suppressed}
+
+        suppressed = state.suppressed
+        state.suppressed = 0
+        self.emitted += 1
+        return {
+            'emit': True,
+            'reason': reason,
+            'count': state.total,
+            'rate_per_window': state.window_count,
+            'suppressed_since_last': suppressed
+        }
+
+    def get_statistics(self) -> Dict[str, int]:
+        """Estadísticas de la correlación de alertas."""
+        return {
+            'active_pairs': len(self._states),
+            'alerts_emitted': self.emitted,
+            'alerts_suppressed': self.suppressed
+        }
@@ -1,8 +1,24 @@
+import sys
+import os
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.append(os.path.join(project_root, 'mapping'))
+
+from name_normalizer import clean_name
+from threat_index import ThreatIndex
+from ontology_queries import OntologyQueries
+from threat_retention import RetentionPolicy, ThreatArchive
 from rdflib import Graph, Namespace, URIRef, Literal, BNode
 from rdflib.namespace import RDF, RDFS, XSD
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple, Optional
 import uuid
+import glob
+import hashlib
+
+
+# Versión del formato de la instantánea de la ontología (N-Triples: sin código ejecutable al cargarla)
+SNAPSHOT_FORMAT_VERSION = 2
 
 
 class AmenazaCreator:
@@ -11,51 +27,142 @@ class AmenazaCreator:
     Conecta detecciones ML con técnicas, tácticas y mitigaciones.
     """
     
-    def __init__(self, ontology_path: str = "./ontology/ids_iiot_ontologia.owl"):
+    def __init__(self, ontology_path: str = "./ontology/ids_iiot_ontologia.owl",
+                 snapshot_dir: Optional[str] = None, use_snapshot: bool = True,
+                 retention: Optional[RetentionPolicy] = None):
         """
         Inicializa el creador de amenazas.
         
         Args:
             ontology_path: Ruta a la ontología base
+            snapshot_dir: Directorio de instantáneas N-Triples (por defecto, .snapshots junto a la ontología)
+            use_snapshot: Cargar/guardar la instantánea en lugar de analizar siempre el RDF/XML
+            retention: Política de retención de amenazas (None = se conservan todas)
         """
         self.ontology_path = ontology_path
+        self.snapshot_dir = snapshot_dir or os.path.join(os.path.dirname(os.path.abspath(ontology_path)), '.snapshots')
+        self.use_snapshot = use_snapshot
         self.graph = Graph()
         self.namespace = Namespace("http://universidad.es/tfm/ids-iiot/ontologia#")
         
+        # Índices secundarios de amenazas (consultas sin recorrer el grafo)
+        self.threat_index = ThreatIndex()
+        
         # Cargar ontología existente
         self._load_ontology()
+        self.queries = OntologyQueries(self.graph, self.namespace)
+        self._has_closure = self.queries.has_derived_closure()
+        self._index_existing_amenazas()
+        
+        # Retención: triples de amenazas en el grafo y amenazas creadas desde la última comprobación
+        self.retention = retention
+        self.archive = ThreatArchive(retention.archive_dir) if retention and retention.archive_dir else None
+        self._threat_triples = sum(1 for uri in self.threat_index.oldest()
+                                   for _ in self.graph.triples((URIRef(uri), None, None)))
+        self._created_since_check = 0
+        self.evicted = 0
         
         # Preparar namespaces
         self.graph.bind("ids", self.namespace)
         self.graph.bind("rdfs", RDFS)
         self.graph.bind("xsd", XSD)
     
-    def _clean_name(self, name: str) -> str:
-        """Limpia nombres para IDs válidos - SIN espacios, SIN paréntesis, SIN acentos."""
-        cleaned = name.replace(' ', '_').replace('-', '_').replace('/', '_')
-        cleaned = cleaned.replace('(', '_').replace(')', '_').replace('&', 'and')
-        cleaned = cleaned.replace('á', 'a').replace('é', 'e').replace('í', 'i')
-        cleaned = cleaned.replace('ó', 'o').replace('ú', 'u').replace('ñ', 'n')
-        # Eliminar dobles guiones bajos
-        while '__' in cleaned:
-            cleaned = cleaned.replace('__', '_')
-        # Eliminar guiones bajos al final
-        cleaned = cleaned.strip('_')
-        return cleaned
-        
     def _load_ontology(self):
-        """Carga la ontología base."""
+        """
+        Carga la ontología base. Si existe una instantánea N-Triples del mismo contenido
+        (hash del fichero) se carga esa, más rápida que analizar el RDF/XML y, a diferencia
+        de pickle, sin ejecutar código del fichero; si no, se analiza el RDF/XML y se guarda
+        la instantánea para la próxima vez.
+        """
+        snapshot_path = self._snapshot_path() if self.use_snapshot else None
+        if snapshot_path and os.path.exists(snapshot_path):
+            try:
+                self.graph.parse(snapshot_path, format="nt")
+                print(f"Ontología base cargada (instantánea): {len(self.graph)} triples")
+                return
+            except Exception as e:
+                print(f"Instantánea no válida, se analiza el RDF/XML: {e}")
+                self.graph = Graph()
+        
         try:
             self.graph.parse(self.ontology_path, format="xml")
             print(f"Ontología base cargada: {len(self.graph)} triples")
         except Exception as e:
             print(f"Error cargando ontología: {e}")
             raise
+        
+        if snapshot_path:
+            self._save_snapshot(snapshot_path)
+    
+    def _snapshot_path(self) -> Optional[str]:
+        """Ruta de la instantánea para el contenido actual de la ontología (None si no existe el fichero)."""
+        try:
+            with open(self.ontology_path, 'rb') as f:
+                digest = hashlib.sha1(f.read()).hexdigest()[:16]
+        except OSError:
+            return None
+        name = os.path.basename(self.ontology_path)
+        return os.path.join(self.snapshot_dir,
+                            f"{name}.{digest}.v{SNAPSHOT_FORMAT_VERSION}.nt")
+    
+    def _save_snapshot(self, snapshot_path: str):
+        """Guarda la instantánea (escritura atómica) y elimina las de versiones anteriores del fichero."""
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+            self.graph.serialize(destination=tmp_path, format="nt", encoding="utf-8")
+            os.replace(tmp_path, snapshot_path)
+            
+            # Instantáneas anteriores del fichero (incluidas las .pkl del formato v1)
+            prefix = os.path.join(self.snapshot_dir, glob.escape(os.path.basename(self.ontology_path)))
+            for old_path in glob.glob(prefix + ".*.nt") + glob.glob(prefix + ".*.pkl"):
+                if old_path != snapshot_path:
+                    os.remove(old_path)
+        except Exception as e:
+            # La instantánea es solo una optimización
+            print(f"No se pudo guardar la instantánea de la ontología: {e}")
+    
+    def _index_existing_amenazas(self):
+        """Indexa las amenazas que ya contenga la ontología cargada (una única pasada)."""
+        amenazas = {}
+        for row in self.queries.run('existing_amenazas'):
+            entry = amenazas.setdefault(row.amenaza, {
+                'label': str(row.label) if row.label is not None else '',
+                'confidence': float(row.conf) if row.conf is not None else 0.0,
+                'timestamp': self._parse_timestamp(row.fecha),
+                'sample_index': int(row.indice) if row.indice is not None else -1,
+                'techniques': {}, 'tactics': {}, 'mitigations': {}
+            })
+            # dicts como conjuntos ordenados
+            if row.tecID is not None:
+                entry['techniques'][str(row.tecID)] = None
+            if row.tactica is not None:
+                entry['tactics'][str(row.tactica)] = None
+            if row.mitigacion is not None:
+                entry['mitigations'][str(row.mitigacion)] = None
+        
+        for uri, entry in amenazas.items():
+            self.threat_index.add(uri, entry['label'], entry['confidence'], entry['timestamp'],
+                                  entry['techniques'], entry['tactics'], entry['mitigations'],
+                                  entry['sample_index'])
+        if amenazas:
+            print(f"Amenazas existentes indexadas: {len(amenazas)}")
+    
+    @staticmethod
+    def _parse_timestamp(value) -> float:
+        """Convierte un literal detectadaEn a epoch (0.0 si falta o no es válido)."""
+        if value is None:
+            return 0.0
+        try:
+            return datetime.strptime(str(value), "%Y-%m-%dT%H:%M:%SZ").timestamp()
+        except ValueError:
+            return 0.0
     
     def create_amenaza_detectada(self, 
                                 ml_prediction: Dict[str, Any],
                                 sample_index: int,
-                                timestamp: datetime = None) -> str:
+                                timestamp: datetime = None,
+                                verbose: bool = True) -> str:
         """
         Crea un individuo AmenazaDetectada en la ontología.
         
@@ -63,6 +170,7 @@ class AmenazaCreator:
             ml_prediction: Resultado de la predicción ML
             sample_index: Índice de la muestra
             timestamp: Momento de detección
+            verbose: Informar de cada amenaza creada
             
         Returns:
             URI del individuo creado
@@ -82,10 +190,12 @@ class AmenazaCreator:
         confidence = ml_prediction['final_confidence']
         
         if attack_label == "Normal":
-            print(f"Muestra {sample_index}: Comportamiento normal - No se crea amenaza")
+            if verbose:
+                print(f"Muestra {sample_index}: Comportamiento normal - No se crea amenaza")
             return None
         
         # 1. Crear el individuo AmenazaDetectada
+        triples_before = len(self.graph)
         self.graph.add((amenaza_uri, RDF.type, self.namespace.AmenazaDetectada))
         self.graph.add((amenaza_uri, RDFS.label, Literal(f"Amenaza_{sample_index}")))
         
@@ -99,15 +209,35 @@ class AmenazaCreator:
         
         # 4. Conectar con técnicas MITRE (y automáticamente con tácticas y mitigaciones)
         techniques = self._get_techniques_for_attack(attack_label)
-        for technique in techniques:
-            self._connect_to_technique(amenaza_uri, technique)
+        technique_ids = dict.fromkeys(technique['id'] for technique in techniques)
+        if self._has_closure and techniques:
+            tactics, mitigations = self._connect_from_closure(amenaza_uri, attack_uri, techniques)
+        else:
+            # Ontología sin relaciones derivadas: recorrer técnica → táctica / mitigación
+            tactics, mitigations = {}, {}
+            for technique in techniques:
+                technique_tactics, technique_mitigations = self._connect_to_technique(amenaza_uri, technique)
+                tactics.update(dict.fromkeys(map(str, technique_tactics)))
+                mitigations.update(dict.fromkeys(map(str, technique_mitigations)))
+        
+        # 5. Registrar en los índices secundarios
+        self.threat_index.add(amenaza_uri, attack_label, confidence, timestamp.timestamp(),
+                              technique_ids, tactics, mitigations, sample_index)
+        self._threat_triples += len(self.graph) - triples_before
+        
+        if verbose:
+            print(f"Creada {amenaza_id}: {attack_label} (conf: {confidence:.3f})")
         
-        print(f"Creada {amenaza_id}: {attack_label} (conf: {confidence:.3f})")
+        # 6. Política de retención (comprobada cada check_every amenazas)
+        if self.retention is not None and self.retention.enabled:
+            self._created_since_check += 1
+            if self._created_since_check >= self.retention.check_every:
+                self.enforce_retention()
         return amenaza_uri
     
     def _connect_to_attack_type(self, amenaza_uri: URIRef, attack_label: str) -> URIRef:
         """Conecta amenaza con tipo de ataque."""
-        attack_clean = self._clean_name(attack_label)
+        attack_clean = clean_name(attack_label)
         attack_uri = self.namespace[attack_clean]
         self.graph.add((amenaza_uri, self.namespace.esAtaque, attack_uri))
         return attack_uri
@@ -117,25 +247,10 @@ class AmenazaCreator:
         Obtiene técnicas MITRE para una etiqueta de ataque.
         Consulta el mapping existente en la ontología.
         """
-        # Buscar en el grafo las técnicas asociadas a esta etiqueta
+        # Técnicas asociadas al Ataque en el grafo (consulta preparada y memorizada)
         techniques = []
-        attack_clean = self._clean_name(attack_label)
-        
-        # Consulta SPARQL para encontrar técnicas via Ataque
-        query = f"""
-        PREFIX ids: <{self.namespace}>
-        SELECT ?tecnica ?tecID ?tecNombre ?tactica
-        WHERE {{
-            ids:{attack_clean} ids:implementa_tecnica ?tecnica .
-            ?tecnica ids:tieneID ?tecID .
-            ?tecnica ids:tieneNombre ?tecNombre .
-            ?tecnica ids:pertenece_a_tactica ?tacticaURI .
-            ?tacticaURI ids:tieneNombre ?tactica .
-        }}
-        """
-        
-        results = self.graph.query(query)
-        for row in results:
+        attack_uri = self.namespace[clean_name(attack_label)]
+        for row in self.queries.attack_techniques(attack_uri):
             techniques.append({
                 'uri': row.tecnica,
                 'id': str(row.tecID),
@@ -145,45 +260,104 @@ class AmenazaCreator:
         
         return techniques
     
-    def _connect_to_technique(self, amenaza_uri: URIRef, technique: Dict):
-        """Conecta amenaza con técnica y táctica específica."""
+    def _connect_from_closure(self, amenaza_uri: URIRef, attack_uri: URIRef,
+                              techniques: List[Dict]) -> Tuple[Dict[str, None], Dict[str, None]]:
+        """
+        Conecta amenaza con técnicas, tácticas y mitigaciones copiando las relaciones
+        derivadas del Ataque (implementa_tactica, se_mitiga_con) materializadas en la ontología base.
+        
+        Returns:
+            (tácticas, mitigaciones) conectadas, como conjuntos ordenados de URIs
+        """
+        for technique in techniques:
+            self.graph.add((amenaza_uri, self.namespace.utilizaTecnica, technique['uri']))
+        
+        tactics = self.queries.attack_tactics(attack_uri)
+        for tactic_uri in tactics:
+            self.graph.add((amenaza_uri, self.namespace.utilizaTactica, tactic_uri))
+        
+        mitigations = self.queries.attack_mitigations(attack_uri)
+        for mitigation_uri in mitigations:
+            self.graph.add((amenaza_uri, self.namespace.mitigacion_recomendada, mitigation_uri))
+        
+        return dict.fromkeys(map(str, tactics)), dict.fromkeys(map(str, mitigations))
+    
+    def _connect_to_technique(self, amenaza_uri: URIRef, technique: Dict) -> Tuple[List[URIRef], List[URIRef]]:
+        """
+        Conecta amenaza con técnica y táctica específica.
+        
+        Returns:
+            (tácticas, mitigaciones) conectadas
+        """
         technique_uri = technique['uri']
         
         # Conectar con técnica
         self.graph.add((amenaza_uri, self.namespace.utilizaTecnica, technique_uri))
         
         # Obtener táctica de la técnica
-        tactic_query = f"""
-        PREFIX ids: <{self.namespace}>
-        SELECT ?tactica
-        WHERE {{
-            <{technique_uri}> ids:pertenece_a_tactica ?tactica .
-        }}
-        """
-        
-        tactic_results = self.graph.query(tactic_query)
-        for tactic_row in tactic_results:
-            tactic_uri = tactic_row.tactica
+        tactics = self.queries.technique_tactics(technique_uri)
+        for tactic_uri in tactics:
             self.graph.add((amenaza_uri, self.namespace.utilizaTactica, tactic_uri))
         
         # Obtener mitigaciones para la técnica
-        self._connect_to_mitigations(amenaza_uri, technique_uri)
+        mitigations = self._connect_to_mitigations(amenaza_uri, technique_uri)
+        return tactics, mitigations
     
-    def _connect_to_mitigations(self, amenaza_uri: URIRef, technique_uri: URIRef):
+    def _connect_to_mitigations(self, amenaza_uri: URIRef, technique_uri: URIRef) -> List[URIRef]:
         """Conecta amenaza con mitigaciones recomendadas."""
         # Buscar mitigaciones para esta técnica
-        mitigation_query = f"""
-        PREFIX ids: <{self.namespace}>
-        SELECT ?mitigacion
-        WHERE {{
-            <{technique_uri}> ids:mitigada_por ?mitigacion .
-        }}
+        mitigations = self.queries.technique_mitigations(technique_uri)
+        for mitigation_uri in mitigations:
+            self.graph.add((amenaza_uri, self.namespace.mitigacion_recomendada, mitigation_uri))
+        return mitigations
+    
+    def enforce_retention(self, now: Optional[float] = None) -> int:
         """
+        Aplica la política de retención: desaloja en lote las amenazas que la incumplen.
         
-        mitigation_results = self.graph.query(mitigation_query)
-        for mit_row in mitigation_results:
-            mitigation_uri = mit_row.mitigacion
-            self.graph.add((amenaza_uri, self.namespace.mitigacion_recomendada, mitigation_uri))
+        Returns:
+            Número de amenazas desalojadas
+        """
+        self._created_since_check = 0
+        if self.retention is None:
+            return 0
+        uris = self.retention.select(self.threat_index, self._threat_triples, now)
+        return self.evict_amenazas(uris) if uris else 0
+    
+    def evict_amenazas(self, uris: List[str]) -> int:
+        """
+        Elimina individuos AmenazaDetectada y todas sus aristas del grafo y de los índices,
+        archivándolos antes en un segmento comprimido si la política tiene archive_dir.
+        
+        Returns:
+            Número de amenazas desalojadas
+        """
+        triples = []
+        for uri in uris:
+            uri = URIRef(uri)
+            triples.extend(self.graph.triples((uri, None, None)))
+            triples.extend(self.graph.triples((None, None, uri)))
+        
+        segment = self.archive.write(triples) if self.archive is not None else None
+        
+        self.graph = self.queries.remove_triples(triples)
+        removed = self.threat_index.remove(uris)
+        self._threat_triples = max(self._threat_triples - len(triples), 0)
+        self.evicted += removed
+        
+        archived = f", archivadas en {segment}" if segment else ""
+        print(f"Retención: {removed} amenazas desalojadas ({len(triples)} triples){archived}")
+        return removed
+    
+    def get_technique_mitigations(self) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Tabla técnica → mitigaciones de la ontología base, en una sola consulta.
+        Permite resolver mitigaciones por lotes sin consultar el grafo por fila.
+        """
+        table: Dict[str, List[Dict[str, str]]] = {}
+        for row in self.queries.run('technique_mitigation_table'):
+            table.setdefault(str(row.tecID), []).append({'id': str(row.mitID), 'name': str(row.mitNombre)})
+        return table
     
     def save_updated_ontology(self, output_path: str = None):
         """Guarda la ontología actualizada con las nuevas amenazas."""
@@ -195,33 +369,32 @@ class AmenazaCreator:
         return output_path
     
     def get_amenazas_statistics(self) -> Dict[str, Any]:
-        """Obtiene estadísticas de las amenazas creadas."""
-        query = f"""
-        PREFIX ids: <{self.namespace}>
-        SELECT 
-            (COUNT(?amenaza) as ?total_amenazas)
-            (COUNT(DISTINCT ?tecnica) as ?tecnicas_utilizadas)
-            (COUNT(DISTINCT ?tactica) as ?tacticas_utilizadas)
-            (COUNT(DISTINCT ?mitigacion) as ?mitigaciones_recomendadas)
-        WHERE {{
-            ?amenaza a ids:AmenazaDetectada .
-            OPTIONAL {{ ?amenaza ids:utilizaTecnica ?tecnica }}
-            OPTIONAL {{ ?amenaza ids:utilizaTactica ?tactica }}
-            OPTIONAL {{ ?amenaza ids:mitigacion_recomendada ?mitigacion }}
-        }}
-        """
-        
-        results = list(self.graph.query(query))
-        if results:
-            row = results[0]
-            return {
-                'total_amenazas': int(row[0]),
-                'tecnicas_utilizadas': int(row[1]),
-                'tacticas_utilizadas': int(row[2]),
-                'mitigaciones_recomendadas': int(row[3]),
-                'total_triples': len(self.graph)
-            }
-        
-        return {'error': 'No se pudieron obtener estadísticas'}
+        """Obtiene estadísticas de las amenazas creadas (desde los índices, sin consultar el grafo)."""
+        statistics = self.threat_index.statistics()
+        statistics['total_triples'] = len(self.graph)
+        statistics['triples_amenazas'] = self._threat_triples
+        statistics['amenazas_desalojadas'] = self.evicted
+        return statistics
+    
+    def query_amenazas(self, last_seconds: float = None, limit: int = None, **filters) -> List[Dict[str, Any]]:
+        """
+        Consulta las amenazas detectadas mediante los índices secundarios.
+        
+        Args:
+            last_seconds: Limitar a las detectadas en los últimos segundos
+            limit: Número máximo de resultados
+            **filters: label, technique, min_confidence, max_confidence, since, until
+            
+        Ejemplo: query_amenazas(technique="T0814", min_confidence=0.9)
+        """
+        if last_seconds is not None:
+            filters['since'] = datetime.now().timestamp() - last_seconds
+        return self.threat_index.query(limit=limit, **filters)
+    
+    def top_techniques(self, n: int = 5, last_seconds: float = None) -> List[Tuple[str, int]]:
+        """Técnicas más utilizadas por las amenazas (opcionalmente en los últimos segundos)."""
+        if last_seconds is None:
+            return self.threat_index.top_techniques(n)
+        return self.threat_index.top_techniques(n, since=datetime.now().timestamp() - last_seconds)
 
 
@@ -0,0 +1,366 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Any, Optional, Sequence
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+
+# Versión del formato de las claves de etapa (cambiarla invalida toda la caché)
+CACHE_FORMAT_VERSION = 1
+
+
+class Stage:
+    """
+    Etapa del flujo de construcción: un comando con entradas, parámetros, código y salidas declarados.
+    Las rutas son relativas a la raíz del proyecto; las entradas y el código pueden ser
+    ficheros, directorios o patrones glob.
+    """
+
+    def __init__(self, name: str, command: Sequence[str], outputs: Sequence[str],
+                 inputs: Sequence[str] = (), code: Sequence[str] = (), params: Optional[Dict[str, Any]] = None,
+                 deps: Sequence[str] = (), cwd: str = "."):
+        self.name = name
+        self.command = list(command)
+        self.outputs = list(outputs)
+        self.inputs = list(inputs)
+        self.code = list(code)
+        self.params = dict(params or {})
+        self.deps = list(deps)
+        self.cwd = cwd
+
+
+class FileHasher:
+    """
+    Hash de contenido (SHA-256) de ficheros y directorios, memorizado por (tamaño, mtime):
+    un fichero sin cambios en disco no se vuelve a leer entre ejecuciones.
+    """
+
+    def __init__(self, memo_path: str, block_size: int = 1 << 22):
+        self.memo_path = memo_path
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        try:
+            with open(memo_path, 'r', encoding='utf-8') as f:
+                self._memo: Dict[str, List] = json.load(f)
+        except (OSError, ValueError):
+            self._memo = {}
+
+    def hash_file(self, path: str) -> str:
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            cached = self._memo.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(self.block_size), b''):
+                digest.update(block)
+        value = digest.hexdigest()
+        with self._lock:
+            self._memo[key] = [stat.st_size, stat.st_mtime_ns, value]
+        return value
+
+    def hash_path(self, path: str) -> Optional[str]:
+        """Hash de un fichero o de un directorio (rutas relativas + hashes de sus ficheros); None si no existe."""
+        if os.path.isfile(path):
+            return self.hash_file(path)
+        if not os.path.isdir(path):
+            return None
+        digest = hashlib.sha256()
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                file_path = os.path.join(dirpath, filename)
+                digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+                digest.update(self.hash_file(file_path).encode('ascii'))
+        return digest.hexdigest()
+
+    def save(self):
+        with self._lock:
+            memo = dict(self._memo)
+        tmp_path = self.memo_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(memo, f)
+        os.replace(tmp_path, self.memo_path)
+
+
+class BuildOrchestrator:
+    """
+    Orquestador con caché direccionada por contenido: la clave de cada etapa es el hash de
+    sus entradas, parámetros, código y de las salidas de las etapas de las que depende.
+    Las etapas con clave sin cambios y salidas intactas se omiten; las independientes
+    se ejecutan en paralelo.
+    """
+
+    def __init__(self, stages: Sequence[Stage], root: str = project_root,
+                 cache_dir: str = ".build_cache", max_workers: int = 4):
+        """
+        Inicializa el orquestador.
+
+        Args:
+            stages: Etapas del flujo
+            root: Raíz del proyecto (base de las rutas de las etapas)
+            cache_dir: Directorio del manifiesto y de la memoria de hashes (relativo a root)
+            max_workers: Etapas ejecutadas en paralelo como máximo
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        self.root = root
+        self.cache_dir = os.path.join(root, cache_dir)
+        self.max_workers = max_workers
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.manifest_path = os.path.join(self.cache_dir, "manifest.json")
+        self.hasher = FileHasher(os.path.join(self.cache_dir, "file_hashes.json"))
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest: Dict[str, Dict[str, Any]] = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+        self._manifest_lock = threading.Lock()
+
+        for stage in stages:
+            unknown = [dep for dep in stage.deps if dep not in self.stages]
+            if unknown:
+                raise ValueError(f"Etapa '{stage.name}': dependencias desconocidas {unknown}")
+
+    def _abs(self, path: str) -> str:
+        return os.path.join(self.root, path)
+
+    def _expand(self, patterns: Sequence[str]) -> List[str]:
+        """Rutas (relativas a root) que corresponden a los patrones, ordenadas."""
+        paths = set()
+        for pattern in patterns:
+            matches = glob.glob(self._abs(pattern))
+            paths.update(os.path.relpath(match, self.root) for match in matches)
+        return sorted(paths)
+
+    def _output_hashes(self, stage: Stage) -> Dict[str, Optional[str]]:
+        return {output: self.hasher.hash_path(self._abs(output)) for output in stage.outputs}
+
+    def stage_key(self, stage: Stage) -> str:
+        """Clave de contenido de la etapa (requiere que sus dependencias estén en el manifiesto)."""
+        digest = hashlib.sha256()
+        record = {
+            'version': CACHE_FORMAT_VERSION,
+            'name': stage.name,
+            'command': stage.command,
+            'params': stage.params,
+            'inputs': {path: self.hasher.hash_path(self._abs(path)) for path in self._expand(stage.inputs)},
+            'code': {path: self.hasher.hash_path(self._abs(path)) for path in self._expand(stage.code)},
+            # Salidas (no claves) de las dependencias: si una etapa se rehace con el mismo
+            # resultado, las posteriores siguen siendo válidas
+            'deps': {dep: self.manifest.get(dep, {}).get('outputs') for dep in stage.deps}
+        }
+        digest.update(json.dumps(record, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def is_fresh(self, stage: Stage, key: str) -> bool:
+        """La etapa está al día si su clave coincide y sus salidas siguen como se registraron."""
+        entry = self.manifest.get(stage.name)
+        if not entry or entry.get('key') != key:
+            return False
+        return self._output_hashes(stage) == entry.get('outputs')
+
+    def _run_stage(self, stage: Stage, force: bool) -> str:
+        key = self.stage_key(stage)
+        if not force and self.is_fresh(stage, key):
+            print(f" [{stage.name}] en caché, se omite")
+            return 'cached'
+
+        print(f" [{stage.name}] ejecutando: {' '.join(stage.command)}")
+        cwd = self._abs(stage.cwd)
+        os.makedirs(cwd, exist_ok=True)
+        start = time.perf_counter()
+        completed = subprocess.run(stage.command, cwd=cwd)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Etapa '{stage.name}' terminó con código {completed.returncode}")
+
+        outputs = self._output_hashes(stage)
+        missing = [path for path, value in outputs.items() if value is None]
+        if missing:
+            raise RuntimeError(f"Etapa '{stage.name}' no generó las salidas {missing}")
+
+        with self._manifest_lock:
+            self.manifest[stage.name] = {
+                'key': key,
+                'outputs': outputs,
+                'duration_s': round(time.perf_counter() - start, 3),
+                'finished_at': time.strftime("%Y-%m-%dT%H:%M:%S")
+            }
+            self._save_manifest()
+        print(f" [{stage.name}] completada en {self.manifest[stage.name]['duration_s']} s")
+        return 'built'
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _selected(self, targets: Optional[Sequence[str]]) -> List[str]:
+        """Etapas objetivo y todas sus dependencias."""
+        if not targets:
+            return list(self.stages)
+        selected, pending = set(), list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError(f"Etapa desconocida: {name}")
+            if name not in selected:
+                selected.add(name)
+                pending.extend(self.stages[name].deps)
+        return [name for name in self.stages if name in selected]
+
+    def run(self, targets: Optional[Sequence[str]] = None, force: Sequence[str] = ()) -> Dict[str, str]:
+        """
+        Ejecuta las etapas (y sus dependencias) en orden topológico, en paralelo cuando
+        sus dependencias ya han terminado.
+
+        Args:
+            targets: Etapas a construir (None = todas)
+            force: Etapas a rehacer aunque estén en caché
+
+        Returns:
+            Estado final de cada etapa: 'built', 'cached', 'failed' o 'skipped'
+        """
+        names = self._selected(targets)
+        status: Dict[str, str] = {}
+        remaining = {name: set(self.stages[name].deps) & set(names) for name in names}
+        running = {}
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while remaining or running:
+                    for name in [n for n, deps in remaining.items() if not deps]:
+                        del remaining[name]
+                        running[executor.submit(self._run_stage, self.stages[name], name in force)] = name
+
+                    if not running:
+                        # Lo que queda depende de etapas fallidas
+                        for name in remaining:
+                            status[name] = 'skipped'
+                        break
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        try:
+                            status[name] = future.result()
+                        except Exception as e:
+                            print(f" [{name}] error: {e}")
+                            status[name] = 'failed'
+                            continue
+                        for deps in remaining.values():
+                            deps.discard(name)
+        finally:
+            self.hasher.save()
+
+        return status
+
+
+def _notebook_stage(name: str, notebook: str, outputs: Sequence[str], inputs: Sequence[str] = (),
+                    code: Sequence[str] = (), deps: Sequence[str] = ()) -> Stage:
+    """Etapa que ejecuta un notebook con nbconvert, guardando la copia ejecutada en .build_cache/notebooks."""
+    return Stage(
+        name=name,
+        command=["jupyter", "nbconvert", "--to", "notebook", "--execute",
+                 "--ExecutePreprocessor.timeout=-1",
+                 "--output-dir", os.path.join("..", ".build_cache", "notebooks"),
+                 os.path.basename(notebook)],
+        outputs=outputs, inputs=inputs, code=[notebook, *code], deps=deps,
+        cwd=os.path.dirname(notebook)  # los notebooks usan rutas relativas (../data)
+    )
+
+
+def default_stages(root: str = project_root) -> List[Stage]:
+    """
+    Etapas del flujo completo del README: Zeek por pcap → dataset → preprocesado →
+    entrenamiento, y la ontología base (independiente de los datos).
+    """
+    zeek_stages = []
+    for traffic_type in ("normal", "ataques"):
+        for pcap in sorted(glob.glob(os.path.join(root, "Zeek-Pipeline", "pcaps", traffic_type, "*.pcap"))):
+            base_name = os.path.splitext(os.path.basename(pcap))[0]
+            logs_dir = os.path.join("Zeek-Pipeline", "zeek_logs", traffic_type, base_name)
+            zeek_stages.append(Stage(
+                name=f"zeek:{traffic_type}/{base_name}",
+                command=["zeek", "-r", os.path.relpath(pcap, os.path.join(root, logs_dir))],
+                inputs=[os.path.relpath(pcap, root)],
+                outputs=[logs_dir],
+                cwd=logs_dir
+            ))
+
+    stages = list(zeek_stages)
+    stages.append(Stage(
+        name="dataset",
+        command=[sys.executable, "dataset/build_ng_iiotset.py"],
+        outputs=["data/NG-IIoTset.csv"],
+        code=["dataset/build_ng_iiotset.py", "dataset/zeek_reader.py", "dataset/stratified_sampler.py",
+              "features/flow_window_features.py"],
+        deps=[stage.name for stage in zeek_stages]
+    ))
+    stages.append(_notebook_stage(
+        "preprocess", "notebooks/preprocess_NG-IIoTset.ipynb",
+        outputs=["data/ML_NG-IIoTset.pkl", "data/ML_NG-IIoTset.csv",
+                 "data/label_encoders.pkl", "data/target_encoder.pkl"],
+        code=["dataset/streaming_dedup.py", "features/feature_ranking.py"],
+        deps=["dataset"]
+    ))
+    stages.append(_notebook_stage(
+        "train", "notebooks/entrenamiento.ipynb",
+        outputs=["data/train_test_data.pkl",
+                 "models/modelo_RandomForest.pkl", "models/modelo_RandomForest_multi.pkl"],
+        deps=["preprocess"]
+    ))
+    stages.append(Stage(
+        name="ontology",
+        command=[sys.executable, "ontology/ontology_populator.py"],
+        inputs=["mapping/mapping_dict.json", "integration/mitigations_dict.json", "mapping/ics-attack.json"],
+        code=["ontology/ontology_populator.py", "mapping/stix_importer.py", "mapping/name_normalizer.py"],
+        outputs=["ontology/ids_iiot_ontologia.owl"]
+    ))
+    return stages
+
+
+def main():
+    """Construye los artefactos del proyecto reutilizando las etapas que no han cambiado."""
+    parser = argparse.ArgumentParser(description="Orquestador de construcción con caché por contenido")
+    parser.add_argument('targets', nargs='*', help="Etapas a construir (por defecto, todas)")
+    parser.add_argument('--force', nargs='*', default=[], help="Etapas a rehacer aunque estén en caché")
+    parser.add_argument('--jobs', type=int, default=4, help="Etapas en paralelo")
+    parser.add_argument('--list', action='store_true', help="Mostrar las etapas y su estado sin ejecutar")
+    args = parser.parse_args()
+
+    orchestrator = BuildOrchestrator(default_stages(), max_workers=args.jobs)
+
+    if args.list:
+        for name, stage in orchestrator.stages.items():
+            entry = orchestrator.manifest.get(name, {})
+            deps_ready = all(dep in orchestrator.manifest for dep in stage.deps)
+            state = 'desconocido'
+            if deps_ready:
+                state = 'en caché' if orchestrator.is_fresh(stage, orchestrator.stage_key(stage)) else 'pendiente'
+            print(f"  - {name:<40} {state:<12} {entry.get('finished_at', '')}")
+        orchestrator.hasher.save()
+        return
+
+    status = orchestrator.run(args.targets or None, force=args.force)
+    print("\n Resumen de la construcción:")
+    for name, state in status.items():
+        print(f"  - {name}: {state}")
+    if any(state in ('failed', 'skipped') for state in status.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
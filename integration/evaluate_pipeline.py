@@ -0,0 +1,197 @@
+import sys
+import os
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.append(os.path.join(project_root, 'mapping'))
+
+import json
+import time
+import argparse
+from typing import Dict, Any, Optional
+
+import numpy as np
+from sklearn.metrics import confusion_matrix, precision_recall_fscore_support
+
+from enhanced_mapper import EnhancedAttackMapper
+from integrated_ids_pipeline import MLHandler
+
+
+def _mapping_labels(labels: np.ndarray, mapper: EnhancedAttackMapper) -> np.ndarray:
+    """Etiquetas del dataset/modelo en el vocabulario del mapping ('normal' → 'Normal')."""
+    labels = np.asarray(labels, dtype=object)
+    labels = np.where(labels == 'normal', "Normal", labels)
+    known = np.isin(labels, mapper.labels)
+    if not known.all():
+        print(f" Labels fuera del mapping MITRE (se evalúan sin técnicas): {sorted(set(labels[~known]))}")
+    return np.where(known, labels, "Normal")
+
+
+class PipelineEvaluator:
+    """
+    Evaluación del pipeline (modelos binario + multiclase y mapping MITRE) sobre el X_test
+    completo en lotes vectorizados: matrices de confusión, precisión/recall por clase,
+    tasa de detección por técnica y rendimiento.
+    """
+
+    def __init__(self, ml_handler: MLHandler, mapper: EnhancedAttackMapper, chunk_size: int = 20000):
+        """
+        Inicializa el evaluador.
+
+        Args:
+            ml_handler: Manejador ML con los datos de test cargados
+            mapper: Mapper ML → MITRE
+            chunk_size: Filas por llamada vectorizada
+        """
+        self.ml_handler = ml_handler
+        self.mapper = mapper
+        self.chunk_size = chunk_size
+
+    def evaluate(self, sample: Optional[int] = None, seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Evalúa el pipeline sobre el X_test.
+
+        Args:
+            sample: Número de filas a evaluar (None = todas)
+            seed: Semilla para elegir las filas cuando se usa sample
+
+        Returns:
+            Informe con métricas, matrices de confusión y rendimiento
+        """
+        X_test = self.ml_handler.test_matrix
+        y_bin = np.asarray(self.ml_handler.test_data['y_test_bin']).astype(np.int8)
+        y_multi = np.asarray(self.ml_handler.test_data['y_test_multi'], dtype=object)
+
+        indices = np.arange(len(X_test))
+        sampled = sample is not None and sample < len(X_test)
+        if sampled:
+            indices = np.sort(np.random.default_rng(seed).choice(len(X_test), size=sample, replace=False))
+        print(f" Evaluando {len(indices):,} filas en lotes de {self.chunk_size:,}...")
+
+        pred_bin = np.empty(len(indices), dtype=np.int8)
+        pred_label = np.empty(len(indices), dtype=object)
+        start = time.perf_counter()
+        for chunk_start in range(0, len(indices), self.chunk_size):
+            chunk = indices[chunk_start:chunk_start + self.chunk_size]
+            # Sin muestreo, cada lote es un slice de la matriz de test (vista, sin copia)
+            rows = X_test[chunk] if sampled else X_test[chunk_start:chunk_start + len(chunk)]
+            ml = self.ml_handler.predict_batch(rows)
+            pred_bin[chunk_start:chunk_start + len(chunk)] = ml['binary_predicted']
+            pred_label[chunk_start:chunk_start + len(chunk)] = ml['final_label']
+        elapsed = time.perf_counter() - start
+
+        true_bin = y_bin[indices]
+        true_label = _mapping_labels(y_multi[indices], self.mapper)
+        pred_label = _mapping_labels(pred_label, self.mapper)
+
+        report = {
+            'rows': int(len(indices)),
+            'seed': seed,
+            'throughput': {
+                'seconds': elapsed,
+                'rows_per_second': len(indices) / elapsed if elapsed > 0 else float('inf')
+            },
+            'binary': self._classification_metrics(true_bin, pred_bin, [0, 1]),
+            'multiclass': self._classification_metrics(
+                true_label, pred_label, sorted(set(true_label) | set(pred_label))
+            ),
+            'techniques': self._technique_detection_rates(true_label, pred_label)
+        }
+        return report
+
+    @staticmethod
+    def _classification_metrics(y_true: np.ndarray, y_pred: np.ndarray, labels) -> Dict[str, Any]:
+        """Matriz de confusión y precisión/recall/F1 por clase."""
+        labels = list(labels)
+        precision, recall, f1, support = precision_recall_fscore_support(
+            y_true, y_pred, labels=labels, zero_division=0
+        )
+        return {
+            'labels': [str(label) for label in labels],
+            'confusion_matrix': confusion_matrix(y_true, y_pred, labels=labels).tolist(),
+            'accuracy': float(np.mean(y_true == y_pred)),
+            'per_class': {
+                str(label): {
+                    'precision': float(precision[i]),
+                    'recall': float(recall[i]),
+                    'f1': float(f1[i]),
+                    'support': int(support[i])
+                }
+                for i, label in enumerate(labels)
+            }
+        }
+
+    def _technique_detection_rates(self, true_label: np.ndarray, pred_label: np.ndarray) -> Dict[str, Any]:
+        """
+        Por técnica MITRE: de las filas cuyo ataque real implica la técnica,
+        proporción en la que la etiqueta predicha también la implica.
+        """
+        codes = self.mapper.label_codes
+        true_mask = self.mapper.label_technique_matrix[np.fromiter((codes[l] for l in true_label), np.int16,
+                                                                   len(true_label))]
+        pred_mask = self.mapper.label_technique_matrix[np.fromiter((codes[l] for l in pred_label), np.int16,
+                                                                   len(pred_label))]
+        expected = true_mask.sum(axis=0)
+        detected = (true_mask & pred_mask).sum(axis=0)
+        false_alarms = (~true_mask & pred_mask).sum(axis=0)
+
+        rates = {}
+        for j, tech_id in enumerate(self.mapper.technique_ids):
+            if expected[j] == 0 and false_alarms[j] == 0:
+                continue
+            rates[tech_id] = {
+                'expected': int(expected[j]),
+                'detected': int(detected[j]),
+                'detection_rate': float(detected[j] / expected[j]) if expected[j] else None,
+                'false_alarms': int(false_alarms[j])
+            }
+        return rates
+
+
+def print_report(report: Dict[str, Any]):
+    """Muestra un resumen legible del informe de evaluación."""
+    print(f"\n Filas evaluadas: {report['rows']:,} "
+          f"({report['throughput']['rows_per_second']:,.0f} filas/s, {report['throughput']['seconds']:.2f} s)")
+    print(f" Exactitud binaria: {report['binary']['accuracy']:.4f}")
+    print(f" Exactitud multiclase: {report['multiclass']['accuracy']:.4f}")
+
+    print("\n Precisión / recall por clase:")
+    for label, metrics in report['multiclass']['per_class'].items():
+        print(f"  - {label:<20} P={metrics['precision']:.4f} R={metrics['recall']:.4f} "
+              f"(n={metrics['support']:,})")
+
+    print("\n Tasa de detección por técnica:")
+    for tech_id, metrics in report['techniques'].items():
+        rate = metrics['detection_rate']
+        rate_text = f"{rate:.4f}" if rate is not None else "  n/a "
+        print(f"  - {tech_id}: {rate_text} ({metrics['detected']:,}/{metrics['expected']:,}, "
+              f"falsas alarmas: {metrics['false_alarms']:,})")
+
+
+def main():
+    """Evaluación reproducible del pipeline sobre el conjunto de test."""
+    parser = argparse.ArgumentParser(description="Evaluación por lotes del pipeline IDS sobre X_test")
+    parser.add_argument('--data', default="./data/train_test_data.pkl")
+    parser.add_argument('--binary-model', default="./models/modelo_RandomForest.pkl")
+    parser.add_argument('--multi-model', default="./models/modelo_RandomForest_multi.pkl")
+    parser.add_argument('--mapping', default="./mapping/mapping_dict.json")
+    parser.add_argument('--sample', type=int, default=None, help="Evaluar solo N filas elegidas al azar")
+    parser.add_argument('--seed', type=int, default=None, help="Semilla para --sample")
+    parser.add_argument('--chunk-size', type=int, default=20000)
+    parser.add_argument('--output', default=None, help="Guardar el informe en JSON")
+    args = parser.parse_args()
+
+    ml_handler = MLHandler(args.binary_model, args.multi_model, args.data)
+    mapper = EnhancedAttackMapper(args.mapping)
+
+    evaluator = PipelineEvaluator(ml_handler, mapper, chunk_size=args.chunk_size)
+    report = evaluator.evaluate(sample=args.sample, seed=args.seed)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n Informe guardado en: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
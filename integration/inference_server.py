@@ -0,0 +1,221 @@
+import sys
+import os
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(script_dir)
+
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Callable, Sequence
+
+import numpy as np
+
+from integrated_ids_pipeline import IntegratedIDSPipeline
+
+
+class MicroBatcher:
+    """
+    Agrupa las peticiones que llegan dentro de una ventana corta (p.ej. 2 ms o 256 filas)
+    en una única llamada vectorizada y reparte a cada petición su parte del resultado
+    (un slice del lote, sin copiar).
+    """
+
+    def __init__(self, process_fn: Callable[[List[Any]], Sequence],
+                 max_batch_rows: int = 256, max_wait_ms: float = 2.0):
+        """
+        Inicializa el agrupador.
+
+        Args:
+            process_fn: Función que procesa una lista de filas y devuelve un resultado indexable por fila
+            max_batch_rows: Filas a partir de las cuales se procesa el lote sin esperar
+            max_wait_ms: Espera máxima desde la primera petición del lote
+        """
+        self.process_fn = process_fn
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+        self.batches = 0
+        self.rows = 0
+
+    def submit(self, rows: Sequence[Any]) -> Future:
+        """Encola las filas de una petición (dicts o matriz); el Future devuelve sus resultados."""
+        future = Future()
+        self._queue.put((rows, future))
+        return future
+
+    @property
+    def queue_depth(self) -> int:
+        """Peticiones encoladas a la espera de formar lote (aproximado)."""
+        return self._queue.qsize()
+
+    def _collect(self):
+        """Bloquea hasta la primera petición y añade las que lleguen dentro de la ventana."""
+        pending = [self._queue.get()]
+        n_rows = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while n_rows < self.max_batch_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            n_rows += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            rows = [row for request_rows, _ in pending for row in request_rows]
+            try:
+                results = self.process_fn(rows)
+            except Exception as e:
+                self._run_each(pending, e)
+                continue
+
+            self.batches += 1
+            self.rows += len(rows)
+            start = 0
+            for request_rows, future in pending:
+                future.set_result(results[start:start + len(request_rows)])
+                start += len(request_rows)
+
+
+    def _run_each(self, pending, error: Exception):
+        """
+        Lote fallido: se reprocesa cada petición por separado para que solo falle la que
+        contiene la fila problemática y no las demás peticiones agrupadas con ella.
+        """
+        if len(pending) == 1:
+            pending[0][1].set_exception(error)
+            return
+        for request_rows, future in pending:
+            try:
+                result = self.process_fn(list(request_rows))
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            self.batches += 1
+            self.rows += len(request_rows)
+            future.set_result(result)
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /predict con {"rows": [{característica: valor, ...}, ...]} (o una sola fila como objeto).
+    GET /health devuelve el estado del servicio.
+    """
+
+    server_version = "IDSInference/1.0"
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': f"Ruta no encontrada: {self.path}"})
+            return
+        batcher = self.server.batcher
+        self._send_json(200, {'status': 'ok', 'batches': batcher.batches, 'rows': batcher.rows,
+                              'queue_depth': batcher.queue_depth})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send_json(404, {'error': f"Ruta no encontrada: {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {'error': f"JSON no válido: {e}"})
+            return
+
+        rows = payload.get('rows', [payload]) if isinstance(payload, dict) else payload
+        if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+            self._send_json(400, {'error': "Se esperaba 'rows': lista de objetos con las características"})
+            return
+
+        # Validación por petición: una fila incompleta no debe invalidar el lote compartido
+        required = self.server.required_features
+        for i, row in enumerate(rows):
+            missing = [f for f in required if f not in row]
+            if missing:
+                self._send_json(400, {'error': f"Fila {i}: faltan características {missing}"})
+                return
+
+        # Conversión por petición: un valor no numérico se rechaza aquí, fuera del lote compartido
+        try:
+            X = self.server.pipeline.ml_handler.to_matrix(rows)
+        except (ValueError, TypeError) as e:
+            self._send_json(400, {'error': f"Valores no numéricos en las características: {e}"})
+            return
+
+        try:
+            results = self.server.batcher.submit(X).result(timeout=self.server.request_timeout)
+        except Exception as e:
+            self._send_json(500, {'error': f"Error en inferencia: {e}"})
+            return
+        self._send_json(200, {'results': results.to_dicts()})
+
+    def log_message(self, format, *args):
+        # Sin una línea por petición: el servicio se usa con tasas altas
+        pass
+
+
+class InferenceServer(ThreadingHTTPServer):
+    """Servidor HTTP/JSON que mantiene un IntegratedIDSPipeline precargado."""
+
+    daemon_threads = True
+    request_queue_size = 128  # muchos agentes conectando a la vez
+
+    def __init__(self, address, pipeline: IntegratedIDSPipeline, max_batch_rows: int = 256,
+                 max_wait_ms: float = 2.0, request_timeout: float = 30.0):
+        super().__init__(address, InferenceRequestHandler)
+        self.pipeline = pipeline
+        self.required_features = pipeline.ml_handler.required_features()
+        self.request_timeout = request_timeout
+        # Cada petición llega ya como matriz float32 (filas validadas en el handler); el lote apila sus filas
+        self.batcher = MicroBatcher(lambda rows: pipeline.process_batch(np.stack(rows)),
+                                    max_batch_rows, max_wait_ms)
+
+
+def main():
+    """Arranca el servicio de inferencia local con modelos y ontología precargados."""
+    parser = argparse.ArgumentParser(description="Servicio HTTP de inferencia IDS con micro-batching")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-batch-rows', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    # Carga única de modelos, mapping e índice de mitigaciones de la ontología
+    pipeline = IntegratedIDSPipeline(train_test_data_path=None)
+    pipeline.preload()
+    server = InferenceServer((args.host, args.port), pipeline, args.max_batch_rows, args.max_wait_ms)
+
+    print(f" Servicio de inferencia escuchando en http://{args.host}:{args.port}/predict "
+          f"(lotes de hasta {args.max_batch_rows} filas / {args.max_wait_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n Deteniendo servicio de inferencia...")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,20 @@ import os
 script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(script_dir)
 sys.path.append(os.path.join(project_root, 'mapping'))
+sys.path.append(os.path.join(project_root, 'features'))
+sys.path.append(os.path.join(project_root, 'dataset'))
 
 from enhanced_mapper import EnhancedAttackMapper
-from amenaza_creator import AmenazaCreator
+from flow_window_features import SlidingWindowAggregator, WINDOW_FEATURES
+from alert_correlator import AlertCorrelator
+from threat_batch import ThreatBatch
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 import pickle
+import ipaddress
+import threading
+import weakref
+import warnings
 import pandas as pd
 import numpy as np
 
@@ -17,23 +25,118 @@ class MLHandler:
     """
     Maneja modelos ML para el sistema IDS.
     Carga modelos entrenados y realiza predicciones sobre muestras del dataset.
+    Las entradas se convierten una sola vez (al cargar o al recibirlas) a una matriz float32
+    C-contigua con el orden de columnas de los modelos; la inferencia trabaja sobre vistas de ella.
     """
     
     def __init__(self, 
                  binary_model_path: str = "./models/modelo_RandomForest.pkl",
                  multi_model_path: str = "./models/modelo_RandomForest_multi.pkl", 
-                 train_test_data_path: str = "./data/train_test_data.pkl"):
+                 train_test_data_path: Optional[str] = "./data/train_test_data.pkl"):
         """
         Inicializa el manejador ML del sistema IDS.
+        Con train_test_data_path=None no se cargan datos de test (modo servicio: solo predict_batch).
         """
-        print(" Cargando modelos ML...")
-        self.binary_model = self._load_model(binary_model_path, "Modelo Binario")
-        self.multi_model = self._load_model(multi_model_path, "Modelo Multiclase")
+        self.binary_model_path = binary_model_path
+        self.multi_model_path = multi_model_path
+        self._swap_lock = threading.Lock()
         
-        print(" Cargando datos de test...")
-        self.test_data = self._load_test_data(train_test_data_path)
+        print(" Cargando modelos ML...")
+        self._models = (
+            self._load_model(binary_model_path, "Modelo Binario"),
+            self._load_model(multi_model_path, "Modelo Multiclase")
+        )
+        self._model_mtimes = self._current_mtimes()
+        # Claves débiles: los modelos retirados por swap_models no quedan retenidos por la caché
+        self._column_cache: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.feature_order = self.required_features()
+        
+        self.test_matrix = None
+        self._warned_missing_hosts = False
+        if train_test_data_path is not None:
+            print(" Cargando datos de test...")
+            self.test_data = self._load_test_data(train_test_data_path)
+            X_test = self.test_data.get('X_test_original')
+            if X_test is not None:
+                if not self.feature_order:
+                    self.feature_order = list(X_test.columns)
+                self.test_matrix = self.to_matrix(X_test)
+                for model in self._models:
+                    self._model_columns(model)  # verifica el orden de columnas al cargar
+        else:
+            self.test_data = {}
         
         print(" Modelos ML cargados correctamente")
+    
+    @property
+    def binary_model(self):
+        return self._models[0]
+    
+    @property
+    def multi_model(self):
+        return self._models[1]
+    
+    def _current_mtimes(self) -> Tuple[Optional[int], Optional[int]]:
+        """Fecha de modificación de los ficheros de modelo (None si no existen)."""
+        mtimes = []
+        for path in (self.binary_model_path, self.multi_model_path):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+    
+    def swap_models(self, binary_model=None, multi_model=None):
+        """
+        Sustituye los modelos en caliente de forma atómica.
+        Las predicciones en curso terminan con la pareja anterior; las nuevas usan la nueva.
+        
+        Args:
+            binary_model: Nuevo modelo binario (None mantiene el actual)
+            multi_model: Nuevo modelo multiclase (None mantiene el actual)
+        """
+        for model in (binary_model, multi_model):
+            if model is not None and not hasattr(model, 'predict_proba'):
+                raise TypeError(f"{type(model).__name__} no implementa predict_proba")
+            if model is not None:
+                self._model_columns(model)  # las columnas del nuevo modelo deben estar en la matriz
+        
+        with self._swap_lock:
+            current_binary, current_multi = self._models
+            self._models = (
+                binary_model if binary_model is not None else current_binary,
+                multi_model if multi_model is not None else current_multi
+            )
+    
+    def check_for_updates(self) -> bool:
+        """
+        Recarga los modelos si sus ficheros han cambiado en disco (p.ej. tras
+        training/incremental_update.py). Los modelos se cargan por completo
+        antes del intercambio, así que un fallo de carga mantiene los actuales.
+        
+        Returns:
+            True si se intercambió algún modelo
+        """
+        mtimes = self._current_mtimes()
+        if mtimes == self._model_mtimes:
+            return False
+        
+        new_binary = new_multi = None
+        if mtimes[0] != self._model_mtimes[0]:
+            new_binary = self._load_model(self.binary_model_path, "Modelo Binario")
+        if mtimes[1] != self._model_mtimes[1]:
+            new_multi = self._load_model(self.multi_model_path, "Modelo Multiclase")
+        
+        self.swap_models(new_binary, new_multi)
+        # Solo avanza la fecha de los modelos cargados: uno leído a medio escribir se reintenta
+        self._model_mtimes = tuple(
+            mtime if model is not None or mtime == previous else previous
+            for mtime, previous, model in zip(mtimes, self._model_mtimes, (new_binary, new_multi))
+        )
+        swapped = new_binary is not None or new_multi is not None
+        if swapped:
+            print(" Modelos ML actualizados en caliente")
+        return swapped
         
     def _load_model(self, model_path: str, model_name: str):
         """Carga un modelo desde archivo pickle."""
@@ -46,6 +149,91 @@ class MLHandler:
             print(f" Error cargando {model_name}: {e}")
             return None
     
+    def _model_columns(self, model) -> Optional[np.ndarray]:
+        """
+        Posiciones en feature_order de las columnas que espera el modelo, o None si coinciden
+        con feature_order (caso habitual: el modelo recibe la matriz sin copiarla).
+        Un modelo compacto con menos características recibe una copia con sus columnas.
+        """
+        try:
+            return self._column_cache[model]
+        except (KeyError, TypeError):  # TypeError: modelo sin soporte de weakref (no se memoriza)
+            pass
+        
+        names = getattr(model, 'feature_names_in_', None)
+        if names is None:
+            n_features = getattr(model, 'n_features_in_', len(self.feature_order))
+            if self.feature_order and n_features != len(self.feature_order):
+                raise ValueError(f"{type(model).__name__} espera {n_features} características "
+                                 f"y la matriz tiene {len(self.feature_order)}")
+            columns = None
+        elif list(names) == self.feature_order:
+            columns = None
+        else:
+            position = {feature: i for i, feature in enumerate(self.feature_order)}
+            missing = [feature for feature in names if feature not in position]
+            if missing:
+                raise ValueError(f"{type(model).__name__} requiere características ausentes: {missing}")
+            columns = np.fromiter((position[feature] for feature in names), dtype=np.intp, count=len(names))
+        
+        try:
+            self._column_cache[model] = columns
+        except TypeError:
+            pass
+        return columns
+    
+    def _model_input(self, model, X: np.ndarray) -> np.ndarray:
+        """Entrada del modelo a partir de la matriz completa."""
+        columns = self._model_columns(model)
+        return X if columns is None else X[:, columns]
+    
+    def _predict_proba(self, model, X: np.ndarray) -> np.ndarray:
+        """
+        Probabilidades del modelo sobre la matriz completa. La matriz ya tiene el orden de
+        columnas verificado, así que se silencia (solo aquí) el aviso de sklearn por no
+        recibir nombres de columna.
+        """
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='X does not have valid feature names', category=UserWarning)
+            return model.predict_proba(self._model_input(model, X))
+    
+    def to_matrix(self, X) -> np.ndarray:
+        """
+        Convierte filas a la matriz float32 C-contigua en el orden feature_order
+        (el dtype con el que predicen los árboles de sklearn, así que no vuelven a convertirla).
+        
+        Args:
+            X: DataFrame, lista de diccionarios característica → valor, o matriz ya convertida
+            
+        Returns:
+            Matriz (filas x características); si X ya lo era, se devuelve sin copiar
+        """
+        if isinstance(X, np.ndarray):
+            if X.ndim != 2 or (self.feature_order and X.shape[1] != len(self.feature_order)):
+                raise ValueError(f"Matriz con forma {X.shape}: se esperaban {len(self.feature_order)} columnas")
+            return np.ascontiguousarray(X, dtype=np.float32)
+        
+        if isinstance(X, pd.DataFrame):
+            if not self.feature_order:
+                return np.ascontiguousarray(X.to_numpy(dtype=np.float32))
+            missing = [feature for feature in self.feature_order if feature not in X.columns]
+            if missing:
+                raise ValueError(f"Faltan características: {missing}")
+            return np.ascontiguousarray(X[self.feature_order].to_numpy(dtype=np.float32))
+        
+        order = self.feature_order
+        return np.array([[np.nan if row[feature] is None else row[feature] for feature in order] for row in X],
+                        dtype=np.float32, ndmin=2)
+    
+    def required_features(self) -> List[str]:
+        """Características que necesitan los modelos cargados (unión, en orden)."""
+        features = {}
+        for model in self._models:
+            names = getattr(model, 'feature_names_in_', None)
+            if names is not None:
+                features.update(dict.fromkeys(names))
+        return list(features)
+    
     def _load_test_data(self, data_path: str) -> Dict:
         """Carga los datos de test desde pickle."""
         try:
@@ -62,37 +250,63 @@ class MLHandler:
             print(f" Error cargando datos: {e}")
             return {}
     
+    def get_source_host(self, sample_index: int) -> str:
+        """
+        Host origen (id.orig_h) de una muestra de test, en formato IP si es posible.
+        Se toma de 'hosts_test' (guardado aparte de las características, por si id.orig_h no está
+        entre las seleccionadas) o, en datos antiguos, de la columna de X_test_original.
+        El preprocesado guarda las IPs como enteros. Sin host conocido se devuelve una clave propia
+        de la muestra: agrupar todas bajo un único host suprimiría alertas de atacantes distintos.
+        """
+        hosts = self.test_data.get('hosts_test')
+        if hosts is None:
+            X_test = self.test_data.get('X_test_original')
+            if X_test is not None and 'id.orig_h' in X_test.columns:
+                hosts = X_test['id.orig_h']
+        if hosts is None:
+            if not self._warned_missing_hosts:
+                self._warned_missing_hosts = True
+                print(" Aviso: los datos de test no incluyen id.orig_h (hosts_test); "
+                      "las alertas se correlacionan por muestra, no por host")
+            return f"muestra_{sample_index}"
+        value = hosts.iloc[sample_index] if hasattr(hosts, 'iloc') else hosts[sample_index]
+        try:
+            return str(ipaddress.ip_address(int(value)))
+        except (TypeError, ValueError):
+            return str(value)
+    
     def predict_sample(self, sample_index: int) -> Dict[str, Any]:
         """
         Predice una muestra específica usando los modelos entrenados.
         Realiza predicción binaria (ataque/normal) y multiclase (tipo de ataque).
         """
-        if not self.binary_model or not self.multi_model or not self.test_data:
+        # Pareja de modelos fija durante toda la predicción (hot-swap seguro)
+        binary_model, multi_model = self._models
+        if not binary_model or not multi_model or not self.test_data or self.test_matrix is None:
             return {"error": "Modelos o datos no cargados correctamente"}
         
         try:
-            # Obtener muestra
-            X_test = self.test_data['X_test_original']
+            # Obtener muestra (vista de una fila de la matriz, sin copia)
             y_test_bin = self.test_data['y_test_bin']
             y_test_multi = self.test_data['y_test_multi']
             
-            if sample_index >= len(X_test):
-                return {"error": f"Índice {sample_index} fuera de rango (max: {len(X_test)-1})"}
+            if sample_index >= len(self.test_matrix):
+                return {"error": f"Índice {sample_index} fuera de rango (max: {len(self.test_matrix)-1})"}
             
-            sample = X_test.iloc[sample_index:sample_index+1]
+            sample = self.test_matrix[sample_index:sample_index+1]
             true_bin = y_test_bin.iloc[sample_index]
             true_multi = y_test_multi.iloc[sample_index]
             
-            # Predicción binaria
-            bin_pred = self.binary_model.predict(sample)[0]
-            bin_proba = self.binary_model.predict_proba(sample)[0]
-            bin_confidence = float(max(bin_proba))
+            # Predicción binaria (una sola pasada por el bosque: la clase es el argmax de las probabilidades)
+            bin_proba = self._predict_proba(binary_model, sample)[0]
+            bin_pred = binary_model.classes_[bin_proba.argmax()]
+            bin_confidence = float(bin_proba.max())
             
             # Predicción multiclase (solo si se predijo ataque)
             if bin_pred == 1:  # Es ataque
-                multi_pred = self.multi_model.predict(sample)[0]
-                multi_proba = self.multi_model.predict_proba(sample)[0]
-                multi_confidence = float(max(multi_proba))
+                multi_proba = self._predict_proba(multi_model, sample)[0]
+                multi_pred = multi_model.classes_[multi_proba.argmax()]
+                multi_confidence = float(multi_proba.max())
                 final_label = multi_pred
                 final_confidence = multi_confidence
             else:  # No es ataque
@@ -125,6 +339,49 @@ class MLHandler:
             return {"error": f"Error en predicción: {e}"}
 
 
+    def predict_batch(self, X) -> Dict[str, np.ndarray]:
+        """
+        Predice un lote de filas con una llamada vectorizada por modelo.
+        El modelo multiclase solo se evalúa sobre las filas predichas como ataque.
+        
+        Args:
+            X: Matriz de to_matrix (o un slice de test_matrix), o filas a convertir (DataFrame / dicts)
+            
+        Returns:
+            Arrays alineados por fila: 'binary_predicted', 'binary_confidence',
+            'final_label' (object, "Normal" si no es ataque) y 'final_confidence'
+        """
+        binary_model, multi_model = self._models
+        if not binary_model or not multi_model:
+            raise RuntimeError("Modelos no cargados correctamente")
+        
+        X = self.to_matrix(X)
+        bin_proba = self._predict_proba(binary_model, X)
+        bin_best = bin_proba.argmax(axis=1)
+        bin_pred = binary_model.classes_[bin_best]
+        bin_confidence = bin_proba[np.arange(len(X)), bin_best]
+        
+        final_label = np.full(len(X), "Normal", dtype=object)
+        final_confidence = bin_confidence.copy()
+        
+        attack_rows = np.flatnonzero(bin_pred == 1)
+        if len(attack_rows):
+            attack_X = X if len(attack_rows) == len(X) else X[attack_rows]
+            multi_proba = self._predict_proba(multi_model, attack_X)
+            multi_best = multi_proba.argmax(axis=1)
+            labels = multi_model.classes_[multi_best].astype(object)
+            labels[labels == 'normal'] = "Normal"  # etiqueta del dataset
+            final_label[attack_rows] = labels
+            final_confidence[attack_rows] = multi_proba[np.arange(len(attack_rows)), multi_best]
+        
+        return {
+            'binary_predicted': bin_pred.astype(np.int8),
+            'binary_confidence': bin_confidence,
+            'final_label': final_label,
+            'final_confidence': final_confidence
+        }
+
+
 class IntegratedIDSPipeline:
     """
     Pipeline IDS completo para Industrial IoT:
@@ -133,21 +390,135 @@ class IntegratedIDSPipeline:
     3. Conecta automáticamente: Ataque → Técnica → Táctica → Mitigación
     """
     
-    def __init__(self):
-        """Inicializa el pipeline IDS integrado."""
+    def __init__(self, train_test_data_path: Optional[str] = "./data/train_test_data.pkl",
+                 retention_policy=None):
+        """
+        Inicializa el pipeline IDS integrado.
+        
+        Args:
+            train_test_data_path: Datos de test para process_sample_complete (None en modo servicio)
+            retention_policy: RetentionPolicy para las amenazas de la ontología (None = se conservan todas)
+        """
         print(" Inicializando Pipeline IDS Integrado...")
         
         # Manejador ML
-        self.ml_handler = MLHandler()
+        self.ml_handler = MLHandler(train_test_data_path=train_test_data_path)
         
         # Mapper para ML → MITRE
         self.mapper = EnhancedAttackMapper("./mapping/mapping_dict.json")
         
-        # Creador de amenazas ontológicas
-        self.amenaza_creator = AmenazaCreator()
+        # Creador de amenazas ontológicas: se crea con la primera amenaza
+        # (rdflib y la ontología no se cargan si todo el tráfico es normal)
+        self._amenaza_creator = None
+        self._retention_policy = retention_policy
+        self._technique_mitigations = None
+        self._ontology_lock = threading.Lock()
+        
+        # Agregador de ventana deslizante para registros conn.log en streaming
+        self.flow_aggregator = SlidingWindowAggregator(window_seconds=60.0)
+        
+        # Deduplicación de alertas por (host origen, ataque)
+        self.alert_correlator = AlertCorrelator()
         
         print(" Pipeline IDS Integrado listo")
     
+    @property
+    def amenaza_creator(self):
+        """Creador de amenazas ontológicas; importa rdflib y carga la ontología en el primer uso."""
+        if self._amenaza_creator is None:
+            with self._ontology_lock:
+                if self._amenaza_creator is None:
+                    from amenaza_creator import AmenazaCreator
+                    self._amenaza_creator = AmenazaCreator(retention=self._retention_policy)
+        return self._amenaza_creator
+    
+    @property
+    def technique_mitigations(self) -> Dict[str, List[Dict[str, str]]]:
+        """Tabla técnica → mitigaciones de la ontología (se construye en el primer uso)."""
+        if self._technique_mitigations is None:
+            self._technique_mitigations = self.amenaza_creator.get_technique_mitigations()
+        return self._technique_mitigations
+    
+    def preload(self):
+        """Carga por adelantado la ontología y sus índices (servicios de larga duración)."""
+        self.technique_mitigations
+    
+    def add_window_features(self, conn_record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Añade a un registro conn.log en vivo las características de ventana por host,
+        calculadas igual que en la construcción del dataset.
+        
+        Args:
+            conn_record: Registro con ts, id.orig_h, id.resp_h, id.resp_p, conn_state, orig_bytes, resp_bytes
+            
+        Returns:
+            El mismo registro con las columnas WINDOW_FEATURES añadidas
+        """
+        values = self.flow_aggregator.update(
+            float(conn_record['ts']), conn_record['id.orig_h'], conn_record['id.resp_h'],
+            conn_record.get('id.resp_p'), conn_record.get('conn_state'),
+            conn_record.get('orig_bytes'), conn_record.get('resp_bytes')
+        )
+        conn_record.update(zip(WINDOW_FEATURES, values))
+        return conn_record
+    
+    def merged_sensor_stream(self, sensor_dirs: Dict[str, str], batch_size: int = 10000, **merge_kwargs):
+        """
+        Flujo único ordenado por ts de las conexiones de varios sensores Zeek (fusión k-way con
+        unión por uid de modbus/mqtt), con las características de ventana del agregador en vivo
+        del pipeline.
+        
+        Args:
+            sensor_dirs: Directorio de logs de cada sensor (nombre → ruta)
+            batch_size: Conexiones por bloque
+            **merge_kwargs: Parámetros de MultiSensorMerger (clock_offsets, skew_tolerance, join_window...)
+            
+        Returns:
+            Iterador de DataFrames de conexiones en orden temporal
+        """
+        from stream_merge import MultiSensorMerger
+        merger = MultiSensorMerger(sensor_dirs, aggregator=self.flow_aggregator, **merge_kwargs)
+        return merger.iter_frames(batch_size)
+    
+    def process_batch(self, X, sample_indices: Optional[np.ndarray] = None) -> ThreatBatch:
+        """
+        Procesa un lote de filas de características: ML vectorizado → técnicas MITRE → mitigaciones.
+        No crea individuos en la ontología. El resultado es columnar (ThreatBatch);
+        los diccionarios por fila se crean solo al exportar con to_dicts().
+        
+        Args:
+            X: Matriz de MLHandler.to_matrix, o filas a convertir (DataFrame / lista de dicts)
+            sample_indices: Índice de muestra de cada fila (opcional)
+            
+        Returns:
+            ThreatBatch con etiqueta, confianza y códigos de técnica por fila
+        """
+        ml = self.ml_handler.predict_batch(X)
+        labels = ml['final_label']
+        
+        known = np.isin(labels, self.mapper.labels)
+        mapped = self.mapper.map_batch(np.where(known, labels, "Normal"), ml['final_confidence'])
+        label_codes = mapped['label_codes']
+        
+        # Etiquetas fuera del mapping: conservan su nombre (vocabulario adicional del lote), sin técnicas
+        extra_labels = ()
+        if not known.all():
+            extra_labels, inverse = np.unique(labels[~known].astype(str), return_inverse=True)
+            extra_labels = tuple(extra_labels.tolist())
+            print(f" Labels fuera del mapping MITRE (sin técnicas): {list(extra_labels)}")
+            label_codes[~known] = len(self.mapper.labels) + inverse.reshape(-1)
+        
+        # Las mitigaciones (y por tanto la ontología) solo hacen falta si hay ataques
+        has_attacks = bool(mapped['technique_mask'].any())
+        return ThreatBatch.from_predictions(ml, label_codes, self.mapper,
+                                            self.technique_mitigations if has_attacks else None,
+                                            sample_indices, extra_labels=extra_labels)
+    
+    def process_test_samples(self, sample_indices) -> ThreatBatch:
+        """ThreatBatch de filas de X_test (test_matrix) en una sola pasada vectorizada por modelo."""
+        indices = np.asarray(sample_indices, dtype=np.int64)
+        return self.process_batch(self.ml_handler.test_matrix[indices], indices)
+    
     def process_sample_complete(self, sample_index: int) -> Dict[str, Any]:
         """
         Procesa una muestra completa del dataset: ML → Ontología → AmenazaDetectada.
@@ -159,33 +530,38 @@ class IntegratedIDSPipeline:
             Diccionario con resultados completos del procesamiento
         """
         print(f"\n Procesando muestra {sample_index} completa...")
-    
-        # 1. PREDICCIÓN ML
-        ml_result = self.ml_handler.predict_sample(sample_index)
-        
-        if "error" in ml_result:
-            return {"error": f"Error ML: {ml_result['error']}"}
         
-        # 2. MAPEO A MITRE (solo si necesario)
-        final_label = ml_result['final_label']
-        final_confidence = ml_result['final_confidence']
+        test_matrix = self.ml_handler.test_matrix
+        if test_matrix is None or not self.ml_handler.test_data:
+            return {"error": "Error ML: Modelos o datos no cargados correctamente"}
+        if not 0 <= sample_index < len(test_matrix):
+            return {"error": f"Error ML: Índice {sample_index} fuera de rango (max: {len(test_matrix)-1})"}
         
-        mitre_techniques = []
-        if final_label != "Normal":
-            try:
-                mitre_techniques = self.mapper.map(final_label, final_confidence)
-            except KeyError:
-                print(f" Label '{final_label}' no encontrado en mapping MITRE")
+        # 1-2. PREDICCIÓN ML Y MAPEO A MITRE (lote columnar de una fila)
+        try:
+            batch = self.process_test_samples([sample_index])
+        except Exception as e:
+            return {"error": f"Error ML: Error en predicción: {e}"}
+        return self._process_batch_row(batch, 0)
+    
+    def _process_batch_row(self, batch: ThreatBatch, i: int,
+                           cache: Optional[Dict[int, tuple]] = None) -> Dict[str, Any]:
+        """
+        Ontología, correlación y salida de la fila i de un ThreatBatch de X_test.
+        El diccionario de la fila se materializa una sola vez (record) y se reutiliza en la salida.
+        """
+        record = batch.record(i, cache)
+        sample_index = record['sample_index']
+        final_label = record['final_label']
+        is_attack = bool(batch.is_attack[i])
         
         # 3. CREAR AMENAZA EN ONTOLOGÍA (si es ataque)
         amenaza_uri = None
         ontology_created = False
         
-        if final_label != "Normal":
+        if is_attack:
             try:
-                amenaza_uri = self.amenaza_creator.create_amenaza_detectada(
-                    ml_result, sample_index
-                )
+                amenaza_uri = self.amenaza_creator.create_amenaza_detectada(record, sample_index)
                 ontology_created = True
                 print(f" Amenaza creada en ontología: {amenaza_uri}")
             except Exception as e:
@@ -197,27 +573,45 @@ class IntegratedIDSPipeline:
         # 4. OBTENER INFORMACIÓN ONTOLÓGICA COMPLETA
         ontology_info = self._get_ontology_info(amenaza_uri, final_label)
         
-        # 5. RESULTADO INTEGRADO
-        complete_result = {
+        # 5. CORRELACIÓN DE ALERTAS (una alerta por transición de estado o umbral de tasa)
+        alert = None
+        if is_attack:
+            alert = self.alert_correlator.observe(
+                self.ml_handler.get_source_host(sample_index), final_label
+            )
+        
+        # 6. RESULTADO INTEGRADO
+        test_data = self.ml_handler.test_data
+        return {
             'sample_info': {
                 'index': sample_index,
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': record['detected_at'],
                 'pipeline_version': 'IDS_Integrado_v1.0'
             },
-            'ml_stage': ml_result,
+            'ml_stage': {
+                'sample_index': sample_index,
+                'ground_truth': {
+                    'binary': int(test_data['y_test_bin'].iloc[sample_index]),
+                    'multiclass': test_data['y_test_multi'].iloc[sample_index]
+                },
+                'binary_prediction': {
+                    'predicted': record['binary_prediction'],
+                    'confidence': record['binary_confidence']
+                },
+                'final_label': final_label,
+                'final_confidence': record['final_confidence']
+            },
             'mitre_stage': {
-                'techniques_found': len(mitre_techniques),
-                'techniques': mitre_techniques
+                'techniques_found': len(record['techniques']),
+                'techniques': record['techniques']
             },
             'ontology_stage': {
                 'amenaza_created': ontology_created,
                 'amenaza_uri': str(amenaza_uri) if amenaza_uri else None,
                 'ontology_info': ontology_info
             },
-            'summary': self._generate_summary(ml_result, ontology_info, ontology_created)
+            'summary': self._generate_summary(record, ontology_info, ontology_created, alert)
         }
-        
-        return complete_result
     
     def _get_ontology_info(self, amenaza_uri: str, attack_label: str) -> Dict[str, Any]:
         """
@@ -241,26 +635,8 @@ class IntegratedIDSPipeline:
         
         try:
             # 1. Consulta básica: ataque, técnicas y tácticas (siempre existen)
-            basic_query = f"""
-            PREFIX ids: <{self.amenaza_creator.namespace}>
-            SELECT DISTINCT 
-                ?ataque ?ataqueNombre
-                ?tecnica ?tecnicaID ?tecnicaNombre 
-                ?tactica ?tacticaNombre
-            WHERE {{
-                <{amenaza_uri}> ids:esAtaque ?ataque .
-                ?ataque ids:tieneNombre ?ataqueNombre .
-                
-                <{amenaza_uri}> ids:utilizaTecnica ?tecnica .
-                ?tecnica ids:tieneID ?tecnicaID .
-                ?tecnica ids:tieneNombre ?tecnicaNombre .
-                
-                <{amenaza_uri}> ids:utilizaTactica ?tactica .
-                ?tactica ids:tieneNombre ?tacticaNombre .
-            }}
-            """
-            
-            basic_results = self.amenaza_creator.graph.query(basic_query)
+            queries = self.amenaza_creator.queries
+            basic_results = queries.threat_summary(amenaza_uri)
             
             # Procesar resultados básicos
             attack_info = None
@@ -295,19 +671,7 @@ class IntegratedIDSPipeline:
             # 2. Consulta separada para mitigaciones (pueden no existir)
             mitigations = []
             try:
-                mitigation_query = f"""
-                PREFIX ids: <{self.amenaza_creator.namespace}>
-                SELECT DISTINCT 
-                    ?mitigacion ?mitigacionID ?mitigacionNombre ?mitigacionDesc
-                WHERE {{
-                    <{amenaza_uri}> ids:mitigacionRecomendada ?mitigacion .
-                    ?mitigacion ids:tieneID ?mitigacionID .
-                    ?mitigacion ids:tieneNombre ?mitigacionNombre .
-                    ?mitigacion ids:tieneDescripcion ?mitigacionDesc .
-                }}
-                """
-                
-                mitigation_results = self.amenaza_creator.graph.query(mitigation_query)
+                mitigation_results = queries.threat_mitigations(amenaza_uri)
                 
                 for row in mitigation_results:
                     mitigation_info = {
@@ -342,7 +706,8 @@ class IntegratedIDSPipeline:
                 'mitigations': []
             }
     
-    def _generate_summary(self, ml_result: Dict, ontology_info: Dict, ontology_created: bool) -> Dict[str, Any]:
+    def _generate_summary(self, ml_result: Dict, ontology_info: Dict, ontology_created: bool,
+                          alert: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Genera resumen ejecutivo del procesamiento de la muestra.
         
@@ -350,6 +715,7 @@ class IntegratedIDSPipeline:
             ml_result: Resultados de la predicción ML
             ontology_info: Información extraída de la ontología
             ontology_created: Si se creó un individuo AmenazaDetectada
+            alert: Decisión del AlertCorrelator (None = emitir siempre)
             
         Returns:
             Resumen estructurado con información clave
@@ -363,42 +729,51 @@ class IntegratedIDSPipeline:
                 'action_required': False
             }
         
-        # Para ataques
+        # Para ataques: solo requieren acción las alertas emitidas (las repetidas se suprimen)
+        action_required = alert is None or alert['emit']
         summary = {
             'type': 'threat_detected',
             'attack_type': ml_result['final_label'],
             'confidence': ml_result['final_confidence'],
-            'action_required': True,
+            'action_required': action_required,
             'ontology_integrated': ontology_created
         }
+        if alert is not None:
+            summary['alert'] = alert
         
         if ontology_info['type'] == 'threat_detected':
             summary.update({
                 'techniques_count': len(ontology_info['techniques']),
                 'tactics_count': len(ontology_info['tactics']),
-                'mitigations_available': len(ontology_info['mitigations']),
-                'immediate_actions': [m['name'] for m in ontology_info['mitigations'][:3]]
+                'mitigations_available': len(ontology_info['mitigations'])
             })
+            if action_required:
+                summary['immediate_actions'] = [m['name'] for m in ontology_info['mitigations'][:3]]
         
         return summary
     
-    def process_random_samples(self, num_samples: int = 5) -> List[Dict[str, Any]]:
+    def process_random_samples(self, num_samples: int = 5, seed: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Procesa un conjunto de muestras aleatorias del dataset de test.
+        Para evaluar el X_test completo usar integration/evaluate_pipeline.py.
         
         Args:
             num_samples: Número de muestras aleatorias a procesar
+            seed: Semilla para reproducir la selección de muestras
             
         Returns:
             Lista con resultados del procesamiento de cada muestra
         """
         import random
         
+        # Recoger modelos actualizados en disco antes de empezar el lote
+        self.ml_handler.check_for_updates()
+        
         # Obtener tamaño del dataset de test
         X_test_size = len(self.ml_handler.test_data['X_test_original'])
         
         # Generar índices aleatorios
-        random_indices = random.sample(range(X_test_size), min(num_samples, X_test_size))
+        random_indices = random.Random(seed).sample(range(X_test_size), min(num_samples, X_test_size))
         
         print(f"\n Procesando {len(random_indices)} muestras aleatorias del X_test...")
         print(f" Índices seleccionados: {random_indices}")
@@ -408,11 +783,15 @@ class IntegratedIDSPipeline:
         threats_created = 0
         normal_behavior = 0
         
+        # ML y mapeo MITRE de todas las muestras en un único ThreatBatch
+        batch = self.process_test_samples(random_indices)
+        cache: Dict[int, tuple] = {}
+        
         for i, sample_index in enumerate(random_indices):
             print(f"\n Muestra {i+1}/{len(random_indices)} (índice {sample_index})...")
             
             # FLUJO COMPLETO: X_test → ML → Ontología
-            result = self.process_sample_complete(sample_index)
+            result = self._process_batch_row(batch, i, cache)
             results.append(result)
             
             # Contadores
@@ -426,17 +805,61 @@ class IntegratedIDSPipeline:
         print(f"  - Comportamiento normal: {normal_behavior}")
         print(f"  - Total procesado: {len(results)}")
         
+        alert_stats = self.alert_correlator.get_statistics()
+        print(f"  - Alertas emitidas: {alert_stats['alerts_emitted']} "
+              f"(suprimidas por duplicado: {alert_stats['alerts_suppressed']})")
+
+        top_techniques = []
+        if self._amenaza_creator is not None:
+            top_techniques = self._amenaza_creator.top_techniques(n=3, last_seconds=3600)
+        if top_techniques:
+            print(f"  - Técnicas más frecuentes (última hora): "
+                  f"{', '.join(f'{tech} ({count})' for tech, count in top_techniques)}")
+
         return results
     
-    def save_ontology_with_threats(self, output_path: str = None) -> str:
-        """Guarda la ontología actualizada con las amenazas creadas."""
+    def save_ontology_with_threats(self, output_path: str = None, export_parquet: bool = True) -> str:
+        """
+        Guarda la ontología actualizada con las amenazas creadas y, junto a ella, una tabla
+        Parquet con una fila por amenaza para análisis (si pyarrow está instalado).
+        """
         if output_path is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_path = f"./ontology/ids_iiot_ontologia_with_threats_{timestamp}.owl"
         
         saved_path = self.amenaza_creator.save_updated_ontology(output_path)
         print(f" Ontología con amenazas guardada: {saved_path}")
+        
+        if export_parquet:
+            self.export_threats(os.path.splitext(saved_path)[0] + '.parquet')
         return saved_path
+    
+    def threat_exporter(self, output_path: str, **kwargs):
+        """
+        Exportador Parquet con los códigos del mapper, para añadir por grupos de filas
+        los ThreatBatch de process_batch (o las amenazas de la ontología) a medida que se generan.
+        """
+        from threat_export import ThreatParquetWriter
+        return ThreatParquetWriter.for_mapper(output_path, self.mapper, self.technique_mitigations, **kwargs)
+    
+    def export_threats(self, output_path: str, **filters) -> Optional[str]:
+        """
+        Exporta las amenazas creadas en la ontología a Parquet (desde los índices, sin serializar RDF).
+        
+        Args:
+            output_path: Ruta del fichero Parquet
+            **filters: Filtros de ThreatIndex.query (label, technique, since, until...)
+        """
+        # Etiquetas de amenazas fuera del mapping (p.ej. del modelo multiclase) con código propio
+        labels = [label for label, _ in self.amenaza_creator.threat_index.top_labels(n=None)]
+        try:
+            writer = self.threat_exporter(output_path, extra_labels=labels)
+        except ImportError as e:
+            print(f" Exportación Parquet omitida: {e}")
+            return None
+        with writer:
+            writer.write_amenazas(self.amenaza_creator, **filters)
+        return output_path
 
 
 def main():
@@ -0,0 +1,268 @@
+import weakref
+from typing import Dict, List, Any, Optional, Tuple
+
+from rdflib import Graph, Namespace, URIRef
+from rdflib.namespace import RDF, OWL
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.store import TripleAddedEvent, TripleRemovedEvent
+
+
+# Propiedades de la ontología base (ataque → técnica → táctica / mitigación) que no cambian
+# al registrar amenazas: los resultados que solo dependen de ellas se memorizan
+STATIC_PREDICATES = (
+    'implementa_tecnica', 'pertenece_a_tactica', 'mitigada_por',
+    'implementa_tactica', 'se_mitiga_con',
+    'tieneID', 'tieneNombre', 'tieneDescripcion'
+)
+
+# Consultas SPARQL parametrizadas: las URIs se enlazan con initBindings, nunca se interpolan en el texto
+QUERIES = {
+    'attack_techniques': """
+        SELECT ?tecnica ?tecID ?tecNombre ?tactica
+        WHERE {
+            ?ataque ids:implementa_tecnica ?tecnica .
+            ?tecnica ids:tieneID ?tecID .
+            ?tecnica ids:tieneNombre ?tecNombre .
+            ?tecnica ids:pertenece_a_tactica ?tacticaURI .
+            ?tacticaURI ids:tieneNombre ?tactica .
+        }
+    """,
+    'attack_tactics': """
+        SELECT ?tactica
+        WHERE {
+            ?ataque ids:implementa_tactica ?tactica .
+        }
+    """,
+    'attack_mitigations': """
+        SELECT ?mitigacion
+        WHERE {
+            ?ataque ids:se_mitiga_con ?mitigacion .
+        }
+    """,
+    'technique_tactics': """
+        SELECT ?tactica
+        WHERE {
+            ?tecnica ids:pertenece_a_tactica ?tactica .
+        }
+    """,
+    'technique_mitigations': """
+        SELECT ?mitigacion
+        WHERE {
+            ?tecnica ids:mitigada_por ?mitigacion .
+        }
+    """,
+    'technique_mitigation_table': """
+        SELECT ?tecID ?mitID ?mitNombre
+        WHERE {
+            ?tecnica ids:tieneID ?tecID .
+            ?tecnica ids:mitigada_por ?mitigacion .
+            ?mitigacion ids:tieneID ?mitID .
+            ?mitigacion ids:tieneNombre ?mitNombre .
+        }
+        ORDER BY ?tecID ?mitID
+    """,
+    'existing_amenazas': """
+        SELECT ?amenaza ?label ?conf ?fecha ?indice ?tecID ?tactica ?mitigacion
+        WHERE {
+            ?amenaza a ids:AmenazaDetectada .
+            OPTIONAL { ?amenaza ids:esAtaque ?ataque . ?ataque ids:tieneNombre ?label }
+            OPTIONAL { ?amenaza ids:tieneConfianza ?conf }
+            OPTIONAL { ?amenaza ids:detectadaEn ?fecha }
+            OPTIONAL { ?amenaza ids:indiceMuestra ?indice }
+            OPTIONAL { ?amenaza ids:utilizaTecnica ?tecnica . ?tecnica ids:tieneID ?tecID }
+            OPTIONAL { ?amenaza ids:utilizaTactica ?tactica }
+            OPTIONAL { ?amenaza ids:mitigacion_recomendada ?mitigacion }
+        }
+    """,
+    'threat_summary': """
+        SELECT DISTINCT
+            ?ataque ?ataqueNombre
+            ?tecnica ?tecnicaID ?tecnicaNombre
+            ?tactica ?tacticaNombre
+        WHERE {
+            ?amenaza ids:esAtaque ?ataque .
+            ?ataque ids:tieneNombre ?ataqueNombre .
+
+            ?amenaza ids:utilizaTecnica ?tecnica .
+            ?tecnica ids:tieneID ?tecnicaID .
+            ?tecnica ids:tieneNombre ?tecnicaNombre .
+
+            ?amenaza ids:utilizaTactica ?tactica .
+            ?tactica ids:tieneNombre ?tacticaNombre .
+        }
+    """,
+    'threat_mitigations': """
+        SELECT DISTINCT
+            ?mitigacion ?mitigacionID ?mitigacionNombre ?mitigacionDesc
+        WHERE {
+            ?amenaza ids:mitigacion_recomendada ?mitigacion .
+            ?mitigacion ids:tieneID ?mitigacionID .
+            ?mitigacion ids:tieneNombre ?mitigacionNombre .
+            ?mitigacion ids:tieneDescripcion ?mitigacionDesc .
+        }
+    """,
+}
+
+# Consultas cuyo resultado depende solo de STATIC_PREDICATES
+STATIC_QUERIES = frozenset({
+    'attack_techniques', 'attack_tactics', 'attack_mitigations',
+    'technique_tactics', 'technique_mitigations', 'technique_mitigation_table'
+})
+
+
+class _MutationListener:
+    """
+    Suscriptor a los eventos del store que invalida la caché al modificarse la ontología base.
+    Guarda una referencia débil y no se serializa (un grafo copiado con pickle no arrastra la caché).
+    """
+
+    def __init__(self, queries: Optional["OntologyQueries"]):
+        self._queries = weakref.ref(queries) if queries is not None else None
+
+    def __call__(self, event):
+        queries = self._queries() if self._queries is not None else None
+        if queries is not None:
+            queries.notify_mutation(event.triple)
+
+    def __reduce__(self):
+        return (_MutationListener, (None,))
+
+
+class OntologyQueries:
+    """
+    Capa de consultas SPARQL sobre la ontología: cada consulta se analiza una sola vez
+    (prepareQuery) y se ejecuta enlazando URIs con initBindings. Los resultados del
+    subgrafo estático (ataque → técnica → táctica / mitigación) se memorizan y se
+    invalidan cuando cambia alguna de sus propiedades.
+    """
+
+    def __init__(self, graph: Graph, namespace: Namespace):
+        """
+        Inicializa la capa de consultas.
+
+        Args:
+            graph: Grafo de la ontología
+            namespace: Namespace ids de la ontología
+        """
+        self.graph = graph
+        self.namespace = namespace
+        self._prepared = {name: prepareQuery(text, initNs={'ids': namespace}) for name, text in QUERIES.items()}
+        self._static_predicates = frozenset(namespace[name] for name in STATIC_PREDICATES)
+        self._cache: Dict[Tuple, List[Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._removed_since_compaction = 0
+        self._subscribe(graph)
+
+    def notify_mutation(self, triple: Tuple):
+        """Invalida la caché si el triple modificado pertenece al subgrafo estático."""
+        predicate = triple[1]
+        if self._cache and (predicate is None or predicate in self._static_predicates):
+            self.invalidate()
+
+    def invalidate(self):
+        """Descarta todos los resultados memorizados."""
+        self._cache.clear()
+
+    def remove(self, triple_pattern: Tuple):
+        """Elimina triples del grafo (el store en memoria no emite eventos al borrar)."""
+        self.graph.remove(triple_pattern)
+        self.notify_mutation(triple_pattern)
+
+    def remove_triples(self, triples: List[Tuple]) -> Graph:
+        """
+        Elimina triples concretos del grafo. El store en memoria deja entradas vacías en sus
+        índices tras cada borrado, así que cuando lo eliminado desde la última compactación
+        iguala al tamaño del grafo se reconstruye en un grafo nuevo (compact).
+
+        Returns:
+            Grafo vigente (uno nuevo si se ha compactado)
+        """
+        graph = self.graph
+        static = False
+        for triple in triples:
+            graph.remove(triple)
+            static = static or triple[1] in self._static_predicates
+        if static:
+            self.invalidate()
+
+        self._removed_since_compaction += len(triples)
+        if self._removed_since_compaction >= len(graph):
+            self.compact()
+        return self.graph
+
+    def compact(self) -> Graph:
+        """
+        Copia el grafo a uno nuevo (solo API pública de rdflib) para liberar los índices
+        que el store en memoria no reduce al borrar. Conserva los prefijos y la caché.
+        """
+        compacted = Graph()
+        for prefix, namespace in self.graph.namespaces():
+            compacted.bind(prefix, namespace, override=True, replace=True)
+        for triple in self.graph:
+            compacted.add(triple)
+        self.graph = compacted
+        self._subscribe(compacted)
+        self._removed_since_compaction = 0
+        return compacted
+
+    def _subscribe(self, graph: Graph):
+        """Suscribe la invalidación de la caché a los eventos del store del grafo."""
+        listener = _MutationListener(self)
+        graph.store.dispatcher.subscribe(TripleAddedEvent, listener)
+        graph.store.dispatcher.subscribe(TripleRemovedEvent, listener)
+
+    def run(self, name: str, **bindings) -> List[Any]:
+        """
+        Ejecuta una consulta preparada.
+
+        Args:
+            name: Nombre de la consulta (QUERIES)
+            **bindings: Variables a enlazar (p.ej. tecnica=URIRef(...))
+
+        Returns:
+            Lista de filas del resultado
+        """
+        if name not in STATIC_QUERIES:
+            return list(self.graph.query(self._prepared[name], initBindings=bindings))
+
+        key = (name, tuple(sorted(bindings.items())))
+        rows = self._cache.get(key)
+        if rows is None:
+            self.misses += 1
+            rows = self._cache[key] = list(self.graph.query(self._prepared[name], initBindings=bindings))
+        else:
+            self.hits += 1
+        return rows
+
+    def attack_techniques(self, attack_uri: URIRef) -> List[Any]:
+        """Técnicas (con ID, nombre y nombre de táctica) que implementa un ataque."""
+        return self.run('attack_techniques', ataque=attack_uri)
+
+    def has_derived_closure(self) -> bool:
+        """Si la ontología incluye las relaciones derivadas implementa_tactica / se_mitiga_con."""
+        return (self.namespace.implementa_tactica, RDF.type, OWL.ObjectProperty) in self.graph
+
+    def attack_tactics(self, attack_uri: URIRef) -> List[URIRef]:
+        """Tácticas de un ataque (relación derivada, un salto)."""
+        return [row.tactica for row in self.run('attack_tactics', ataque=attack_uri)]
+
+    def attack_mitigations(self, attack_uri: URIRef) -> List[URIRef]:
+        """Mitigaciones de un ataque (relación derivada, un salto)."""
+        return [row.mitigacion for row in self.run('attack_mitigations', ataque=attack_uri)]
+
+    def technique_tactics(self, technique_uri: URIRef) -> List[URIRef]:
+        """Tácticas a las que pertenece una técnica."""
+        return [row.tactica for row in self.run('technique_tactics', tecnica=technique_uri)]
+
+    def technique_mitigations(self, technique_uri: URIRef) -> List[URIRef]:
+        """Mitigaciones de una técnica."""
+        return [row.mitigacion for row in self.run('technique_mitigations', tecnica=technique_uri)]
+
+    def threat_summary(self, amenaza_uri: URIRef) -> List[Any]:
+        """Ataque, técnicas y tácticas de una amenaza detectada."""
+        return self.run('threat_summary', amenaza=URIRef(amenaza_uri))
+
+    def threat_mitigations(self, amenaza_uri: URIRef) -> List[Any]:
+        """Mitigaciones recomendadas (con ID, nombre y descripción) de una amenaza detectada."""
+        return self.run('threat_mitigations', amenaza=URIRef(amenaza_uri))
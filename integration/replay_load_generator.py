@@ -0,0 +1,502 @@
+import sys
+import os
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.append(script_dir)
+sys.path.append(os.path.join(project_root, 'features'))
+sys.path.append(os.path.join(project_root, 'dataset'))
+
+import json
+import time
+import ipaddress
+import argparse
+import threading
+from typing import Dict, List, Any, Optional, Iterator, Callable, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from integrated_ids_pipeline import IntegratedIDSPipeline, MLHandler
+from inference_server import MicroBatcher
+from flow_window_features import capture_window_features
+from zeek_reader import iter_zeek_log, find_zeek_logs
+from build_ng_iiotset import LOG_COLUMNS
+
+try:
+    import resource
+except ImportError:  # no disponible en Windows
+    resource = None
+
+
+# Bloques de la fuente: (ts por fila o None, matriz float32 en el orden de los modelos)
+ReplayChunk = Tuple[Optional[np.ndarray], np.ndarray]
+
+# Columnas IP que preprocess_NG-IIoTset convierte a entero
+IP_COLUMNS = ('id.orig_h', 'id.resp_h')
+
+
+def _rss_bytes() -> int:
+    """Memoria residente actual del proceso (pico si no hay /proc)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return 0
+        # ru_maxrss está en KB en Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _ip_to_numeric(ip) -> int:
+    """IP → entero, como en preprocess_NG-IIoTset (IPv6: últimos 32 bits; vacías o no válidas: 0)."""
+    try:
+        if pd.isna(ip) or ip == 'unknown' or ip == '':
+            return 0
+        ip_obj = ipaddress.ip_address(str(ip))
+        if isinstance(ip_obj, ipaddress.IPv6Address):
+            return int(ip_obj) & 0xFFFFFFFF
+        return int(ip_obj)
+    except (ipaddress.AddressValueError, ValueError):
+        return 0
+
+
+def load_category_codes(path: str) -> Optional[Dict[str, Dict[str, int]]]:
+    """
+    Codificación categórica del preprocesado (label_encoders.pkl): columna → {valor: código}.
+
+    Returns:
+        Tabla de códigos, o None si el fichero no existe
+    """
+    if not os.path.exists(path):
+        return None
+    import joblib
+    encoders = joblib.load(path)
+    return {column: {str(value): code for code, value in enumerate(encoder.classes_)}
+            for column, encoder in encoders.items()}
+
+
+def _feature_matrix(frame: pd.DataFrame, ml_handler: MLHandler, reported: set,
+                    category_codes: Optional[Dict[str, Dict[str, int]]] = None) -> np.ndarray:
+    """
+    Registros conn (con características de ventana) → matriz de los modelos, con las mismas
+    transformaciones que preprocess_NG-IIoTset: IPs a entero y categóricas con los códigos de
+    label_encoders.pkl (valores nulos como 'MISSING'; los no vistos en el entrenamiento, -1).
+    Las características que no están en los logs o no son numéricas quedan a 0.
+    """
+    columns = {}
+    for feature in ml_handler.feature_order:
+        if feature not in frame.columns:
+            if feature not in reported:
+                reported.add(feature)
+                print(f" Característica ausente en los logs (se usa 0): {feature}")
+            columns[feature] = 0.0
+        elif feature in IP_COLUMNS and not pd.api.types.is_numeric_dtype(frame[feature]):
+            values = frame[feature]
+            columns[feature] = values.map({ip: _ip_to_numeric(ip) for ip in values.unique()})
+        elif category_codes is not None and feature in category_codes:
+            values = frame[feature].fillna('MISSING').astype(str)
+            columns[feature] = values.map(category_codes[feature]).fillna(-1)
+        else:
+            columns[feature] = pd.to_numeric(frame[feature], errors='coerce')
+    return np.ascontiguousarray(pd.DataFrame(columns, index=frame.index).fillna(0).to_numpy(dtype=np.float32))
+
+
+def test_rows(ml_handler: MLHandler, chunk_size: int = 10000) -> Iterator[ReplayChunk]:
+    """Filas de X_test (vistas de test_matrix, sin ts: se reproducen a base_rate)."""
+    X = ml_handler.test_matrix
+    if X is None:
+        raise ValueError("El MLHandler no tiene datos de test cargados")
+    for start in range(0, len(X), chunk_size):
+        yield None, X[start:start + chunk_size]
+
+
+def csv_rows(csv_path: str, ml_handler: MLHandler, chunk_size: int = 10000,
+             category_codes: Optional[Dict[str, Dict[str, int]]] = None) -> Iterator[ReplayChunk]:
+    """Filas de un CSV del NG-IIoTset; si tiene columna ts, se reproducen con sus tiempos."""
+    reported = set()
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size, low_memory=False):
+        ts = chunk['ts'].to_numpy(dtype=float) if 'ts' in chunk.columns else None
+        yield ts, _feature_matrix(chunk, ml_handler, reported, category_codes)
+
+
+def zeek_rows(logs_dirs: Sequence[str], ml_handler: MLHandler, chunk_size: int = 10000,
+              window_seconds: float = 60.0,
+              category_codes: Optional[Dict[str, Dict[str, int]]] = None) -> Iterator[ReplayChunk]:
+    """
+    Conexiones de los conn.log bajo logs_dirs, captura a captura y con sus tiempos originales.
+    Cada captura es un escenario independiente (estado de ventana propio), como al construir
+    el dataset; las capturas se encadenan sin pausa entre ellas.
+    """
+    reported = set()
+    for logs_dir in logs_dirs:
+        for path in find_zeek_logs(logs_dir, 'conn'):
+            chunks = (chunk[chunk['ts'].notna()] for chunk in iter_zeek_log(path, LOG_COLUMNS['conn'], chunk_size)
+                      if 'ts' in chunk.columns)
+            for chunk in capture_window_features(chunks, window_seconds):
+                if not chunk.empty:
+                    yield chunk['ts'].to_numpy(dtype=float), _feature_matrix(chunk, ml_handler, reported,
+                                                                             category_codes)
+
+
+class ReplayLoadGenerator:
+    """
+    Generador de carga por reproducción de tráfico: las filas de una fuente (X_test, CSV del
+    NG-IIoTset o logs Zeek) se envían al pipeline a través del mismo MicroBatcher del servicio
+    de inferencia, respetando los tiempos originales a un multiplicador de velocidad o tan rápido
+    como sea posible. La latencia se mide desde el momento en que la fila debía enviarse, no desde
+    que se envió, para que un generador retrasado por la saturación no oculte la espera.
+    Un hilo de monitorización muestrea en cada intervalo el rendimiento sostenido, la profundidad
+    de la cola, los percentiles de latencia y la memoria residente.
+    """
+
+    def __init__(self, pipeline: IntegratedIDSPipeline, speed: Optional[float] = 1.0,
+                 base_rate: float = 1000.0, max_gap: float = 1.0, request_rows: int = 1,
+                 max_in_flight: int = 100000, max_batch_rows: int = 256, max_wait_ms: float = 2.0,
+                 interval: float = 1.0, create_threats: bool = False):
+        """
+        Inicializa el generador.
+
+        Args:
+            pipeline: Pipeline IDS con los modelos cargados
+            speed: Multiplicador sobre los tiempos originales (None = tan rápido como sea posible)
+            base_rate: Filas por segundo a velocidad 1 para las fuentes sin ts
+            max_gap: Pausa máxima entre filas consecutivas en tiempo original (segundos)
+            request_rows: Filas por petición (1 = una conexión por petición, como un sensor)
+            max_in_flight: Filas máximas enviadas y aún sin resultado (cota de memoria del generador)
+            max_batch_rows: Filas por lote del MicroBatcher
+            max_wait_ms: Espera máxima del MicroBatcher
+            interval: Segundos entre muestras de las métricas
+            create_threats: Crear además los individuos AmenazaDetectada de los ataques en la ontología
+        """
+        if speed is not None and speed <= 0:
+            raise ValueError(f"speed debe ser positivo: {speed}")
+        self.pipeline = pipeline
+        self.speed = speed
+        self.base_rate = base_rate
+        self.max_gap = max_gap
+        self.request_rows = max(1, request_rows)
+        self.max_in_flight = max(self.request_rows, max_in_flight)
+        self.interval = interval
+        self.create_threats = create_threats
+        self.batcher = MicroBatcher(self._process, max_batch_rows, max_wait_ms)
+
+        self._lock = threading.Condition()
+        self._latencies: List[float] = []
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._errors = 0
+        self._lag = 0.0
+
+    def _process(self, rows: List[Tuple[int, np.ndarray]]):
+        """Lote del MicroBatcher: filas (índice, vector) → ThreatBatch (y amenazas en la ontología)."""
+        indices = np.fromiter((index for index, _ in rows), dtype=np.int64, count=len(rows))
+        batch = self.pipeline.process_batch(np.stack([x for _, x in rows]), indices)
+        if self.create_threats:
+            attacks = batch.attacks()
+            if len(attacks):
+                # El MicroBatcher procesa los lotes en un único hilo: no hay creaciones concurrentes
+                creator = self.pipeline.amenaza_creator
+                cache: Dict[int, tuple] = {}
+                for i in range(len(attacks)):
+                    record = attacks.record(i, cache)
+                    creator.create_amenaza_detectada(record, record['sample_index'], verbose=False)
+        return batch
+
+    def _on_done(self, n_rows: int, due: float) -> Callable:
+        def done(future):
+            finished = time.perf_counter()
+            with self._lock:
+                if future.exception() is not None:
+                    self._errors += n_rows
+                else:
+                    self._latencies.append(finished - due)
+                self._completed += n_rows
+                self._in_flight -= n_rows
+                self._lock.notify_all()
+        return done
+
+    def _schedule(self, ts: Optional[np.ndarray], n: int, first: int, state: Dict[str, float]) -> np.ndarray:
+        """Segundos desde el inicio en que debe enviarse cada fila del bloque."""
+        if self.speed is None:
+            return np.zeros(n)
+        if ts is None:
+            ts = (first + np.arange(n)) / self.base_rate
+        previous = state.get('ts', ts[0])
+        gaps = np.clip(np.diff(ts, prepend=previous), 0.0, self.max_gap)
+        offsets = state.get('offset', 0.0) + np.cumsum(gaps) / self.speed
+        state['ts'], state['offset'] = float(ts[-1]), float(offsets[-1])
+        return offsets
+
+    def _snapshot(self, start: float, previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        now = time.perf_counter()
+        with self._lock:
+            latencies, self._latencies = self._latencies, []
+            submitted, completed, in_flight, lag = self._submitted, self._completed, self._in_flight, self._lag
+        elapsed = now - start
+        dt = elapsed - (previous['t'] if previous else 0.0)
+        sample = {
+            't': elapsed,
+            'submitted': submitted,
+            'completed': completed,
+            'offered_rps': (submitted - (previous['submitted'] if previous else 0)) / dt if dt > 0 else 0.0,
+            'throughput_rps': (completed - (previous['completed'] if previous else 0)) / dt if dt > 0 else 0.0,
+            'queue_depth': self.batcher.queue_depth,
+            'in_flight_rows': in_flight,
+            'lag_s': lag,
+            'rss_mb': _rss_bytes() / 2 ** 20,
+            'latencies': np.asarray(latencies),
+        }
+        if latencies:
+            p50, p95, p99 = np.percentile(sample['latencies'], [50, 95, 99]) * 1000
+            sample.update(p50_ms=p50, p95_ms=p95, p99_ms=p99)
+        creator = self.pipeline._amenaza_creator
+        if creator is not None:
+            sample['amenazas'] = len(creator.threat_index)
+        return sample
+
+    def _monitor(self, start: float, samples: List[Dict[str, Any]], stop: threading.Event, verbose: bool):
+        while not stop.wait(self.interval):
+            sample = self._snapshot(start, samples[-1] if samples else None)
+            samples.append(sample)
+            if verbose:
+                latency = f"p99 {sample['p99_ms']:.1f} ms" if 'p99_ms' in sample else "p99 -"
+                print(f" [{sample['t']:7.1f} s] {sample['throughput_rps']:>9,.0f} filas/s "
+                      f"(ofrecidas {sample['offered_rps']:,.0f}) | cola {sample['queue_depth']:,} "
+                      f"| en vuelo {sample['in_flight_rows']:,} | {latency} | retraso {sample['lag_s']:.2f} s "
+                      f"| RSS {sample['rss_mb']:.1f} MB")
+
+    def run(self, source: Callable[[], Iterator[ReplayChunk]], duration: Optional[float] = None,
+            max_rows: Optional[int] = None, loop: bool = False, verbose: bool = True) -> Dict[str, Any]:
+        """
+        Reproduce la fuente y devuelve el informe de carga.
+
+        Args:
+            source: Función que devuelve un iterador nuevo de bloques (ts, matriz) en cada llamada
+            duration: Segundos máximos de envío (None = hasta agotar la fuente)
+            max_rows: Filas máximas a enviar
+            loop: Repetir la fuente hasta alcanzar duration o max_rows (pruebas sostenidas)
+            verbose: Mostrar cada muestra de métricas
+
+        Returns:
+            Informe con totales, percentiles de latencia, memoria, muestras por intervalo y saturación
+        """
+        samples: List[Dict[str, Any]] = []
+        stop = threading.Event()
+        rss_start = _rss_bytes()
+        start = time.perf_counter()
+        monitor = threading.Thread(target=self._monitor, args=(start, samples, stop, verbose),
+                                   name="replay-monitor", daemon=True)
+        monitor.start()
+
+        schedule_state: Dict[str, float] = {}
+        sent = 0
+        finished = False
+        while not finished:
+            chunks_in_pass = 0
+            for ts, X in source():
+                chunks_in_pass += 1
+                offsets = self._schedule(ts, len(X), sent, schedule_state)
+                for i in range(0, len(X), self.request_rows):
+                    rows = X[i:i + self.request_rows]
+                    if max_rows is not None:
+                        rows = rows[:max_rows - sent]
+                    due = start + offsets[i]
+                    now = time.perf_counter()
+                    if duration is not None and now - start >= duration:
+                        finished = True
+                        break
+                    if due > now:
+                        time.sleep(due - now)
+                    n = len(rows)
+                    with self._lock:
+                        while self._in_flight + n > self.max_in_flight:
+                            self._lock.wait()
+                        self._in_flight += n
+                        self._submitted += n
+                        now = time.perf_counter()
+                        if self.speed is None:
+                            due = now
+                        self._lag = max(0.0, now - due)
+                    future = self.batcher.submit([(sent + j, row) for j, row in enumerate(rows)])
+                    future.add_done_callback(self._on_done(n, due))
+                    sent += n
+                    if max_rows is not None and sent >= max_rows:
+                        finished = True
+                        break
+                if finished:
+                    break
+            if not loop or chunks_in_pass == 0:
+                finished = True
+            else:
+                # Pausa de una fila entre repeticiones, sin reiniciar el reloj de la reproducción
+                schedule_state.pop('ts', None)
+
+        send_seconds = time.perf_counter() - start
+        with self._lock:
+            while self._in_flight > 0:
+                self._lock.wait()
+        stop.set()
+        monitor.join()
+        samples.append(self._snapshot(start, samples[-1] if samples else None))
+        return self._report(samples, send_seconds, time.perf_counter() - start, rss_start)
+
+    def _report(self, samples: List[Dict[str, Any]], send_seconds: float, seconds: float,
+                rss_start: int) -> Dict[str, Any]:
+        latencies = np.concatenate([sample.pop('latencies') for sample in samples])
+        latency_ms = {}
+        if len(latencies):
+            p50, p95, p99, p999 = np.percentile(latencies, [50, 95, 99, 99.9]) * 1000
+            latency_ms = {'p50': p50, 'p95': p95, 'p99': p99, 'p99.9': p999,
+                          'max': float(latencies.max()) * 1000, 'mean': float(latencies.mean()) * 1000}
+
+        t = np.array([sample['t'] for sample in samples])
+        rss = np.array([sample['rss_mb'] for sample in samples])
+        # Pendiente de la memoria sobre la segunda mitad (tras el calentamiento de cachés e índices)
+        half = len(samples) // 2
+        slope = float(np.polyfit(t[half:], rss[half:], 1)[0]) * 60 if len(samples) - half >= 2 else 0.0
+
+        completed = self._completed
+        return {
+            'config': {
+                'speed': self.speed, 'base_rate': self.base_rate, 'max_gap': self.max_gap,
+                'request_rows': self.request_rows, 'max_in_flight': self.max_in_flight,
+                'max_batch_rows': self.batcher.max_batch_rows, 'max_wait_ms': self.batcher.max_wait * 1000,
+                'create_threats': self.create_threats
+            },
+            'rows_submitted': self._submitted,
+            'rows_completed': completed,
+            'rows_failed': self._errors,
+            'seconds': seconds,
+            'send_seconds': send_seconds,
+            'sustained_rows_per_second': completed / seconds if seconds > 0 else 0.0,
+            'peak_rows_per_second': max((sample['throughput_rps'] for sample in samples), default=0.0),
+            'batches': self.batcher.batches,
+            'mean_batch_rows': self.batcher.rows / self.batcher.batches if self.batcher.batches else 0.0,
+            'latency_ms': latency_ms,
+            'memory': {
+                'rss_start_mb': rss_start / 2 ** 20,
+                'rss_end_mb': float(rss[-1]) if len(rss) else 0.0,
+                'rss_peak_mb': float(rss.max()) if len(rss) else 0.0,
+                'growth_mb_per_min': slope
+            },
+            'saturation': self._saturation(samples),
+            'intervals': samples
+        }
+
+    def _saturation(self, samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Primer intervalo saturado: el pipeline completa menos del 90% de lo ofrecido y las filas
+        en vuelo o el retraso del generador siguen creciendo. Con speed=None no hay tasa ofrecida que comparar:
+        el rendimiento sostenido es directamente la capacidad máxima.
+        """
+        if self.speed is None:
+            return {'detected': None, 'capacity_rows_per_second': max(
+                (sample['throughput_rps'] for sample in samples), default=0.0)}
+        previous = {'in_flight_rows': 0, 'lag_s': 0.0}
+        for sample in samples[:-1]:
+            growing = sample['in_flight_rows'] > previous['in_flight_rows'] or sample['lag_s'] > previous['lag_s']
+            previous = sample
+            if growing and sample['throughput_rps'] < 0.9 * sample['offered_rps']:
+                return {'detected': True, 't': sample['t'], 'offered_rps': sample['offered_rps'],
+                        'throughput_rps': sample['throughput_rps']}
+        return {'detected': False}
+
+
+def print_report(report: Dict[str, Any]):
+    """Muestra un resumen legible del informe de carga."""
+    print(f"\n Filas procesadas: {report['rows_completed']:,}/{report['rows_submitted']:,} "
+          f"en {report['seconds']:.2f} s ({report['rows_failed']:,} con error)")
+    print(f" Rendimiento sostenido: {report['sustained_rows_per_second']:,.0f} filas/s "
+          f"(pico por intervalo: {report['peak_rows_per_second']:,.0f})")
+    print(f" Lotes: {report['batches']:,} (media {report['mean_batch_rows']:.1f} filas)")
+    latency = report['latency_ms']
+    if latency:
+        print(f" Latencia: p50 {latency['p50']:.2f} ms | p95 {latency['p95']:.2f} ms | "
+              f"p99 {latency['p99']:.2f} ms | máx {latency['max']:.2f} ms")
+    memory = report['memory']
+    print(f" Memoria: {memory['rss_start_mb']:.1f} → {memory['rss_end_mb']:.1f} MB "
+          f"(pico {memory['rss_peak_mb']:.1f} MB, {memory['growth_mb_per_min']:+.2f} MB/min)")
+    saturation = report['saturation']
+    if saturation['detected'] is None:
+        print(f" Capacidad máxima: {saturation['capacity_rows_per_second']:,.0f} filas/s")
+    elif saturation['detected']:
+        print(f" Saturación a los {saturation['t']:.1f} s: {saturation['throughput_rps']:,.0f} filas/s "
+              f"procesadas de {saturation['offered_rps']:,.0f} ofrecidas")
+    else:
+        print(" Sin saturación a esta velocidad")
+
+
+def main():
+    """Prueba de carga sostenida del pipeline reproduciendo tráfico grabado."""
+    parser = argparse.ArgumentParser(description="Generador de carga por reproducción de tráfico para el pipeline IDS")
+    parser.add_argument('--source', choices=['test', 'csv', 'zeek'], default='test',
+                        help="Filas de X_test, un CSV del NG-IIoTset o logs Zeek")
+    parser.add_argument('--data', default="./data/train_test_data.pkl", help="Datos de test (--source test)")
+    parser.add_argument('--csv', default="./data/NG-IIoTset.csv", help="CSV del NG-IIoTset (--source csv)")
+    parser.add_argument('--label-encoders', default="./data/label_encoders.pkl",
+                        help="Codificación categórica del preprocesado (--source csv/zeek)")
+    parser.add_argument('--zeek-logs', action='append', default=None, metavar='DIRECTORIO',
+                        help="Directorio de logs Zeek (repetible; por defecto zeek_logs/normal y zeek_logs/ataques)")
+    parser.add_argument('--speed', type=float, default=1.0, help="Multiplicador sobre los tiempos originales")
+    parser.add_argument('--max-speed', action='store_true', help="Enviar tan rápido como sea posible")
+    parser.add_argument('--base-rate', type=float, default=1000.0, help="Filas/s a velocidad 1 sin ts")
+    parser.add_argument('--max-gap', type=float, default=1.0, help="Pausa máxima entre filas (s, tiempo original)")
+    parser.add_argument('--request-rows', type=int, default=1)
+    parser.add_argument('--max-in-flight', type=int, default=100000)
+    parser.add_argument('--max-batch-rows', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--interval', type=float, default=1.0, help="Segundos entre muestras de métricas")
+    parser.add_argument('--duration', type=float, default=None, help="Segundos máximos de envío")
+    parser.add_argument('--max-rows', type=int, default=None)
+    parser.add_argument('--loop', action='store_true', help="Repetir la fuente hasta --duration o --max-rows")
+    parser.add_argument('--ontology', action='store_true', help="Crear las amenazas en la ontología")
+    parser.add_argument('--max-threats', type=int, default=None, help="Retención de amenazas (con --ontology)")
+    parser.add_argument('--output', default=None, help="Guardar el informe en JSON")
+    args = parser.parse_args()
+
+    retention = None
+    if args.max_threats is not None:
+        from threat_retention import RetentionPolicy
+        retention = RetentionPolicy(max_threats=args.max_threats)
+    pipeline = IntegratedIDSPipeline(train_test_data_path=args.data if args.source == 'test' else None,
+                                     retention_policy=retention)
+    # Ontología e índices cargados antes de medir
+    pipeline.preload()
+    ml_handler = pipeline.ml_handler
+
+    category_codes = None
+    if args.source != 'test':
+        category_codes = load_category_codes(args.label_encoders)
+        if category_codes is None:
+            print(f" Aviso: no existe {args.label_encoders}; las categóricas quedan a 0 y la fuente "
+                  f"'{args.source}' solo mide carga, no la calidad de las detecciones")
+
+    if args.source == 'test':
+        source = lambda: test_rows(ml_handler)
+    elif args.source == 'csv':
+        source = lambda: csv_rows(args.csv, ml_handler, category_codes=category_codes)
+    else:
+        logs_dirs = args.zeek_logs or [os.path.join(project_root, 'Zeek-Pipeline', 'zeek_logs', 'normal'),
+                                       os.path.join(project_root, 'Zeek-Pipeline', 'zeek_logs', 'ataques')]
+        source = lambda: zeek_rows(logs_dirs, ml_handler, category_codes=category_codes)
+
+    generator = ReplayLoadGenerator(
+        pipeline, speed=None if args.max_speed else args.speed, base_rate=args.base_rate,
+        max_gap=args.max_gap, request_rows=args.request_rows, max_in_flight=args.max_in_flight,
+        max_batch_rows=args.max_batch_rows, max_wait_ms=args.max_wait_ms, interval=args.interval,
+        create_threats=args.ontology
+    )
+    speed_text = "máxima" if args.max_speed else f"x{args.speed:g}"
+    print(f" Reproduciendo '{args.source}' a velocidad {speed_text}...")
+    report = generator.run(source, duration=args.duration, max_rows=args.max_rows, loop=args.loop)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n Informe guardado en: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Union, Tuple
+
+import numpy as np
+
+
+# Un registro de tamaño fijo por muestra; etiquetas y técnicas como códigos enteros del mapper
+THREAT_DTYPE = np.dtype([
+    ('sample_index', np.int64),
+    ('binary_predicted', np.int8),
+    ('binary_confidence', np.float32),
+    ('label_code', np.int16),
+    ('confidence', np.float32),
+    ('detected_at', np.float64)
+])
+
+
+class ThreatBatch:
+    """
+    Lote columnar de resultados entre etapas del pipeline: un array estructurado de NumPy
+    con etiquetas codificadas según EnhancedAttackMapper. Las técnicas se obtienen de la
+    matriz etiqueta x técnica del mapper y los diccionarios solo se crean al exportar
+    (record / to_dicts). Las etiquetas del modelo que no están en el mapping conservan su
+    nombre mediante un vocabulario adicional del lote (códigos a partir de len(mapper.labels)),
+    sin técnicas asociadas.
+    """
+
+    __slots__ = ('records', 'mapper', 'technique_mitigations', 'extra_labels')
+
+    def __init__(self, records: np.ndarray, mapper, technique_mitigations: Optional[Dict[str, List[Dict]]] = None,
+                 extra_labels: Tuple[str, ...] = ()):
+        """
+        Inicializa el lote.
+
+        Args:
+            records: Array estructurado con dtype THREAT_DTYPE
+            mapper: EnhancedAttackMapper que define los códigos de etiqueta y técnica
+            technique_mitigations: Tabla técnica → mitigaciones (opcional)
+            extra_labels: Etiquetas fuera del mapping (código len(mapper.labels) + posición)
+        """
+        self.records = records
+        self.mapper = mapper
+        self.technique_mitigations = technique_mitigations or {}
+        self.extra_labels = tuple(extra_labels)
+
+    @classmethod
+    def from_predictions(cls, ml: Dict[str, np.ndarray], label_codes: np.ndarray, mapper,
+                         technique_mitigations: Optional[Dict[str, List[Dict]]] = None,
+                         sample_indices: Optional[np.ndarray] = None,
+                         detected_at: Optional[float] = None,
+                         extra_labels: Tuple[str, ...] = ()) -> "ThreatBatch":
+        """
+        Construye el lote a partir de la salida de MLHandler.predict_batch y los códigos del mapper.
+
+        Args:
+            ml: Arrays de predict_batch
+            label_codes: Código de etiqueta por fila (mapper.map_batch)
+            mapper: EnhancedAttackMapper
+            technique_mitigations: Tabla técnica → mitigaciones
+            sample_indices: Índice de muestra por fila (por defecto, -1)
+            detected_at: Momento de detección (epoch) común al lote; por defecto, ahora
+            extra_labels: Etiquetas fuera del mapping referidas por label_codes
+        """
+        n = len(label_codes)
+        records = np.empty(n, dtype=THREAT_DTYPE)
+        records['sample_index'] = -1 if sample_indices is None else sample_indices
+        records['binary_predicted'] = ml['binary_predicted']
+        records['binary_confidence'] = ml['binary_confidence']
+        records['label_code'] = label_codes
+        records['confidence'] = ml['final_confidence']
+        records['detected_at'] = datetime.now().timestamp() if detected_at is None else detected_at
+        return cls(records, mapper, technique_mitigations, extra_labels)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, key: Union[int, slice, np.ndarray]) -> Union[Dict[str, Any], "ThreatBatch"]:
+        """Un entero materializa el registro; un slice o máscara devuelve un sub-lote (vista)."""
+        if isinstance(key, (int, np.integer)):
+            return self.record(int(key))
+        return ThreatBatch(self.records[key], self.mapper, self.technique_mitigations, self.extra_labels)
+
+    @property
+    def vocabulary(self) -> Tuple[str, ...]:
+        """Etiquetas por código: las del mapper seguidas de las adicionales del lote."""
+        return tuple(self.mapper.labels) + self.extra_labels
+
+    @property
+    def labels(self) -> np.ndarray:
+        """Etiqueta de cada fila (decodificada)."""
+        return np.asarray(self.vocabulary, dtype=object)[self.records['label_code']]
+
+    @property
+    def is_attack(self) -> np.ndarray:
+        """Máscara de filas clasificadas como ataque."""
+        return self.records['label_code'] != self.mapper.label_codes.get("Normal", -1)
+
+    @property
+    def technique_mask(self) -> np.ndarray:
+        """Matriz booleana filas x técnicas (orden de mapper.technique_ids)."""
+        matrix = self.mapper.label_technique_matrix
+        if self.extra_labels:
+            # Las etiquetas adicionales no implican técnicas
+            matrix = np.vstack([matrix, np.zeros((len(self.extra_labels), matrix.shape[1]), dtype=bool)])
+        return matrix[self.records['label_code']]
+
+    def attacks(self) -> "ThreatBatch":
+        """Sub-lote con las filas clasificadas como ataque."""
+        return self[self.is_attack]
+
+    def technique_counts(self) -> Dict[str, int]:
+        """Número de filas que implican cada técnica."""
+        counts = self.technique_mask.sum(axis=0)
+        return {tech_id: int(counts[j]) for j, tech_id in enumerate(self.mapper.technique_ids) if counts[j]}
+
+    def _label_output(self, code: int, cache: Dict[int, tuple]) -> tuple:
+        """Técnicas y mitigaciones de una etiqueta, compartidas por todas sus filas."""
+        output = cache.get(code)
+        if output is None and code >= len(self.mapper.labels):
+            output = cache[code] = ([], [])
+        elif output is None:
+            techniques = [{'id': tech['idTecnica'], 'name': tech['nombreTecnica'], 'tactic': tech['tactica']}
+                          for tech in self.mapper.get_techniques(self.mapper.labels[code])]
+            mitigations = list({m['id']: m for tech in techniques
+                                for m in self.technique_mitigations.get(tech['id'], [])}.values())
+            output = cache[code] = (techniques, mitigations)
+        return output
+
+    def record(self, i: int, _cache: Optional[Dict[int, tuple]] = None) -> Dict[str, Any]:
+        """Materializa la fila i como diccionario (formato de salida del servicio)."""
+        row = self.records[i]
+        code = int(row['label_code'])
+        techniques, mitigations = self._label_output(code, {} if _cache is None else _cache)
+        return {
+            'sample_index': int(row['sample_index']),
+            'binary_prediction': int(row['binary_predicted']),
+            'binary_confidence': round(float(row['binary_confidence']), 3),
+            'final_label': self.vocabulary[code],
+            'final_confidence': round(float(row['confidence']), 3),
+            'detected_at': datetime.fromtimestamp(float(row['detected_at'])).isoformat(),
+            'techniques': techniques,
+            'mitigations': mitigations
+        }
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Materializa todas las filas (solo para exportar o serializar)."""
+        cache: Dict[int, tuple] = {}
+        return [self.record(i, cache) for i in range(len(self.records))]
@@ -0,0 +1,287 @@
+import json
+from typing import Dict, List, Any, Optional, Sequence, Iterable
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # dependencia opcional: solo necesaria para exportar a Parquet
+    pa = None
+    pq = None
+
+
+# Vocabularios de los códigos enteros, guardados en los metadatos del esquema
+VOCABULARY_KEYS = ('labels', 'techniques', 'tactics', 'mitigations')
+
+
+def _list_array(per_row: Sequence[np.ndarray]):
+    """ListArray<int16> a partir de una lista de arrays de códigos por fila."""
+    lengths = np.fromiter((len(codes) for codes in per_row), dtype=np.int32, count=len(per_row))
+    offsets = np.zeros(len(per_row) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    values = np.concatenate(per_row).astype(np.int16) if len(per_row) else np.empty(0, dtype=np.int16)
+    return pa.ListArray.from_arrays(pa.array(offsets), pa.array(values, type=pa.int16()))
+
+
+def _label_list_array(per_label: Sequence[np.ndarray], label_codes: np.ndarray):
+    """
+    ListArray<int16> de filas que comparten la lista de su etiqueta, sin recorrer las filas:
+    las listas por etiqueta se rellenan en una matriz y se indexan con los códigos.
+    """
+    lengths = np.array([len(codes) for codes in per_label], dtype=np.int32)
+    padded = np.zeros((len(per_label), max(int(lengths.max(initial=0)), 1)), dtype=np.int16)
+    for code, codes in enumerate(per_label):
+        padded[code, :len(codes)] = codes
+    valid = np.arange(padded.shape[1]) < lengths[:, None]
+    offsets = np.zeros(len(label_codes) + 1, dtype=np.int32)
+    np.cumsum(lengths[label_codes], out=offsets[1:])
+    values = padded[label_codes][valid[label_codes]]
+    return pa.ListArray.from_arrays(pa.array(offsets), pa.array(values, type=pa.int16()))
+
+
+def _epoch_ms(timestamps) -> np.ndarray:
+    """Epoch en segundos (float) → datetime64[ms]."""
+    return np.round(np.asarray(timestamps, dtype=np.float64) * 1000).astype(np.int64).astype('datetime64[ms]')
+
+
+class ThreatParquetWriter:
+    """
+    Exportación columnar de amenazas detectadas a Parquet: una fila por amenaza, con la etiqueta,
+    técnicas, tácticas y mitigaciones como códigos enteros (int16 y listas de int16) cuyos
+    vocabularios viajan en los metadatos del fichero. Las filas se acumulan en memoria y se
+    escriben como grupos de filas incrementales, de modo que el fichero crece a la par que
+    el proceso sin reescribirse.
+    """
+
+    def __init__(self, path: str, labels: Sequence[str], techniques: Sequence[str],
+                 tactics: Sequence[str], mitigations: Sequence[str],
+                 row_group_size: int = 65536, compression: str = 'zstd'):
+        """
+        Inicializa el exportador.
+
+        Args:
+            path: Ruta del fichero Parquet
+            labels: Vocabulario de etiquetas de ataque
+            techniques: Vocabulario de IDs de técnica (T0814...)
+            tactics: Vocabulario de nombres de táctica
+            mitigations: Vocabulario de IDs de mitigación (M0815...)
+            row_group_size: Filas por grupo de filas
+            compression: Códec de Parquet
+        """
+        if pa is None:
+            raise ImportError("La exportación a Parquet requiere pyarrow (pip install pyarrow)")
+        self.path = path
+        self.row_group_size = row_group_size
+        self.vocabularies = {
+            'labels': tuple(labels), 'techniques': tuple(techniques),
+            'tactics': tuple(tactics), 'mitigations': tuple(mitigations)
+        }
+        self._codes = {key: {value: i for i, value in enumerate(values)}
+                       for key, values in self.vocabularies.items()}
+
+        metadata = {f'ids.{key}'.encode(): json.dumps(values).encode() for key, values in self.vocabularies.items()}
+        self.schema = pa.schema([
+            ('sample_index', pa.int64()),
+            ('label_code', pa.int16()),
+            ('confidence', pa.float32()),
+            ('detected_at', pa.timestamp('ms', tz='UTC')),
+            ('technique_codes', pa.list_(pa.int16())),
+            ('tactic_codes', pa.list_(pa.int16())),
+            ('mitigation_codes', pa.list_(pa.int16())),
+        ], metadata=metadata)
+        self._writer = pq.ParquetWriter(path, self.schema, compression=compression)
+        self._mapper = None
+        self._technique_mitigations: Dict[str, List[Dict[str, str]]] = {}
+        self._label_tables = None
+        self._pending: List[Any] = []
+        self._pending_rows = 0
+        self.rows_written = 0
+        self.row_groups = 0
+
+    @classmethod
+    def for_mapper(cls, path: str, mapper, technique_mitigations: Dict[str, List[Dict[str, str]]],
+                   extra_labels: Sequence[str] = (), **kwargs) -> "ThreatParquetWriter":
+        """
+        Exportador con los códigos de EnhancedAttackMapper (los mismos de ThreatBatch)
+        y las mitigaciones de la tabla técnica → mitigaciones de la ontología.
+        Las etiquetas adicionales (fuera del mapping) reciben códigos a continuación.
+        """
+        mitigations = sorted({m['id'] for rows in technique_mitigations.values() for m in rows})
+        labels = list(mapper.labels) + [label for label in dict.fromkeys(extra_labels) if label not in mapper.label_codes]
+        writer = cls(path, labels, mapper.technique_ids, mapper.tactics, mitigations, **kwargs)
+        writer._mapper = mapper
+        writer._technique_mitigations = technique_mitigations
+        return writer
+
+    def _encode(self, key: str, values: Iterable[str]) -> np.ndarray:
+        """Códigos de los valores conocidos del vocabulario (los desconocidos se omiten)."""
+        codes = self._codes[key]
+        return np.array([codes[v] for v in values if v in codes], dtype=np.int16)
+
+    def _label_codes(self):
+        """Técnicas, tácticas y mitigaciones codificadas por código de etiqueta del mapper (una vez)."""
+        tables = self._label_tables
+        if tables is None:
+            mapper = self._mapper
+            techniques, tactics, mitigations = [], [], []
+            for code in range(len(mapper.labels)):
+                tech_codes = np.flatnonzero(mapper.label_technique_matrix[code]).astype(np.int16)
+                techniques.append(tech_codes)
+                tactics.append(np.unique(mapper.technique_tactic_codes[tech_codes]).astype(np.int16))
+                mitigation_ids = dict.fromkeys(m['id'] for tech_id in np.asarray(mapper.technique_ids)[tech_codes]
+                                               for m in self._technique_mitigations.get(tech_id, []))
+                mitigations.append(self._encode('mitigations', mitigation_ids))
+            tables = self._label_tables = (techniques, tactics, mitigations)
+        return tables
+
+    def _append(self, columns: Dict[str, Any]):
+        table = pa.Table.from_pydict(columns, schema=self.schema)
+        self._pending.append(table)
+        self._pending_rows += table.num_rows
+        if self._pending_rows >= self.row_group_size:
+            self.flush()
+
+    def write_batch(self, batch, attacks_only: bool = True):
+        """
+        Añade las filas de un ThreatBatch (salida de IntegratedIDSPipeline.process_batch).
+        Las listas se construyen por etiqueta, sin recorrer las filas.
+
+        Args:
+            batch: ThreatBatch
+            attacks_only: Exportar solo las filas clasificadas como ataque
+        """
+        if self._mapper is None:
+            raise ValueError("write_batch requiere un exportador creado con for_mapper")
+        if attacks_only:
+            batch = batch.attacks()
+        if len(batch) == 0:
+            return
+        records = batch.records
+        label_codes = records['label_code']
+        techniques, tactics, mitigations = self._label_codes()
+        output_codes = label_codes
+        if batch.extra_labels:
+            # Etiquetas del lote fuera del mapping: su código en el vocabulario del fichero
+            # (-1 si no está) y listas vacías
+            n_labels = len(self._mapper.labels)
+            lookup = np.array(list(range(n_labels)) + [self._codes['labels'].get(label, -1)
+                                                       for label in batch.extra_labels], dtype=np.int16)
+            output_codes = lookup[label_codes]
+            label_codes = np.minimum(label_codes, n_labels)
+            empty = np.empty(0, dtype=np.int16)
+            techniques, tactics, mitigations = (techniques + [empty], tactics + [empty], mitigations + [empty])
+        self._append({
+            'sample_index': records['sample_index'],
+            'label_code': output_codes,
+            'confidence': records['confidence'],
+            'detected_at': _epoch_ms(records['detected_at']),
+            'technique_codes': _label_list_array(techniques, label_codes),
+            'tactic_codes': _label_list_array(tactics, label_codes),
+            'mitigation_codes': _label_list_array(mitigations, label_codes),
+        })
+
+    def write_records(self, records: Sequence[Dict[str, Any]]):
+        """
+        Añade amenazas en el formato de ThreatIndex.query (label, confidence, timestamp,
+        sample_index y listas de IDs de técnica, nombres de táctica e IDs de mitigación).
+        """
+        if not records:
+            return
+        self._append({
+            'sample_index': np.array([r['sample_index'] for r in records], dtype=np.int64),
+            'label_code': np.array([self._codes['labels'].get(r['label'], -1) for r in records], dtype=np.int16),
+            'confidence': np.array([r['confidence'] for r in records], dtype=np.float32),
+            'detected_at': _epoch_ms([r['timestamp'] for r in records]),
+            'technique_codes': _list_array([self._encode('techniques', r['techniques']) for r in records]),
+            'tactic_codes': _list_array([self._encode('tactics', r['tactics']) for r in records]),
+            'mitigation_codes': _list_array([self._encode('mitigations', r['mitigations']) for r in records]),
+        })
+
+    def write_amenazas(self, amenaza_creator, **filters):
+        """
+        Añade las amenazas de un AmenazaCreator (desde sus índices, sin recorrer ni serializar el grafo).
+        Las tácticas y mitigaciones, guardadas como URIs, se traducen a nombre e ID de la ontología.
+
+        Args:
+            amenaza_creator: AmenazaCreator
+            **filters: Filtros de ThreatIndex.query (label, technique, since, until...)
+        """
+        from rdflib import URIRef
+
+        graph, namespace = amenaza_creator.graph, amenaza_creator.namespace
+        names: Dict[tuple, str] = {}
+
+        def resolve(uri: str, predicate) -> str:
+            key = (uri, predicate)
+            if key not in names:
+                value = graph.value(URIRef(uri), predicate)
+                names[key] = str(value) if value is not None else uri
+            return names[key]
+
+        records = amenaza_creator.threat_index.query(**filters)
+        for record in records:
+            record['tactics'] = [resolve(uri, namespace.tieneNombre) for uri in record['tactics']]
+            record['mitigations'] = [resolve(uri, namespace.tieneID) for uri in record['mitigations']]
+        for start in range(0, len(records), self.row_group_size):
+            self.write_records(records[start:start + self.row_group_size])
+
+    def flush(self):
+        """Escribe las filas acumuladas como un nuevo grupo de filas."""
+        if not self._pending:
+            return
+        table = pa.concat_tables(self._pending)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows_written += table.num_rows
+        self.row_groups += -(-table.num_rows // self.row_group_size)
+        self._pending = []
+        self._pending_rows = 0
+
+    def close(self):
+        """Escribe las filas pendientes y cierra el fichero (el pie de Parquet se escribe aquí)."""
+        if self._writer is None:
+            return
+        self.flush()
+        self._writer.close()
+        self._writer = None
+        print(f"Amenazas exportadas a {self.path}: {self.rows_written} filas en {self.row_groups} grupos de filas")
+
+    def __enter__(self) -> "ThreatParquetWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_threats(path: str, decode: bool = True, **read_kwargs):
+    """
+    Lee un fichero exportado como DataFrame.
+
+    Args:
+        path: Ruta del fichero Parquet
+        decode: Añadir columnas con los valores (label, techniques, tactics, mitigations)
+        **read_kwargs: Argumentos de pyarrow.parquet.read_table (columns, filters...)
+
+    Returns:
+        DataFrame con una fila por amenaza
+    """
+    if pq is None:
+        raise ImportError("La lectura de Parquet requiere pyarrow (pip install pyarrow)")
+    table = pq.read_table(path, **read_kwargs)
+    df = table.to_pandas()
+    if not decode:
+        return df
+
+    metadata = pq.read_schema(path).metadata or {}
+    vocabularies = {key: json.loads(metadata[f'ids.{key}'.encode()]) for key in VOCABULARY_KEYS
+                    if f'ids.{key}'.encode() in metadata}
+    if 'label_code' in df and 'labels' in vocabularies:
+        # El código -1 (etiqueta fuera del vocabulario) cae en el 'unknown' final
+        labels = np.asarray(vocabularies['labels'] + ['unknown'], dtype=object)
+        df['label'] = labels[df['label_code'].to_numpy()]
+    for column, key in (('technique_codes', 'techniques'), ('tactic_codes', 'tactics'),
+                        ('mitigation_codes', 'mitigations')):
+        if column in df and key in vocabularies:
+            values = vocabularies[key]
+            df[key] = [[values[code] for code in codes] for codes in df[column]]
+    return df
@@ -0,0 +1,334 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+
+class ThreatIndex:
+    """
+    Índices secundarios en memoria sobre las amenazas detectadas, mantenidos junto al grafo:
+    por intervalo de tiempo (detectadaEn), etiqueta de ataque, técnica y rango de confianza.
+    Responde consultas filtradas y agregadas sin recorrer el grafo RDF.
+    """
+
+    def __init__(self, bucket_seconds: int = 60):
+        """
+        Inicializa el índice.
+
+        Args:
+            bucket_seconds: Anchura de los intervalos del índice temporal
+        """
+        self.bucket_seconds = bucket_seconds
+
+        # Almacenamiento columnar: una posición por amenaza
+        self._uris: List[str] = []
+        self._labels: List[str] = []
+        self._confidences: List[float] = []
+        self._timestamps: List[float] = []
+        self._sample_indices: List[int] = []
+        self._techniques: List[Tuple[str, ...]] = []
+        self._tactics: List[Tuple[str, ...]] = []
+        self._mitigations: List[Tuple[str, ...]] = []
+        self._row_by_uri: Dict[str, int] = {}
+
+        # Índices secundarios (listas de filas, en orden de inserción)
+        self._by_bucket: Dict[int, List[int]] = {}
+        self._by_label: Dict[str, List[int]] = {}
+        self._by_technique: Dict[str, List[int]] = {}
+        self._by_confidence: List[Tuple[float, int]] = []
+
+        # Contadores para estadísticas agregadas
+        self._technique_counts: Counter = Counter()
+        self._tactic_counts: Counter = Counter()
+        self._mitigation_counts: Counter = Counter()
+        self._bucket_technique_counts: Dict[int, Counter] = {}
+
+    def __len__(self) -> int:
+        return len(self._row_by_uri)
+
+    def _bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    def _live(self, row: int) -> bool:
+        """Si la fila sigue vigente (no eliminada ni sustituida por una nueva fila de la misma URI)."""
+        return self._row_by_uri.get(self._uris[row]) == row
+
+    def add(self, uri: str, label: str, confidence: float, timestamp: float,
+            techniques: Iterable[str] = (), tactics: Iterable[str] = (), mitigations: Iterable[str] = (),
+            sample_index: int = -1) -> int:
+        """
+        Indexa una amenaza detectada.
+
+        Args:
+            uri: URI del individuo AmenazaDetectada
+            label: Etiqueta de ataque
+            confidence: Confianza de la detección
+            timestamp: Momento de detección (epoch)
+            techniques: IDs de técnica (T0814...)
+            tactics: URIs o nombres de tácticas
+            mitigations: URIs o IDs de mitigaciones
+            sample_index: Índice de la muestra
+
+        Returns:
+            Fila asignada en el índice
+        """
+        uri = str(uri)
+        if uri in self._row_by_uri:
+            return self._row_by_uri[uri]
+
+        row = len(self._uris)
+        techniques, tactics, mitigations = tuple(techniques), tuple(tactics), tuple(mitigations)
+
+        self._uris.append(uri)
+        self._labels.append(label)
+        self._confidences.append(float(confidence))
+        self._timestamps.append(float(timestamp))
+        self._sample_indices.append(int(sample_index))
+        self._techniques.append(techniques)
+        self._tactics.append(tactics)
+        self._mitigations.append(mitigations)
+        self._row_by_uri[uri] = row
+
+        self._by_bucket.setdefault(self._bucket(timestamp), []).append(row)
+        self._by_label.setdefault(label, []).append(row)
+        for tech in techniques:
+            self._by_technique.setdefault(tech, []).append(row)
+        insort(self._by_confidence, (float(confidence), row))
+
+        self._technique_counts.update(set(techniques))
+        self._bucket_technique_counts.setdefault(self._bucket(timestamp), Counter()).update(set(techniques))
+        self._tactic_counts.update(set(tactics))
+        self._mitigation_counts.update(set(mitigations))
+        return row
+
+    def _time_rows(self, since: Optional[float], until: Optional[float]) -> List[int]:
+        """Filas en los intervalos temporales que cubren [since, until]."""
+        if not self._by_bucket:
+            return []
+        first = self._bucket(since) if since is not None else min(self._by_bucket)
+        last = self._bucket(until) if until is not None else max(self._by_bucket)
+        if last - first > len(self._by_bucket):
+            buckets = [b for b in self._by_bucket if first <= b <= last]
+        else:
+            buckets = range(first, last + 1)
+        rows = []
+        for bucket in buckets:
+            rows.extend(self._by_bucket.get(bucket, ()))
+        return rows
+
+    def _confidence_rows(self, min_confidence: Optional[float], max_confidence: Optional[float]) -> List[int]:
+        """Filas con confianza en [min_confidence, max_confidence] (búsqueda binaria)."""
+        lo = bisect_left(self._by_confidence, (min_confidence, -1)) if min_confidence is not None else 0
+        hi = (bisect_right(self._by_confidence, (max_confidence, float('inf')))
+              if max_confidence is not None else len(self._by_confidence))
+        return [row for _, row in self._by_confidence[lo:hi]]
+
+    def _select(self, label: Optional[str] = None, technique: Optional[str] = None,
+                min_confidence: Optional[float] = None, max_confidence: Optional[float] = None,
+                since: Optional[float] = None, until: Optional[float] = None) -> List[int]:
+        """
+        Resuelve los filtros: genera candidatos con el índice más selectivo
+        y comprueba el resto de condiciones directamente sobre las columnas.
+        """
+        candidates = []
+        if label is not None:
+            candidates.append((len(self._by_label.get(label, ())), lambda: self._by_label.get(label, [])))
+        if technique is not None:
+            candidates.append((len(self._by_technique.get(technique, ())),
+                               lambda: self._by_technique.get(technique, [])))
+        if min_confidence is not None or max_confidence is not None:
+            confidence_rows = self._confidence_rows(min_confidence, max_confidence)
+            candidates.append((len(confidence_rows), lambda: confidence_rows))
+        if since is not None or until is not None:
+            time_rows = self._time_rows(since, until)
+            candidates.append((len(time_rows), lambda: time_rows))
+
+        if candidates:
+            rows = min(candidates, key=lambda c: c[0])[1]()
+        else:
+            rows = self._row_by_uri.values()
+
+        selected = []
+        for row in rows:
+            if label is not None and self._labels[row] != label:
+                continue
+            if technique is not None and technique not in self._techniques[row]:
+                continue
+            confidence = self._confidences[row]
+            if min_confidence is not None and confidence < min_confidence:
+                continue
+            if max_confidence is not None and confidence > max_confidence:
+                continue
+            timestamp = self._timestamps[row]
+            if since is not None and timestamp < since:
+                continue
+            if until is not None and timestamp > until:
+                continue
+            if not self._live(row):
+                continue
+            selected.append(row)
+        return selected
+
+    def _record(self, row: int) -> Dict[str, Any]:
+        return {
+            'uri': self._uris[row],
+            'label': self._labels[row],
+            'confidence': self._confidences[row],
+            'timestamp': self._timestamps[row],
+            'sample_index': self._sample_indices[row],
+            'techniques': list(self._techniques[row]),
+            'tactics': list(self._tactics[row]),
+            'mitigations': list(self._mitigations[row])
+        }
+
+    def query(self, limit: Optional[int] = None, **filters) -> List[Dict[str, Any]]:
+        """
+        Amenazas que cumplen los filtros (label, technique, min_confidence,
+        max_confidence, since, until), ordenadas por momento de detección.
+
+        Ejemplo: query(technique="T0814", min_confidence=0.9)
+        """
+        rows = sorted(self._select(**filters), key=self._timestamps.__getitem__)
+        if limit is not None:
+            rows = rows[:limit]
+        return [self._record(row) for row in rows]
+
+    def count(self, **filters) -> int:
+        """Número de amenazas que cumplen los filtros."""
+        if not filters:
+            return len(self)
+        return len(self._select(**filters))
+
+    def top_techniques(self, n: int = 5, **filters) -> List[Tuple[str, int]]:
+        """
+        Técnicas más frecuentes entre las amenazas filtradas.
+
+        Ejemplo: top_techniques(since=time.time() - 3600)
+        """
+        if not filters:
+            return self._technique_counts.most_common(n)
+        if set(filters) <= {'since', 'until'}:
+            return self._time_technique_counts(filters.get('since'), filters.get('until')).most_common(n)
+        counts = Counter()
+        for row in self._select(**filters):
+            counts.update(set(self._techniques[row]))
+        return counts.most_common(n)
+
+    def _time_technique_counts(self, since: Optional[float], until: Optional[float]) -> Counter:
+        """
+        Recuento de técnicas en [since, until]: suma los contadores de los intervalos
+        completos y solo revisa fila a fila los intervalos de los extremos.
+        """
+        counts = Counter()
+        if not self._by_bucket:
+            return counts
+        first = self._bucket(since) if since is not None else min(self._by_bucket)
+        last = self._bucket(until) if until is not None else max(self._by_bucket)
+        edges = set()
+        if since is not None:
+            edges.add(first)
+        if until is not None:
+            edges.add(last)
+        for bucket, bucket_counts in self._bucket_technique_counts.items():
+            if first <= bucket <= last and bucket not in edges:
+                counts.update(bucket_counts)
+        for bucket in edges:
+            if not first <= bucket <= last:
+                continue
+            for row in self._by_bucket.get(bucket, ()):
+                if not self._live(row):
+                    continue
+                timestamp = self._timestamps[row]
+                if (since is None or timestamp >= since) and (until is None or timestamp <= until):
+                    counts.update(set(self._techniques[row]))
+        return counts
+
+    def oldest(self, n: Optional[int] = None, until: Optional[float] = None) -> List[str]:
+        """
+        URIs de las amenazas más antiguas (por detectadaEn): como máximo n y/o
+        detectadas antes de until. Recorre los intervalos temporales en orden.
+        """
+        uris = []
+        for bucket in sorted(self._by_bucket):
+            if n is not None and len(uris) >= n:
+                break
+            if until is not None and bucket * self.bucket_seconds >= until:
+                break
+            rows = [row for row in self._by_bucket[bucket] if self._live(row)]
+            rows.sort(key=self._timestamps.__getitem__)
+            for row in rows:
+                if (n is not None and len(uris) >= n) or (until is not None and self._timestamps[row] >= until):
+                    break
+                uris.append(self._uris[row])
+        return uris
+
+    def oldest_timestamp(self) -> Optional[float]:
+        """Momento de detección de la amenaza más antigua (None si el índice está vacío)."""
+        oldest = self.oldest(n=1)
+        return self._timestamps[self._row_by_uri[oldest[0]]] if oldest else None
+
+    @staticmethod
+    def _decrement(counter: Counter, keys: Iterable[str]):
+        for key in set(keys):
+            counter[key] -= 1
+            if counter[key] <= 0:
+                del counter[key]
+
+    def remove(self, uris: Iterable[str]) -> int:
+        """
+        Elimina amenazas del índice (desalojo por retención). Los contadores se actualizan
+        al momento; las filas eliminadas se marcan como libres y se descartan de los índices
+        secundarios al compactar, cuando superan a las vigentes (coste amortizado constante).
+
+        Returns:
+            Número de amenazas eliminadas
+        """
+        removed = 0
+        touched_buckets = set()
+        for uri in uris:
+            row = self._row_by_uri.pop(str(uri), None)
+            if row is None:
+                continue
+            removed += 1
+            bucket = self._bucket(self._timestamps[row])
+            touched_buckets.add(bucket)
+            self._decrement(self._technique_counts, self._techniques[row])
+            self._decrement(self._tactic_counts, self._tactics[row])
+            self._decrement(self._mitigation_counts, self._mitigations[row])
+            bucket_counts = self._bucket_technique_counts.get(bucket)
+            if bucket_counts is not None:
+                self._decrement(bucket_counts, self._techniques[row])
+
+        # Los intervalos temporales se depuran ya: el desalojo suele vaciar los más antiguos
+        for bucket in touched_buckets:
+            rows = [row for row in self._by_bucket.get(bucket, ()) if self._live(row)]
+            if rows:
+                self._by_bucket[bucket] = rows
+            else:
+                self._by_bucket.pop(bucket, None)
+                self._bucket_technique_counts.pop(bucket, None)
+
+        if len(self._uris) - len(self._row_by_uri) > len(self._row_by_uri):
+            self._compact()
+        return removed
+
+    def _compact(self):
+        """Reconstruye el almacenamiento columnar y los índices solo con las filas vigentes."""
+        records = [self._record(row) for row in sorted(self._row_by_uri.values())]
+        self.__init__(self.bucket_seconds)
+        for record in records:
+            self.add(record['uri'], record['label'], record['confidence'], record['timestamp'],
+                     record['techniques'], record['tactics'], record['mitigations'], record['sample_index'])
+
+    def top_labels(self, n: int = 5, **filters) -> List[Tuple[str, int]]:
+        """Etiquetas de ataque más frecuentes entre las amenazas filtradas."""
+        rows = self._select(**filters) if filters else self._row_by_uri.values()
+        return Counter(self._labels[row] for row in rows).most_common(n)
+
+    def statistics(self) -> Dict[str, int]:
+        """Totales de amenazas y de técnicas, tácticas y mitigaciones distintas."""
+        return {
+            'total_amenazas': len(self),
+            'tecnicas_utilizadas': len(self._technique_counts),
+            'tacticas_utilizadas': len(self._tactic_counts),
+            'mitigaciones_recomendadas': len(self._mitigation_counts)
+        }
@@ -0,0 +1,118 @@
+import os
+import gzip
+import math
+import time
+from datetime import datetime
+from typing import List, Optional, Iterable, Tuple
+
+from rdflib import Graph
+
+from threat_index import ThreatIndex
+
+
+class RetentionPolicy:
+    """
+    Política de retención de los individuos AmenazaDetectada en un proceso de larga duración.
+    Limita las amenazas vivas por antigüedad (detectadaEn), por número y por presupuesto de
+    memoria (triples de amenazas en el grafo). Al superarse un límite se desalojan las más
+    antiguas en lote, hasta bajar a una fracción del límite, para no desalojar en cada inserción.
+    """
+
+    def __init__(self, max_age_seconds: Optional[float] = None, max_threats: Optional[int] = None,
+                 max_triples: Optional[int] = None, low_watermark: float = 0.9,
+                 check_every: int = 100, archive_dir: Optional[str] = None):
+        """
+        Inicializa la política.
+
+        Args:
+            max_age_seconds: Antigüedad máxima de una amenaza (None = sin límite)
+            max_threats: Número máximo de amenazas en el grafo (None = sin límite)
+            max_triples: Presupuesto de memoria en triples de amenazas (None = sin límite)
+            low_watermark: Fracción del límite a la que se baja al desalojar por número o memoria
+            check_every: Amenazas creadas entre dos comprobaciones de la política
+            archive_dir: Directorio donde archivar las amenazas desalojadas (None = no archivar)
+        """
+        if not 0 < low_watermark <= 1:
+            raise ValueError(f"low_watermark debe estar en (0, 1]: {low_watermark}")
+        self.max_age_seconds = max_age_seconds
+        self.max_threats = max_threats
+        self.max_triples = max_triples
+        self.low_watermark = low_watermark
+        self.check_every = max(1, check_every)
+        self.archive_dir = archive_dir
+
+    @property
+    def enabled(self) -> bool:
+        return any(limit is not None for limit in (self.max_age_seconds, self.max_threats, self.max_triples))
+
+    def select(self, threat_index: ThreatIndex, threat_triples: int, now: Optional[float] = None) -> List[str]:
+        """
+        Amenazas a desalojar (las más antiguas primero).
+
+        Args:
+            threat_index: Índice de las amenazas vivas
+            threat_triples: Triples de amenazas presentes en el grafo
+            now: Momento actual (epoch; por defecto, time.time())
+
+        Returns:
+            URIs a desalojar
+        """
+        total = len(threat_index)
+        if total == 0:
+            return []
+
+        n = 0
+        if self.max_threats is not None and total > self.max_threats:
+            n = total - int(self.max_threats * self.low_watermark)
+        if self.max_triples is not None and threat_triples > self.max_triples:
+            per_threat = threat_triples / total
+            excess = threat_triples - self.max_triples * self.low_watermark
+            n = max(n, math.ceil(excess / per_threat))
+
+        # Las selecciones por antigüedad y por número son prefijos del mismo orden temporal
+        if self.max_age_seconds is not None:
+            now = time.time() if now is None else now
+            expired = threat_index.oldest(until=now - self.max_age_seconds)
+            if len(expired) >= n:
+                return expired
+        return threat_index.oldest(n=min(n, total)) if n else []
+
+
+class ThreatArchive:
+    """
+    Archivo en disco de las amenazas desalojadas: un segmento N-Triples comprimido (gzip)
+    por lote, que puede volver a cargarse en un grafo para análisis forense.
+    """
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        os.makedirs(archive_dir, exist_ok=True)
+        self.segments = 0
+
+    def write(self, triples: List[Tuple]) -> Optional[str]:
+        """
+        Escribe un segmento (escritura atómica).
+
+        Returns:
+            Ruta del segmento (None si no hay triples)
+        """
+        if not triples:
+            return None
+        name = f"amenazas_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{self.segments:06d}.nt.gz"
+        path = os.path.join(self.archive_dir, name)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            for s, p, o in triples:
+                f.write(f"{s.n3()} {p.n3()} {o.n3()} .\n")
+        os.replace(tmp_path, path)
+        self.segments += 1
+        return path
+
+    @staticmethod
+    def load(paths: Iterable[str], graph: Optional[Graph] = None) -> Graph:
+        """Carga segmentos archivados en un grafo."""
+        graph = graph if graph is not None else Graph()
+        for path in paths:
+            with gzip.open(path, 'rb') as f:
+                graph.parse(f, format='nt')
+        return graph
@@ -1,28 +1,55 @@
 import json
 from pathlib import Path
-from typing import Union, List, Dict, Any, Optional
+from types import MappingProxyType
+from typing import Union, List, Dict, Any, Optional, Tuple, Mapping, Sequence
 from datetime import datetime
 import uuid
 
+import numpy as np
+
 
 class EnhancedAttackMapper:
     """
     etiqueta ml --> tecnicas MITRE 
     """
     
-    def __init__(self, dict_path: Union[str, Path]):
+    def __init__(self, dict_path: Union[str, Path], stix_index: Optional[Dict[str, Any]] = None):
         """
         Inicializa el mapper con el diccionario de mapeo existente.
         
         Args:
             dict_path: Ruta al archivo mapping_dict.json
+            stix_index: Índice de StixBundleImporter (opcional) con los nombres MITRE oficiales
         """
         with open(dict_path, encoding="utf-8") as fp:
             self.lookup: Dict[str, List[Dict[str, str]]] = json.load(fp)
         
+        if stix_index is not None:
+            self._apply_stix_index(stix_index)
+        
         # Cache para evitar recálculos
         self._technique_cache = {}
         self._populate_technique_cache()
+        
+        # Tablas compiladas e inmutables (códigos enteros)
+        self._compile_tables()
+    
+    def _apply_stix_index(self, stix_index: Dict[str, Any]):
+        """
+        Actualiza nombres de técnicas con el bundle STIX oficial.
+        La táctica del mapping se mantiene, pero se avisa si no figura en MITRE.
+        """
+        stix_techniques = stix_index['techniques']
+        for label, techniques in self.lookup.items():
+            for tech in techniques:
+                stix_tech = stix_techniques.get(tech['idTecnica'])
+                if stix_tech is None:
+                    print(f"Técnica {tech['idTecnica']} ({label}) no encontrada en el bundle STIX")
+                    continue
+                tech['nombreTecnica'] = stix_tech['name']
+                if stix_tech['tactics'] and tech['tactica'] not in stix_tech['tactics']:
+                    print(f"Táctica '{tech['tactica']}' no asociada a {tech['idTecnica']} en MITRE: "
+                          f"{stix_tech['tactics']}")
     
     def _populate_technique_cache(self):
         """
@@ -40,6 +67,56 @@ class EnhancedAttackMapper:
                     }
                 self._technique_cache[tech_id]['associated_labels'].append(label)
     
+    def _compile_tables(self):
+        """
+        Precompila tablas con códigos enteros para etiquetas, técnicas y tácticas,
+        y tuplas congeladas de técnicas por etiqueta (compartidas, nunca se copian).
+        """
+        self.labels: Tuple[str, ...] = tuple(self.lookup.keys())
+        self.label_codes: Dict[str, int] = {label: i for i, label in enumerate(self.labels)}
+        
+        self.technique_ids: Tuple[str, ...] = tuple(self._technique_cache.keys())
+        self.technique_codes: Dict[str, int] = {tech_id: i for i, tech_id in enumerate(self.technique_ids)}
+        
+        self.tactics: Tuple[str, ...] = tuple(sorted({
+            tech['tactica'] for techniques in self.lookup.values() for tech in techniques
+        }))
+        self.tactic_codes: Dict[str, int] = {tactic: i for i, tactic in enumerate(self.tactics)}
+        
+        # Táctica de cada técnica (por código de técnica)
+        self.technique_tactic_codes = np.array(
+            [self.tactic_codes[self._technique_cache[tech_id]['tactic']] for tech_id in self.technique_ids],
+            dtype=np.int16
+        )
+        self.technique_tactic_codes.setflags(write=False)
+        
+        # Técnicas por etiqueta: tuplas de registros de solo lectura y matriz booleana etiqueta x técnica
+        label_techniques = []
+        self.label_technique_matrix = np.zeros((len(self.labels), len(self.technique_ids)), dtype=bool)
+        for code, label in enumerate(self.labels):
+            techniques = tuple(MappingProxyType(dict(tech)) for tech in self.lookup[label])
+            label_techniques.append(techniques)
+            for tech in techniques:
+                self.label_technique_matrix[code, self.technique_codes[tech['idTecnica']]] = True
+        self.label_technique_matrix.setflags(write=False)
+        
+        self._label_techniques: Tuple[Tuple[Mapping[str, str], ...], ...] = tuple(label_techniques)
+        self._label_techniques_array = np.empty(len(self.labels), dtype=object)
+        self._label_techniques_array[:] = self._label_techniques
+        self._label_techniques_array.setflags(write=False)
+    
+    def get_techniques(self, label: str) -> Tuple[Mapping[str, str], ...]:
+        """
+        Devuelve la tupla congelada de técnicas de una etiqueta (sin copiar).
+        
+        Raises:
+            KeyError: Si el label no existe en el diccionario
+        """
+        code = self.label_codes.get(label)
+        if code is None:
+            raise KeyError(f"{label} fuera del diccionario de mapeo")
+        return self._label_techniques[code]
+    
     def map(self, label: str, confidence: float) -> List[Dict[str, Any]]:
         """
         Funcionalidad: mapea label del modelo a técnicas ATT&CK.
@@ -55,43 +132,55 @@ class EnhancedAttackMapper:
         Raises:
             KeyError: Si el label no existe en el diccionario
         """
-        if label not in self.lookup:
-            raise KeyError(f"{label} fuera del diccionario de mapeo")
+        label_techniques = self.get_techniques(label)
 
         # CASO ESPECIAL: Comportamiento normal - NO hay técnicas de ataque
-        if label == "Normal" or len(self.lookup[label]) == 0:
+        if label == "Normal" or len(label_techniques) == 0:
             return []  # Lista vacía - sin técnicas
 
         # CASO NORMAL: Técnicas de ataque
-        techniques = []
-        for tech in self.lookup[label]:
-            enriched = tech.copy()
-            enriched["model_label"] = label
-            enriched["confidence"] = round(confidence, 3)
-            techniques.append(enriched)
-        return techniques
+        rounded = round(confidence, 3)
+        return [{**tech, "model_label": label, "confidence": rounded} for tech in label_techniques]
     
-    
-    def _clean_name(self, name: str) -> str:
+    def map_batch(self, labels: Sequence[str], confidences: Sequence[float]) -> Dict[str, np.ndarray]:
         """
-        Limpia nombres para IDs válidos en ontología - SIN espacios, SIN paréntesis, SIN acentos.
+        Versión vectorizada de map para un array de etiquetas predichas.
+        No crea diccionarios por fila: las técnicas se devuelven como referencias
+        a las tuplas congeladas de cada etiqueta.
         
         Args:
-            name: Nombre original
+            labels: Array de etiquetas devueltas por el modelo ML
+            confidences: Array de confianzas (0.0 - 1.0)
             
         Returns:
-            Nombre limpio para ID
-        """
-        cleaned = name.replace(' ', '_').replace('-', '_').replace('/', '_')
-        cleaned = cleaned.replace('(', '_').replace(')', '_').replace('&', 'and')
-        cleaned = cleaned.replace('á', 'a').replace('é', 'e').replace('í', 'i')
-        cleaned = cleaned.replace('ó', 'o').replace('ú', 'u').replace('ñ', 'n')
-        # Eliminar dobles guiones bajos
-        while '__' in cleaned:
-            cleaned = cleaned.replace('__', '_')
-        # Eliminar guiones bajos al final
-        cleaned = cleaned.strip('_')
-        return cleaned
+            Diccionario con arrays alineados por fila:
+            'label_codes', 'confidences', 'technique_mask' (filas x técnicas) y 'techniques'
+            
+        Raises:
+            KeyError: Si algún label no existe en el diccionario
+        """
+        labels = np.asarray(labels)
+        confidences = np.asarray(confidences, dtype=np.float64)
+        if labels.shape != confidences.shape:
+            raise ValueError(f"labels {labels.shape} y confidences {confidences.shape} no coinciden")
+        
+        # Resolver solo las etiquetas distintas; el resto es indexado vectorizado
+        uniques, inverse = np.unique(labels, return_inverse=True)
+        unique_codes = np.empty(len(uniques), dtype=np.int16)
+        for i, label in enumerate(uniques.tolist()):
+            code = self.label_codes.get(label)
+            if code is None:
+                raise KeyError(f"{label} fuera del diccionario de mapeo")
+            unique_codes[i] = code
+        codes = unique_codes[inverse.reshape(-1)]
+        
+        return {
+            'label_codes': codes,
+            'confidences': np.round(confidences, 3),
+            'technique_mask': self.label_technique_matrix[codes],
+            'techniques': self._label_techniques_array[codes]
+        }
+    
     
     def get_unique_techniques(self) -> List[Dict[str, Any]]:
         """
@@ -110,11 +199,7 @@ class EnhancedAttackMapper:
         Returns:
             Lista de tácticas únicas
         """
-        tactics = set()
-        for techniques in self.lookup.values():
-            for tech in techniques:
-                tactics.add(tech['tactica'])
-        return sorted(list(tactics))
+        return list(self.tactics)
     
     def get_labels_by_technique(self, technique_id: str) -> List[str]:
         """
@@ -144,7 +229,7 @@ class EnhancedAttackMapper:
             'mappings': self.lookup,
             'metadata': {
                 'total_techniques': len(self._technique_cache),
-                'total_tactics': len(self.get_unique_tactics()),
+                'total_tactics': len(self.tactics),
                 'total_labels': len(self.lookup),
                 'export_timestamp': datetime.now().isoformat(),
                 'ontology_version': '2.0',
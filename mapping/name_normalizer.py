@@ -0,0 +1,51 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+
+# Tabla única de sustituciones (un solo str.translate en lugar de replaces encadenados)
+_TRANSLATION_TABLE = str.maketrans({
+    ' ': '_',
+    '-': '_',
+    '/': '_',
+    '(': '_',
+    ')': '_',
+    '&': 'and',
+})
+
+_MULTIPLE_UNDERSCORES = re.compile(r'_{2,}')
+
+
+def fold_accents(text: str) -> str:
+    """
+    Elimina acentos y diacríticos de cualquier carácter Unicode (á → a, ñ → n, ç → c).
+
+    Args:
+        text: Texto original
+
+    Returns:
+        Texto sin marcas diacríticas
+    """
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=4096)
+def clean_name(name: str) -> str:
+    """
+    Limpia nombres para IDs válidos en ontología - SIN espacios, SIN paréntesis, SIN acentos.
+    Compartido por EnhancedAttackMapper, AmenazaCreator y OntologyPopulator.
+
+    Args:
+        name: Nombre original
+
+    Returns:
+        Nombre limpio para ID
+    """
+    cleaned = fold_accents(name).translate(_TRANSLATION_TABLE)
+    # Eliminar dobles guiones bajos
+    cleaned = _MULTIPLE_UNDERSCORES.sub('_', cleaned)
+    # Eliminar guiones bajos al final
+    return cleaned.strip('_')
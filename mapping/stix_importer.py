@@ -0,0 +1,271 @@
+import json
+import os
+import pickle
+import re
+import sys
+from pathlib import Path
+from typing import Union, List, Dict, Any, Iterator, Optional, Iterable
+
+
+# Versión del formato del índice precompilado (incrementar si cambia su estructura)
+INDEX_FORMAT_VERSION = 1
+
+ICS_KILL_CHAIN = "mitre-ics-attack"
+ATTACK_SOURCES = ("mitre-attack", "mitre-ics-attack")
+
+_CITATION_RE = re.compile(r"\(Citation:[^)]*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class StixBundleImporter:
+    """
+    Importa el bundle STIX 2.x de MITRE ATT&CK for ICS (copia local, sin red).
+    Construye índices de técnicas, tácticas, mitigaciones y relaciones,
+    y los cachea en un índice precompilado para evitar reparsear el bundle.
+    """
+
+    def __init__(self, bundle_path: Union[str, Path], cache_path: Optional[Union[str, Path]] = None,
+                 chunk_size: int = 1 << 20):
+        """
+        Inicializa el importador.
+
+        Args:
+            bundle_path: Ruta al bundle STIX (ej: ics-attack.json)
+            cache_path: Ruta al índice precompilado (por defecto junto al bundle)
+            chunk_size: Tamaño de bloque de lectura del parser incremental
+        """
+        self.bundle_path = Path(bundle_path)
+        self.cache_path = Path(cache_path) if cache_path else self.bundle_path.with_suffix(".idx.pkl")
+        self.chunk_size = chunk_size
+        self.index: Optional[Dict[str, Any]] = None
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Devuelve el índice, desde la cache si es válida o parseando el bundle.
+
+        Returns:
+            Diccionario con 'techniques', 'tactics', 'mitigations' y 'relationships'
+        """
+        if self.index is not None:
+            return self.index
+
+        source_key = self._source_key()
+        self.index = self._load_cache(source_key)
+        if self.index is None:
+            print(f"Parseando bundle STIX: {self.bundle_path}")
+            self.index = self._build_index(self._iter_objects())
+            self._save_cache(source_key, self.index)
+
+        print(f"Índice STIX cargado: {len(self.index['techniques'])} técnicas, "
+              f"{len(self.index['tactics'])} tácticas, {len(self.index['mitigations'])} mitigaciones")
+        return self.index
+
+    def _source_key(self) -> Dict[str, int]:
+        """Clave de validez de la cache: tamaño y fecha de modificación del bundle."""
+        stat = os.stat(self.bundle_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def _load_cache(self, source_key: Dict[str, int]) -> Optional[Dict[str, Any]]:
+        """Carga el índice precompilado si corresponde al bundle actual."""
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cached = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Índice STIX precompilado no válido, se regenera: {e}")
+            return None
+
+        if cached.get('format_version') != INDEX_FORMAT_VERSION or cached.get('source') != source_key:
+            return None
+        return cached['index']
+
+    def _save_cache(self, source_key: Dict[str, int], index: Dict[str, Any]):
+        """Guarda el índice precompilado de forma atómica."""
+        payload = {'format_version': INDEX_FORMAT_VERSION, 'source': source_key, 'index': index}
+        tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+            print(f"Índice STIX precompilado guardado: {self.cache_path}")
+        except OSError as e:
+            print(f"No se pudo guardar el índice STIX precompilado: {e}")
+
+    def _iter_objects(self) -> Iterator[Dict[str, Any]]:
+        """
+        Parser JSON incremental: recorre el array 'objects' del bundle
+        decodificando un objeto cada vez, sin cargar el fichero completo.
+        """
+        decoder = json.JSONDecoder()
+        with open(self.bundle_path, 'r', encoding='utf-8') as f:
+            buffer = ""
+            eof = False
+
+            # Localizar el inicio del array "objects"
+            while True:
+                key_pos = buffer.find('"objects"')
+                if key_pos != -1:
+                    array_pos = buffer.find('[', key_pos)
+                    if array_pos != -1:
+                        pos = array_pos + 1
+                        break
+                if eof:
+                    raise ValueError(f"{self.bundle_path} no contiene un array 'objects' STIX")
+                chunk = f.read(self.chunk_size)
+                eof = not chunk
+                buffer += chunk
+
+            while True:
+                # Saltar separadores entre objetos
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+
+                if pos < len(buffer) and buffer[pos] == ']':
+                    return
+
+                obj = None
+                if pos < len(buffer):
+                    try:
+                        obj, pos = decoder.raw_decode(buffer, pos)
+                    except json.JSONDecodeError:
+                        obj = None
+
+                if obj is None:
+                    # Objeto incompleto: leer el siguiente bloque y reintentar
+                    if eof:
+                        raise ValueError(f"Bundle STIX truncado: {self.bundle_path}")
+                    chunk = f.read(self.chunk_size)
+                    eof = not chunk
+                    buffer = buffer[pos:] + chunk
+                    pos = 0
+                    continue
+
+                yield obj
+
+                # Descartar la parte ya consumida para mantener acotado el buffer
+                if pos > self.chunk_size:
+                    buffer = buffer[pos:]
+                    pos = 0
+
+    @staticmethod
+    def _external_id(obj: Dict[str, Any]) -> Optional[str]:
+        """Obtiene el ID MITRE (T0814, M0815, TA0107) de un objeto STIX."""
+        for ref in obj.get('external_references', []):
+            if ref.get('source_name') in ATTACK_SOURCES and ref.get('external_id'):
+                return ref['external_id']
+        return None
+
+    @staticmethod
+    def _clean_description(text: str) -> str:
+        """Elimina citas y espacios redundantes de las descripciones MITRE."""
+        text = _CITATION_RE.sub('', text or '')
+        return _WHITESPACE_RE.sub(' ', text).strip()
+
+    def _build_index(self, objects: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Construye los índices de técnicas, tácticas, mitigaciones y relaciones."""
+        techniques: Dict[str, Dict[str, Any]] = {}
+        tactics: Dict[str, Dict[str, Any]] = {}
+        mitigations: Dict[str, Dict[str, Any]] = {}
+        stix_to_mitre: Dict[str, str] = {}
+        mitigates: List[tuple] = []
+
+        for obj in objects:
+            obj_type = obj.get('type')
+            if obj.get('revoked') or obj.get('x_mitre_deprecated'):
+                continue
+
+            if obj_type == 'relationship':
+                if obj.get('relationship_type') == 'mitigates':
+                    mitigates.append((obj['source_ref'], obj['target_ref']))
+                continue
+
+            external_id = self._external_id(obj)
+            if external_id is None:
+                continue
+
+            if obj_type == 'attack-pattern':
+                phases = [p['phase_name'] for p in obj.get('kill_chain_phases', [])
+                          if p.get('kill_chain_name') == ICS_KILL_CHAIN]
+                techniques[external_id] = {
+                    'id': external_id,
+                    'name': obj.get('name', external_id),
+                    'tactic_shortnames': phases,
+                    'description': self._clean_description(obj.get('description', ''))
+                }
+            elif obj_type == 'x-mitre-tactic':
+                shortname = obj.get('x_mitre_shortname', external_id)
+                tactics[shortname] = {
+                    'id': external_id,
+                    'name': obj.get('name', shortname),
+                    'shortname': shortname
+                }
+            elif obj_type == 'course-of-action' and external_id.startswith('M'):
+                mitigations[external_id] = {
+                    'id': external_id,
+                    'name': obj.get('name', external_id),
+                    'description': self._clean_description(obj.get('description', ''))
+                }
+            else:
+                continue
+
+            stix_to_mitre[obj['id']] = external_id
+
+        # Resolver tácticas por nombre MITRE original
+        for tech in techniques.values():
+            tech['tactics'] = [tactics[s]['name'] for s in tech.pop('tactic_shortnames') if s in tactics]
+
+        # Relaciones mitigación → técnica (las referencias pueden aparecer antes que los objetos)
+        technique_mitigations: Dict[str, List[str]] = {}
+        for source_ref, target_ref in mitigates:
+            mit_id = stix_to_mitre.get(source_ref)
+            tech_id = stix_to_mitre.get(target_ref)
+            if mit_id in mitigations and tech_id in techniques:
+                technique_mitigations.setdefault(tech_id, []).append(mit_id)
+
+        for mit_ids in technique_mitigations.values():
+            mit_ids.sort()
+
+        return {
+            'techniques': techniques,
+            'tactics': {t['name']: t for t in tactics.values()},
+            'mitigations': mitigations,
+            'relationships': {'mitigated_by': technique_mitigations}
+        }
+
+    def to_mitigations_dict(self, technique_ids: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Exporta las mitigaciones con el mismo formato que mitigations_dict.json.
+
+        Args:
+            technique_ids: Técnicas a incluir (por defecto, todas las del bundle)
+
+        Returns:
+            Diccionario técnica → {'technique_name', 'mitigations'}
+        """
+        index = self.load()
+        if technique_ids is None:
+            technique_ids = index['techniques'].keys()
+
+        result = {}
+        for tech_id in technique_ids:
+            tech = index['techniques'].get(tech_id)
+            if tech is None:
+                continue
+            mit_ids = index['relationships']['mitigated_by'].get(tech_id, [])
+            result[tech_id] = {
+                'technique_name': tech['name'],
+                'mitigations': [dict(index['mitigations'][m]) for m in mit_ids]
+            }
+        return result
+
+
+def main():
+    """Precompila el índice STIX para acelerar los siguientes arranques."""
+    bundle_path = sys.argv[1] if len(sys.argv) > 1 else "./mapping/ics-attack.json"
+    importer = StixBundleImporter(bundle_path)
+    importer.load()
+
+
+if __name__ == "__main__":
+    main()
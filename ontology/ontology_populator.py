@@ -5,9 +5,12 @@ project_root = os.path.dirname(script_dir)
 sys.path.append(os.path.join(project_root, 'mapping'))
 
 from enhanced_mapper import EnhancedAttackMapper
+from stix_importer import StixBundleImporter
+from name_normalizer import clean_name
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from datetime import datetime
+from xml.sax.saxutils import escape
 import json
 
 
@@ -17,7 +20,8 @@ class OntologyPopulator:
     Ataque, Tecnica, Tactica, Mitigacion, AmenazaDetectada
     """
     
-    def __init__(self, mapping_dict_path: str, mitigations_dict_path: str = "../integration/mitigations_dict.json", output_dir: str = "."):
+    def __init__(self, mapping_dict_path: str, mitigations_dict_path: str = "../integration/mitigations_dict.json", output_dir: str = ".",
+                 stix_bundle_path: Optional[str] = None):
         """
         Inicializa el poblador de ontología.
         
@@ -25,14 +29,27 @@ class OntologyPopulator:
             mapping_dict_path: Ruta al mapping_dict.json
             mitigations_dict_path: Ruta al mitigations_dict.json
             output_dir: Directorio donde guardar los archivos .owl
+            stix_bundle_path: Ruta opcional al bundle STIX de MITRE ATT&CK for ICS
         """
-        self.mapper = EnhancedAttackMapper(mapping_dict_path)
+        stix_importer = StixBundleImporter(stix_bundle_path) if stix_bundle_path else None
+        stix_index = stix_importer.load() if stix_importer else None
+        
+        self.mapper = EnhancedAttackMapper(mapping_dict_path, stix_index=stix_index)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
         # Cargar mitigaciones
         self.mitigations_data = self._load_mitigations(mitigations_dict_path)
         
+        # Las mitigaciones del bundle STIX tienen prioridad sobre el diccionario manual
+        if stix_importer:
+            stix_mitigations = stix_importer.to_mitigations_dict(
+                [tech['id'] for tech in self.mapper.get_unique_techniques()]
+            )
+            self.mitigations_data.update(
+                {tech_id: data for tech_id, data in stix_mitigations.items() if data['mitigations']}
+            )
+        
         # Namespace simplificado
         self.base_iri = "http://universidad.es/tfm/ids-iiot"
         self.ontology_iri = f"{self.base_iri}/ontologia"
@@ -153,6 +170,29 @@ class OntologyPopulator:
         <rdfs:comment>Técnica de ataque se mitiga con estrategia específica</rdfs:comment>
     </owl:ObjectProperty>
     
+    <!-- Relaciones derivadas (cierre materializado de las cadenas estructurales) -->
+    <owl:ObjectProperty rdf:about="#implementa_tactica">
+        <rdfs:label>implementa_tactica</rdfs:label>
+        <rdfs:domain rdf:resource="#Ataque"/>
+        <rdfs:range rdf:resource="#Tactica"/>
+        <rdfs:comment>Tipo de ataque persigue la táctica de alguna de sus técnicas (cadena implementa_tecnica → pertenece_a_tactica)</rdfs:comment>
+        <owl:propertyChainAxiom rdf:parseType="Collection">
+            <rdf:Description rdf:about="#implementa_tecnica"/>
+            <rdf:Description rdf:about="#pertenece_a_tactica"/>
+        </owl:propertyChainAxiom>
+    </owl:ObjectProperty>
+    
+    <owl:ObjectProperty rdf:about="#se_mitiga_con">
+        <rdfs:label>se_mitiga_con</rdfs:label>
+        <rdfs:domain rdf:resource="#Ataque"/>
+        <rdfs:range rdf:resource="#Mitigacion"/>
+        <rdfs:comment>Tipo de ataque se mitiga con las mitigaciones de sus técnicas (cadena implementa_tecnica → mitigada_por)</rdfs:comment>
+        <owl:propertyChainAxiom rdf:parseType="Collection">
+            <rdf:Description rdf:about="#implementa_tecnica"/>
+            <rdf:Description rdf:about="#mitigada_por"/>
+        </owl:propertyChainAxiom>
+    </owl:ObjectProperty>
+    
     <!-- ==================== PROPIEDADES DATOS ==================== -->
     
     <owl:DatatypeProperty rdf:about="#tieneID">
@@ -211,6 +251,9 @@ class OntologyPopulator:
         # Añadir relaciones estructurales
         owl_content += self._generate_structural_relationships()
         
+        # Añadir relaciones derivadas (ataque → táctica / mitigación)
+        owl_content += self._generate_derived_relationships()
+        
         owl_content += "\n</rdf:RDF>"
         return owl_content
     
@@ -220,7 +263,7 @@ class OntologyPopulator:
         content = "\n    <!-- ==================== INDIVIDUOS TACTICAS ==================== -->\n"
         
         for tactic in tactics:
-            tactic_clean = self._clean_name(tactic)
+            tactic_clean = clean_name(tactic)
             content += f'''
     <owl:NamedIndividual rdf:about="#{tactic_clean}">
         <rdf:type rdf:resource="#Tactica"/>
@@ -242,7 +285,7 @@ class OntologyPopulator:
     <owl:NamedIndividual rdf:about="#{tech_clean}">
         <rdf:type rdf:resource="#Tecnica"/>
         <tieneID rdf:datatype="http://www.w3.org/2001/XMLSchema#string">{tech['id']}</tieneID>
-        <tieneNombre rdf:datatype="http://www.w3.org/2001/XMLSchema#string">{tech['name']}</tieneNombre>
+        <tieneNombre rdf:datatype="http://www.w3.org/2001/XMLSchema#string">{escape(tech['name'])}</tieneNombre>
         <rdfs:label>{tech_clean}</rdfs:label>
         <rdfs:comment>Técnica MITRE ATT&amp;CK for ICS</rdfs:comment>
     </owl:NamedIndividual>
@@ -259,7 +302,7 @@ class OntologyPopulator:
             if label == "Normal":
                 continue
                 
-            attack_clean = f"{self._clean_name(label)}"
+            attack_clean = f"{clean_name(label)}"
             content += f'''
     <owl:NamedIndividual rdf:about="#{attack_clean}">
         <rdf:type rdf:resource="#Ataque"/>
@@ -297,8 +340,8 @@ class OntologyPopulator:
     <owl:NamedIndividual rdf:about="#{mit_clean}">
         <rdf:type rdf:resource="#Mitigacion"/>
         <tieneID rdf:datatype="http://www.w3.org/2001/XMLSchema#string">{mitigation['id']}</tieneID>
-        <tieneNombre rdf:datatype="http://www.w3.org/2001/XMLSchema#string">{mitigation['name']}</tieneNombre>
-        <tieneDescripcion rdf:datatype="http://www.w3.org/2001/XMLSchema#string">{mitigation['description']}</tieneDescripcion>
+        <tieneNombre rdf:datatype="http://www.w3.org/2001/XMLSchema#string">{escape(mitigation['name'])}</tieneNombre>
+        <tieneDescripcion rdf:datatype="http://www.w3.org/2001/XMLSchema#string">{escape(mitigation['description'])}</tieneDescripcion>
         <rdfs:label>{mit_clean}</rdfs:label>
         <rdfs:comment>Mitigación MITRE ATT&amp;CK for ICS</rdfs:comment>
     </owl:NamedIndividual>
@@ -313,7 +356,7 @@ class OntologyPopulator:
         techniques = self.mapper.get_unique_techniques()
         for tech in techniques:
             tech_clean = f"{tech['id']}"
-            tactic_clean = self._clean_name(tech['tactic'])
+            tactic_clean = clean_name(tech['tactic'])
             
             content += f'''
     <owl:NamedIndividual rdf:about="#{tech_clean}">
@@ -327,7 +370,7 @@ class OntologyPopulator:
             if label == "Normal" or len(techniques_list) == 0:
                 continue
                 
-            attack_clean = f"{self._clean_name(label)}"
+            attack_clean = f"{clean_name(label)}"
             for tech in techniques_list:
                 tech_clean = f"{tech['idTecnica']}"
                 content += f'''
@@ -351,18 +394,54 @@ class OntologyPopulator:
         
         return content
     
-    def _clean_name(self, name: str) -> str:
-        """Limpia nombres para IDs válidos - sin espacios, sin paréntesis, sin acentos."""
-        cleaned = name.replace(' ', '_').replace('-', '_').replace('/', '_')
-        cleaned = cleaned.replace('(', '_').replace(')', '_').replace('&', 'and')
-        cleaned = cleaned.replace('á', 'a').replace('é', 'e').replace('í', 'i')
-        cleaned = cleaned.replace('ó', 'o').replace('ú', 'u').replace('ñ', 'n')
-        # Eliminar dobles guiones bajos
-        while '__' in cleaned:
-            cleaned = cleaned.replace('__', '_')
-        # Eliminar guiones bajos al final
-        cleaned = cleaned.strip('_')
-        return cleaned
+    def _generate_derived_relationships(self) -> str:
+        """
+        Materializa el cierre de las cadenas implementa_tecnica ∘ pertenece_a_tactica e
+        implementa_tecnica ∘ mitigada_por, declaradas con owl:propertyChainAxiom.
+        Así, al crear una amenaza basta una consulta de un salto desde el Ataque, y los
+        consumidores SPARQL o razonadores externos no necesitan recorrer las cadenas.
+        """
+        content = "\n    <!-- ==================== RELACIONES DERIVADAS ==================== -->\n"
+        
+        # Mismas fuentes que las relaciones estructurales, para que el cierre sea exacto
+        technique_tactics: Dict[str, List[str]] = {}
+        for tech in self.mapper.get_unique_techniques():
+            tactics = technique_tactics.setdefault(tech['id'], [])
+            tactic_clean = clean_name(tech['tactic'])
+            if tactic_clean not in tactics:
+                tactics.append(tactic_clean)
+        
+        for label, techniques_list in self.mapper.lookup.items():
+            if label == "Normal" or len(techniques_list) == 0:
+                continue
+            
+            attack_clean = f"{clean_name(label)}"
+            tactics, mitigations = [], []
+            for tech in techniques_list:
+                tech_id = f"{tech['idTecnica']}"
+                for tactic_clean in technique_tactics.get(tech_id, []):
+                    if tactic_clean not in tactics:
+                        tactics.append(tactic_clean)
+                for mitigation in self.mitigations_data.get(tech_id, {}).get('mitigations', []):
+                    mit_clean = f"{mitigation['id']}"
+                    if mit_clean not in mitigations:
+                        mitigations.append(mit_clean)
+            
+            if not tactics and not mitigations:
+                continue
+            content += f'''
+    <owl:NamedIndividual rdf:about="#{attack_clean}">
+'''
+            for tactic_clean in tactics:
+                content += f'''        <implementa_tactica rdf:resource="#{tactic_clean}"/>
+'''
+            for mit_clean in mitigations:
+                content += f'''        <se_mitiga_con rdf:resource="#{mit_clean}"/>
+'''
+            content += '''    </owl:NamedIndividual>
+'''
+        
+        return content
     
     def create_ontology_file(self):
         """Crea el archivo de ontología completo."""
@@ -402,6 +481,8 @@ class OntologyPopulator:
         print(f"  - implementa_tecnica: Ataque → Tecnica")
         print(f"  - pertenece_a_tactica: Tecnica → Tactica")
         print(f"  - mitigada_por: Tecnica → Mitigacion")
+        print(f"  - implementa_tactica: Ataque → Tactica (derivada)")
+        print(f"  - se_mitiga_con: Ataque → Mitigacion (derivada)")
         
         return ontology_path
     
@@ -430,11 +511,17 @@ def main():
     mitigations_dict_path = "./integration/mitigations_dict.json"
     output_dir = "./ontology"
     
+    # Bundle STIX de MITRE ATT&CK for ICS (opcional, copia local)
+    stix_bundle_path = "./mapping/ics-attack.json"
+    if not os.path.exists(stix_bundle_path):
+        stix_bundle_path = None
+    
     # Crear el poblador
     populator = OntologyPopulator(
         mapping_dict_path=mapping_dict_path,
         mitigations_dict_path=mitigations_dict_path,
-        output_dir=output_dir
+        output_dir=output_dir,
+        stix_bundle_path=stix_bundle_path
     )
     
     # Crear la ontología
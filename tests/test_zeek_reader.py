@@ -0,0 +1,27 @@
+import os
+import sys
+import json
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dataset'))
+
+from zeek_reader import read_zeek_log
+
+
+def test_json_iso8601_ts_mixed_precision(tmp_path):
+    """ts ISO 8601 con y sin fracción → epoch en segundos; los inválidos quedan a NaN."""
+    records = [
+        {'ts': '2026-01-01T00:00:00.500000Z', 'uid': 'C1'},
+        {'ts': '2026-01-01T00:00:01Z', 'uid': 'C2'},
+        {'ts': '2026-01-01T00:00:02.25Z', 'uid': 'C3'},
+        {'ts': 'no-es-fecha', 'uid': 'C4'},
+    ]
+    log_file = tmp_path / 'conn.log'
+    log_file.write_text('\n'.join(json.dumps(record) for record in records) + '\n')
+
+    df = read_zeek_log(str(log_file), ['ts', 'uid'])
+
+    base = 1767225600.0  # 2026-01-01T00:00:00Z
+    np.testing.assert_allclose(df['ts'].iloc[:3].to_numpy(), [base + 0.5, base + 1.0, base + 2.25])
+    assert np.isnan(df['ts'].iloc[3])
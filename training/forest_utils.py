@@ -0,0 +1,14 @@
+from sklearn.ensemble import RandomForestClassifier
+
+
+def final_forest(model) -> RandomForestClassifier:
+    """Devuelve el RandomForest del modelo (directo o último paso de un Pipeline con SMOTE)."""
+    forest = model.steps[-1][1] if hasattr(model, 'steps') else model
+    if not isinstance(forest, RandomForestClassifier):
+        raise TypeError(f"Se esperaba un RandomForest, no {type(forest).__name__}")
+    return forest
+
+
+def forest_param(model, name: str) -> str:
+    """Nombre del parámetro del RandomForest dentro del modelo (prefijo del Pipeline si aplica)."""
+    return f"{model.steps[-1][0]}__{name}" if hasattr(model, 'steps') else name
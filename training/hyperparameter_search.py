@@ -0,0 +1,375 @@
+import os
+import json
+import math
+import time
+import pickle
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterSampler, StratifiedKFold, train_test_split
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.svm import SVC
+
+
+# Espacios de búsqueda del notebook de entrenamiento (clasificación binaria)
+SEARCH_SPACES = {
+    'DecisionTree': {
+        'estimator': DecisionTreeClassifier(random_state=42),
+        'params': {
+            'max_depth': [None, 10, 20, 30],
+            'min_samples_split': [2, 5, 10],
+            'min_samples_leaf': [1, 2, 4],
+            'criterion': ['gini', 'entropy']
+        },
+        'scaled': False
+    },
+    'RandomForest': {
+        # n_jobs=1: el paralelismo se hace a nivel de (candidato, fold)
+        'estimator': RandomForestClassifier(random_state=42, n_jobs=1),
+        'params': {
+            'n_estimators': [50, 100, 200],
+            'max_depth': [None, 20, 30],
+            'min_samples_split': [2, 5, 10],
+            'min_samples_leaf': [1, 2, 4],
+            'criterion': ['gini', 'entropy']
+        },
+        'scaled': False
+    },
+    'SVM': {
+        # SVM usa datos normalizados (obligatorio)
+        'estimator': SVC(random_state=42),
+        'params': {
+            'C': [0.1, 1, 10],
+            'kernel': ['rbf', 'linear'],
+            'gamma': ['scale', 'auto'],
+            'class_weight': ['balanced']
+        },
+        'scaled': True
+    }
+}
+
+
+class SharedTrainingMatrix:
+    """
+    Guarda la matriz de entrenamiento una sola vez en disco (.npy) y la abre
+    como memmap de solo lectura: todos los workers comparten las mismas páginas
+    en lugar de recibir una copia de los datos cada uno.
+    """
+
+    def __init__(self, cache_dir: str = "./data/shared"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def share(self, name: str, array, dtype=np.float32) -> np.memmap:
+        """
+        Vuelca un array/DataFrame a disco (si no existe ya) y lo devuelve como memmap.
+
+        Args:
+            name: Nombre del fichero compartido
+            array: Datos a compartir
+            dtype: Tipo de datos del memmap
+
+        Returns:
+            Array memmap de solo lectura
+        """
+        values = np.ascontiguousarray(np.asarray(array, dtype=dtype))
+        digest = hashlib.sha1(values.data).hexdigest()[:12]
+        path = self.cache_dir / f"{name}_{digest}.npy"
+        if not path.exists():
+            tmp_path = path.with_name(path.name + ".tmp.npy")
+            np.save(tmp_path, values)
+            os.replace(tmp_path, path)
+        del values
+        return np.load(path, mmap_mode='r')
+
+
+def _digest(array) -> str:
+    """Hash corto del contenido de un array."""
+    values = np.ascontiguousarray(array)
+    if values.dtype == object:
+        return hashlib.sha1(json.dumps(values.tolist(), default=str).encode()).hexdigest()[:12]
+    return hashlib.sha1(values.data).hexdigest()[:12]
+
+
+class FoldCheckpoint:
+    """
+    Registro JSONL de folds completados. Permite reanudar una búsqueda
+    interrumpida sin repetir los (candidato, recurso, fold) ya evaluados.
+    La primera línea guarda el contexto de la búsqueda (datos, cv, métrica, semilla...):
+    si no coincide con el actual, las puntuaciones guardadas no son válidas y se descartan.
+    """
+
+    def __init__(self, path: str, context: Optional[Dict[str, Any]] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.context = json.loads(json.dumps(context, sort_keys=True, default=str)) if context else None
+        self.scores: Dict[str, float] = {}
+        stored_context = None
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Última línea truncada por una interrupción
+                        continue
+                    if 'context' in entry:
+                        stored_context = entry['context']
+                        continue
+                    self.scores[entry['key']] = entry['score']
+            if self.context is not None and stored_context != self.context:
+                print(f" Checkpoint {self.path.name} de otra búsqueda (datos o parámetros distintos): "
+                      f"se descartan {len(self.scores)} folds")
+                self.scores = {}
+                self.path.unlink()
+            else:
+                print(f" Checkpoint cargado: {len(self.scores)} folds completados")
+        if self.context is not None and not self.path.exists():
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'context': self.context}, sort_keys=True) + "\n")
+
+    @staticmethod
+    def key(params: Dict[str, Any], n_resources: int, fold: int) -> str:
+        """Clave estable de un fold evaluado."""
+        params_json = json.dumps(params, sort_keys=True, default=str)
+        return f"{params_json}|{n_resources}|{fold}"
+
+    def record(self, key: str, score: float):
+        """Añade un fold completado al checkpoint (append + flush)."""
+        self.scores[key] = score
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'key': key, 'score': score}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _fit_and_score_fold(estimator, params: Dict[str, Any], X, y, train_idx, test_idx, scoring: str) -> float:
+    """Entrena un candidato en un fold y devuelve su puntuación (se ejecuta en el worker)."""
+    model = clone(estimator).set_params(**params)
+    model.fit(X[train_idx], y[train_idx])
+    return float(get_scorer(scoring)(model, X[test_idx], y[test_idx]))
+
+
+class SuccessiveHalvingSearch:
+    """
+    Búsqueda de hiperparámetros por successive halving (estilo HalvingRandomSearchCV):
+    muchos candidatos con pocas muestras y, en cada ronda, solo el mejor 1/factor
+    pasa a evaluarse con factor veces más muestras.
+    """
+
+    def __init__(self, estimator, param_distributions: Dict[str, List[Any]],
+                 checkpoint_path: str,
+                 n_candidates: Optional[int] = None,
+                 factor: int = 3,
+                 min_resources: int = 2000,
+                 max_resources: Optional[int] = None,
+                 cv: int = 5,
+                 scoring: str = 'f1',
+                 n_jobs: int = -1,
+                 random_state: int = 42):
+        """
+        Inicializa la búsqueda.
+
+        Args:
+            estimator: Estimador base de sklearn
+            param_distributions: Espacio de búsqueda
+            checkpoint_path: Fichero JSONL de folds completados (validado contra datos y parámetros en fit)
+            n_candidates: Candidatos iniciales (por defecto, todo el grid)
+            factor: Proporción de eliminación entre rondas
+            min_resources: Muestras de la primera ronda
+            max_resources: Máximo de muestras por ronda (por defecto, todo el conjunto)
+            cv: Número de folds
+            scoring: Métrica de sklearn a maximizar
+            n_jobs: Workers en paralelo
+            random_state: Semilla
+        """
+        self.estimator = estimator
+        self.param_distributions = param_distributions
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint: Optional[FoldCheckpoint] = None
+        self.n_candidates = n_candidates
+        self.factor = factor
+        self.min_resources = min_resources
+        self.max_resources = max_resources
+        self.cv = cv
+        self.scoring = scoring
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+        self.best_params_: Optional[Dict[str, Any]] = None
+        self.best_score_: Optional[float] = None
+        self.history_: List[Dict[str, Any]] = []
+
+    def _candidates(self) -> List[Dict[str, Any]]:
+        """Muestrea candidatos de forma determinista."""
+        grid_size = math.prod(len(v) for v in self.param_distributions.values())
+        n_candidates = min(self.n_candidates or grid_size, grid_size)
+        return list(ParameterSampler(self.param_distributions, n_candidates, random_state=self.random_state))
+
+    def _subset(self, y: np.ndarray, n_resources: int) -> np.ndarray:
+        """Índices ordenados de un subconjunto estratificado de tamaño n_resources."""
+        if n_resources >= len(y):
+            return np.arange(len(y))
+        idx, _ = train_test_split(np.arange(len(y)), train_size=n_resources,
+                                  stratify=y, random_state=self.random_state)
+        return np.sort(idx)
+
+    def fit(self, X, y) -> 'SuccessiveHalvingSearch':
+        """
+        Ejecuta la búsqueda sobre X (idealmente un memmap compartido) e y.
+        """
+        y = np.asarray(y)
+        # Las puntuaciones guardadas solo valen para los mismos datos, folds, métrica y estimador base
+        self.checkpoint = FoldCheckpoint(self.checkpoint_path, context={
+            'X': [list(np.shape(X)), _digest(X)],
+            'y': _digest(y),
+            'cv': self.cv,
+            'scoring': self.scoring,
+            'random_state': self.random_state,
+            'estimator': type(self.estimator).__name__,
+            'estimator_params': self.estimator.get_params(deep=False)
+        })
+        max_resources = min(self.max_resources or len(y), len(y))
+        candidates = self._candidates()
+        n_resources = min(self.min_resources, max_resources)
+        rung = 0
+
+        print(f" Successive halving: {len(candidates)} candidatos, {n_resources}→{max_resources} muestras")
+
+        while True:
+            subset = self._subset(y, n_resources)
+            folds = list(StratifiedKFold(n_splits=self.cv, shuffle=True, random_state=self.random_state)
+                         .split(subset, y[subset]))
+
+            # Tareas pendientes (las completadas se leen del checkpoint)
+            tasks = []
+            for c, params in enumerate(candidates):
+                for f, (train, test) in enumerate(folds):
+                    key = FoldCheckpoint.key(params, n_resources, f)
+                    if key not in self.checkpoint.scores:
+                        tasks.append((key, params, subset[train], subset[test]))
+
+            start = time.time()
+            if tasks:
+                results = Parallel(n_jobs=self.n_jobs, return_as="generator")(
+                    delayed(_fit_and_score_fold)(self.estimator, params, X, y, train, test, self.scoring)
+                    for _, params, train, test in tasks
+                )
+                for (key, _, _, _), score in zip(tasks, results):
+                    self.checkpoint.record(key, score)
+
+            mean_scores = np.array([
+                np.mean([self.checkpoint.scores[FoldCheckpoint.key(params, n_resources, f)]
+                         for f in range(len(folds))])
+                for params in candidates
+            ])
+            order = np.argsort(-mean_scores, kind='stable')
+
+            self.history_.append({
+                'rung': rung,
+                'n_resources': n_resources,
+                'n_candidates': len(candidates),
+                'best_score': float(mean_scores[order[0]]),
+                'elapsed_s': time.time() - start
+            })
+            print(f"  Ronda {rung}: {len(candidates)} candidatos x {n_resources} muestras "
+                  f"→ mejor {self.scoring}={mean_scores[order[0]]:.4f} ({time.time() - start:.1f}s)")
+
+            if len(candidates) == 1 or n_resources >= max_resources:
+                self.best_params_ = candidates[order[0]]
+                self.best_score_ = float(mean_scores[order[0]])
+                return self
+
+            keep = max(1, math.ceil(len(candidates) / self.factor))
+            candidates = [candidates[i] for i in order[:keep]]
+            n_resources = min(n_resources * self.factor, max_resources)
+            rung += 1
+
+
+def load_train_test_data(data_path: str) -> Dict[str, Any]:
+    """Carga el diccionario train_test_data.pkl generado por el notebook de entrenamiento."""
+    with open(data_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def run_search(model_name: str, data: Dict[str, Any], shared: SharedTrainingMatrix,
+               checkpoint_dir: str, **search_kwargs) -> SuccessiveHalvingSearch:
+    """
+    Lanza la búsqueda de un modelo de SEARCH_SPACES sobre la matriz compartida.
+
+    Returns:
+        Búsqueda ajustada
+    """
+    space = SEARCH_SPACES[model_name]
+    X_key = 'X_train_scaled' if space['scaled'] else 'X_train_original'
+    dtype = np.float64 if space['scaled'] else np.float32
+    X_train = shared.share(X_key, data[X_key], dtype=dtype)
+    y_train = np.asarray(data['y_train_bin'])
+
+    print(f"\n Optimización de hiperparámetros para {model_name}...")
+    search = SuccessiveHalvingSearch(
+        space['estimator'], space['params'],
+        # Un fichero por matriz (su nombre incluye el hash); y, cv, métrica y semilla se validan en su cabecera
+        checkpoint_path=os.path.join(checkpoint_dir, f"search_{model_name}_{Path(X_train.filename).stem}.jsonl"),
+        **search_kwargs
+    )
+    search.fit(X_train, y_train)
+    print(f" Mejores parámetros: {search.best_params_}")
+    print(f" Mejor puntuación: {search.best_score_:.4f}")
+    return search
+
+
+def main():
+    """Búsqueda de hiperparámetros reanudable para DT, RF y SVM."""
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros por successive halving")
+    parser.add_argument('--data', default="./data/train_test_data.pkl")
+    parser.add_argument('--models', nargs='+', default=list(SEARCH_SPACES), choices=list(SEARCH_SPACES))
+    parser.add_argument('--checkpoint-dir', default="./models/search_checkpoints")
+    parser.add_argument('--shared-dir', default="./data/shared")
+    parser.add_argument('--n-candidates', type=int, default=None)
+    parser.add_argument('--factor', type=int, default=3)
+    parser.add_argument('--min-resources', type=int, default=2000)
+    parser.add_argument('--max-resources', type=int, default=None)
+    parser.add_argument('--cv', type=int, default=5)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--fit-final', action='store_true', help="Entrena y guarda el modelo final")
+    args = parser.parse_args()
+
+    data = load_train_test_data(args.data)
+    shared = SharedTrainingMatrix(args.shared_dir)
+
+    for model_name in args.models:
+        search = run_search(
+            model_name, data, shared, args.checkpoint_dir,
+            n_candidates=args.n_candidates, factor=args.factor,
+            min_resources=args.min_resources, max_resources=args.max_resources,
+            cv=args.cv, n_jobs=args.n_jobs
+        )
+
+        params_path = os.path.join(args.checkpoint_dir, f"best_params_{model_name}.json")
+        with open(params_path, 'w', encoding='utf-8') as f:
+            json.dump({'best_params': search.best_params_, 'best_score': search.best_score_,
+                       'history': search.history_}, f, indent=2, default=str)
+        print(f" Parámetros guardados en {params_path}")
+
+        if args.fit_final:
+            model = clone(SEARCH_SPACES[model_name]['estimator']).set_params(**search.best_params_)
+            if model_name == 'SVM':
+                model.set_params(probability=True)
+            # Ajuste final con el DataFrame para conservar los nombres de columnas
+            X_key = 'X_train_scaled' if SEARCH_SPACES[model_name]['scaled'] else 'X_train_original'
+            model.fit(data[X_key], data['y_train_bin'])
+            with open(f"./models/modelo_{model_name}.pkl", "wb") as f:
+                pickle.dump(model, f)
+            print(f" Modelo final guardado: ./models/modelo_{model_name}.pkl")
+
+
+if __name__ == "__main__":
+    main()
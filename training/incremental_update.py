@@ -0,0 +1,181 @@
+import os
+import shutil
+import pickle
+import argparse
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from forest_utils import final_forest
+
+
+def load_labeled_data(data_path: str) -> pd.DataFrame:
+    """
+    Carga datos Zeek etiquetados con el formato de ML_NG-IIoTset
+    (características + 'isAttack' + 'typeAttack'), en CSV o pickle.
+    """
+    if data_path.endswith('.csv'):
+        return pd.read_csv(data_path)
+    with open(data_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _replay_sample(X_old: pd.DataFrame, y_old: pd.Series, per_class: int, random_state: int) -> Tuple[pd.DataFrame, pd.Series]:
+    """Muestra estratificada de los datos de entrenamiento previos (hasta per_class filas por clase)."""
+    rng = np.random.default_rng(random_state)
+    y_values = np.asarray(y_old)
+    selected = []
+    for cls in np.unique(y_values):
+        idx = np.flatnonzero(y_values == cls)
+        if len(idx) > per_class:
+            idx = rng.choice(idx, size=per_class, replace=False)
+        selected.append(idx)
+    selected = np.sort(np.concatenate(selected))
+    return X_old.iloc[selected], y_old.iloc[selected]
+
+
+def extend_random_forest(model, X_new: pd.DataFrame, y_new: pd.Series, n_new_trees: int = 20,
+                         replay: Optional[Tuple[pd.DataFrame, pd.Series]] = None,
+                         replay_per_class: int = 200, random_state: int = 42):
+    """
+    Amplía un RandomForest entrenado con árboles nuevos (warm start) sin reentrenar los existentes.
+    Los árboles nuevos se entrenan con los datos nuevos más una pequeña muestra de repaso
+    de los datos previos, para que vean todas las clases del modelo.
+
+    Args:
+        model: RandomForest o Pipeline (SMOTE + RandomForest) ya entrenado
+        X_new: Características de los datos nuevos
+        y_new: Etiquetas de los datos nuevos
+        n_new_trees: Número de árboles a añadir
+        replay: (X, y) de entrenamiento previos para la muestra de repaso
+        replay_per_class: Filas de repaso por clase
+        random_state: Semilla
+
+    Returns:
+        El mismo modelo, ampliado
+
+    Raises:
+        ValueError: Si los datos nuevos contienen clases desconocidas para el modelo
+    """
+    forest = final_forest(model)
+
+    unknown = set(np.unique(np.asarray(y_new))) - set(forest.classes_)
+    if unknown:
+        raise ValueError(f"Clases nuevas {sorted(map(str, unknown))}: requiere reentrenamiento completo")
+
+    if hasattr(forest, 'feature_names_in_'):
+        X_new = X_new[list(forest.feature_names_in_)]
+
+    X_fit, y_fit = X_new, y_new
+    if replay is not None:
+        X_old, y_old = replay
+        X_old = X_old[list(X_new.columns)]
+        X_replay, y_replay = _replay_sample(X_old, y_old, replay_per_class, random_state)
+        X_fit = pd.concat([X_new, X_replay], ignore_index=True)
+        y_fit = pd.concat([pd.Series(np.asarray(y_new)), pd.Series(np.asarray(y_replay))], ignore_index=True)
+
+    missing = set(forest.classes_) - set(np.unique(np.asarray(y_fit)))
+    if missing:
+        raise ValueError(f"Faltan clases {sorted(map(str, missing))} en los datos de ampliación: "
+                         f"proporcione datos de repaso")
+
+    previous_trees = forest.n_estimators
+    forest.set_params(warm_start=True, n_estimators=previous_trees + n_new_trees)
+    try:
+        # En un Pipeline, fit reaplica SMOTE y ajusta el mismo RandomForest (sin clonar)
+        model.fit(X_fit, y_fit)
+    finally:
+        forest.set_params(warm_start=False)
+
+    print(f" Árboles: {previous_trees} → {len(forest.estimators_)} "
+          f"(entrenados con {len(X_fit):,} filas)")
+    return model
+
+
+def save_model_atomic(model, model_path: str, keep_backup: bool = True) -> str:
+    """
+    Guarda un modelo sustituyendo el fichero de forma atómica (os.replace),
+    para que MLHandler nunca lea un pickle a medio escribir.
+
+    Returns:
+        Ruta de la copia de seguridad del modelo anterior (o '' si no hay)
+    """
+    backup_path = ''
+    if keep_backup and os.path.exists(model_path):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = model_path.replace('.pkl', f'_{timestamp}.bak.pkl')
+        shutil.copy2(model_path, backup_path)
+
+    tmp_path = model_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(model, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, model_path)
+    print(f" Modelo guardado: {model_path}" + (f" (anterior en {backup_path})" if backup_path else ""))
+    return backup_path
+
+
+def update_models(binary_model_path: str, multi_model_path: str, new_data: pd.DataFrame,
+                  base_data: Optional[Dict[str, Any]] = None, n_new_trees: int = 20,
+                  replay_per_class: int = 200) -> Dict[str, int]:
+    """
+    Amplía los modelos binario y multiclase con datos nuevos y los guarda en su sitio.
+
+    Returns:
+        Número de árboles de cada modelo tras la actualización
+    """
+    X_new = new_data.drop(['typeAttack', 'isAttack'], axis=1)
+    targets = {
+        'binary': (binary_model_path, new_data['isAttack'], 'y_train_bin'),
+        'multi': (multi_model_path, new_data['typeAttack'], 'y_train_multi')
+    }
+
+    trees = {}
+    for name, (model_path, y_new, y_key) in targets.items():
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+
+        replay = None
+        if base_data is not None:
+            replay = (base_data['X_train_original'], base_data[y_key])
+
+        print(f"\n Ampliando modelo {name}: {model_path}")
+        extend_random_forest(model, X_new, y_new, n_new_trees=n_new_trees,
+                             replay=replay, replay_per_class=replay_per_class)
+        save_model_atomic(model, model_path)
+        trees[name] = len(final_forest(model).estimators_)
+
+    return trees
+
+
+def main():
+    """Actualización incremental de los modelos RandomForest con nuevas capturas etiquetadas."""
+    parser = argparse.ArgumentParser(description="Amplía los RandomForest con datos Zeek nuevos (warm start)")
+    parser.add_argument('new_data', help="CSV/PKL etiquetado con el formato de ML_NG-IIoTset")
+    parser.add_argument('--binary-model', default="./models/modelo_RandomForest.pkl")
+    parser.add_argument('--multi-model', default="./models/modelo_RandomForest_multi.pkl")
+    parser.add_argument('--base-data', default="./data/train_test_data.pkl",
+                        help="Datos de entrenamiento previos para la muestra de repaso")
+    parser.add_argument('--n-trees', type=int, default=20)
+    parser.add_argument('--replay-per-class', type=int, default=200)
+    args = parser.parse_args()
+
+    new_data = load_labeled_data(args.new_data)
+    print(f" Datos nuevos: {len(new_data):,} filas")
+
+    base_data = None
+    if args.base_data and os.path.exists(args.base_data):
+        with open(args.base_data, 'rb') as f:
+            base_data = pickle.load(f)
+
+    trees = update_models(args.binary_model, args.multi_model, new_data, base_data,
+                          n_new_trees=args.n_trees, replay_per_class=args.replay_per_class)
+    print(f"\n Modelos actualizados: {trees}")
+    print(" Los pipelines en ejecución los recargan con MLHandler.check_for_updates()")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import os
+import io
+import json
+import time
+import pickle
+import argparse
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+
+from forest_utils import final_forest, forest_param
+
+
+def model_size_bytes(model) -> int:
+    """Tamaño del modelo serializado con pickle."""
+    buffer = io.BytesIO()
+    pickle.dump(model, buffer)
+    return buffer.tell()
+
+
+def model_latency_ms(model, X: pd.DataFrame, batch_size: int = 1, repeats: int = 20) -> float:
+    """Latencia mediana (ms) de predict_proba para lotes de batch_size filas."""
+    batch = X.iloc[:batch_size]
+    model.predict_proba(batch)  # calentamiento
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(batch)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000)
+
+
+def rank_features(model, mi_ranking_path: Optional[str] = None) -> List[str]:
+    """
+    Ordena las características de mayor a menor importancia.
+    Usa el ranking de información mutua del preprocesado si se proporciona
+    (CSV con columnas 'feature' y 'avg_mi'); si no, la importancia del RandomForest.
+    """
+    forest = final_forest(model)
+    features = list(forest.feature_names_in_)
+
+    if mi_ranking_path:
+        mi = pd.read_csv(mi_ranking_path).set_index('feature')['avg_mi']
+        return sorted(features, key=lambda f: -mi.get(f, 0.0))
+
+    order = np.argsort(forest.feature_importances_)[::-1]
+    return [features[i] for i in order]
+
+
+class ModelCompressor:
+    """
+    Reduce un RandomForest entrenado: elimina características poco importantes,
+    limita profundidad y número de árboles, y reentrena mientras la pérdida de F1
+    respecto al modelo original se mantenga dentro del presupuesto.
+    """
+
+    def __init__(self, model, X_train: pd.DataFrame, y_train, X_test: pd.DataFrame, y_test,
+                 f1_average: str = 'binary', max_f1_loss: float = 0.005,
+                 feature_ranking: Optional[List[str]] = None):
+        """
+        Inicializa el compresor.
+
+        Args:
+            model: RandomForest o Pipeline (SMOTE + RandomForest) entrenado
+            X_train, y_train: Datos de entrenamiento
+            X_test, y_test: Datos de evaluación
+            f1_average: 'binary' para el modelo binario, 'macro' para el multiclase
+            max_f1_loss: Pérdida máxima de F1 admitida (absoluta)
+            feature_ranking: Características ordenadas por importancia
+        """
+        self.model = model
+        self.X_train, self.y_train = X_train, y_train
+        self.X_test, self.y_test = X_test, y_test
+        self.f1_average = f1_average
+        self.max_f1_loss = max_f1_loss
+        self.feature_ranking = feature_ranking or rank_features(model)
+
+        self.baseline_f1 = self._score(model, list(final_forest(model).feature_names_in_))
+        self.trials: List[Dict[str, Any]] = []
+
+    def _score(self, model, features: List[str]) -> float:
+        y_pred = model.predict(self.X_test[features])
+        return float(f1_score(self.y_test, y_pred, average=self.f1_average))
+
+    def _fit(self, features: List[str], n_estimators: int, max_depth: Optional[int]):
+        """Reentrena una copia del modelo con el subconjunto y límites indicados."""
+        candidate = clone(self.model).set_params(**{
+            forest_param(self.model, 'n_estimators'): n_estimators,
+            forest_param(self.model, 'max_depth'): max_depth
+        })
+        candidate.fit(self.X_train[features], self.y_train)
+        return candidate
+
+    def _try(self, features: List[str], n_estimators: int, max_depth: Optional[int]):
+        """Entrena y evalúa un candidato; devuelve el modelo si cumple el presupuesto."""
+        candidate = self._fit(features, n_estimators, max_depth)
+        f1 = self._score(candidate, features)
+        within_budget = self.baseline_f1 - f1 <= self.max_f1_loss
+        self.trials.append({'n_features': len(features), 'n_estimators': n_estimators,
+                            'max_depth': max_depth, 'f1': f1, 'within_budget': within_budget})
+        print(f"  {len(features):2d} características, {n_estimators:3d} árboles, "
+              f"profundidad {max_depth}: F1={f1:.4f} {'✓' if within_budget else '✗'}")
+        return candidate if within_budget else None
+
+    def compress(self, feature_counts: Optional[List[int]] = None,
+                 tree_counts: Optional[List[int]] = None,
+                 depth_caps: Optional[List[Optional[int]]] = None):
+        """
+        Búsqueda voraz: primero el menor número de características, después el menor
+        número de árboles y por último la menor profundidad que cumplen el presupuesto.
+
+        Returns:
+            (modelo comprimido, lista de características)
+        """
+        forest = final_forest(self.model)
+        n_estimators = forest.n_estimators
+        max_depth = forest.max_depth
+        n_all = len(self.feature_ranking)
+
+        feature_counts = sorted({k for k in (feature_counts or [n_all, 15, 12, 10, 8, 6, 4]) if 0 < k <= n_all},
+                                reverse=True)
+        tree_counts = [t for t in (tree_counts or [100, 50, 25]) if t < n_estimators]
+        depth_caps = [d for d in (depth_caps or [30, 20, 15, 10])
+                      if max_depth is None or d < max_depth]
+
+        print(f" F1 original: {self.baseline_f1:.4f} (presupuesto de pérdida: {self.max_f1_loss})")
+
+        best_model, best_features = None, None
+        for k in feature_counts:
+            features = self.feature_ranking[:k]
+            candidate = self._try(features, n_estimators, max_depth)
+            if candidate is None:
+                break
+            best_model, best_features = candidate, features
+
+        if best_model is None:
+            print(" Ninguna reducción de características cumple el presupuesto")
+            return self.model, list(forest.feature_names_in_)
+
+        for trees in tree_counts:
+            candidate = self._try(best_features, trees, max_depth)
+            if candidate is None:
+                break
+            best_model, n_estimators = candidate, trees
+
+        for depth in depth_caps:
+            candidate = self._try(best_features, n_estimators, depth)
+            if candidate is None:
+                break
+            best_model, max_depth = candidate, depth
+
+        return best_model, best_features
+
+    def report(self, compressed_model, features: List[str]) -> Dict[str, Any]:
+        """Compara tamaño, latencia y F1 del modelo original y del comprimido."""
+        original_features = list(final_forest(self.model).feature_names_in_)
+        original = {
+            'n_features': len(original_features),
+            'n_estimators': final_forest(self.model).n_estimators,
+            'max_depth': final_forest(self.model).max_depth,
+            'f1': self.baseline_f1,
+            'size_bytes': model_size_bytes(self.model),
+            'latency_1_ms': model_latency_ms(self.model, self.X_test[original_features], 1),
+            'latency_1000_ms': model_latency_ms(self.model, self.X_test[original_features], 1000, repeats=5)
+        }
+        compressed = {
+            'n_features': len(features),
+            'features': features,
+            'n_estimators': final_forest(compressed_model).n_estimators,
+            'max_depth': final_forest(compressed_model).max_depth,
+            'f1': self._score(compressed_model, features),
+            'size_bytes': model_size_bytes(compressed_model),
+            'latency_1_ms': model_latency_ms(compressed_model, self.X_test[features], 1),
+            'latency_1000_ms': model_latency_ms(compressed_model, self.X_test[features], 1000, repeats=5)
+        }
+        return {
+            'original': original,
+            'compressed': compressed,
+            'size_reduction': 1 - compressed['size_bytes'] / original['size_bytes'],
+            'latency_speedup_1000': original['latency_1000_ms'] / max(compressed['latency_1000_ms'], 1e-9),
+            'f1_loss': original['f1'] - compressed['f1'],
+            'trials': self.trials
+        }
+
+
+def main():
+    """Comprime los RandomForest desplegados dentro de un presupuesto de pérdida de F1."""
+    parser = argparse.ArgumentParser(description="Poda de características, árboles y profundidad de los RandomForest")
+    parser.add_argument('--data', default="./data/train_test_data.pkl")
+    parser.add_argument('--binary-model', default="./models/modelo_RandomForest.pkl")
+    parser.add_argument('--multi-model', default="./models/modelo_RandomForest_multi.pkl")
+    parser.add_argument('--mi-ranking', default=None, help="CSV con columnas feature, avg_mi")
+    parser.add_argument('--max-f1-loss', type=float, default=0.005)
+    args = parser.parse_args()
+
+    with open(args.data, 'rb') as f:
+        data = pickle.load(f)
+
+    targets = [
+        (args.binary_model, data['y_train_bin'], data['y_test_bin'], 'binary'),
+        (args.multi_model, data['y_train_multi'], data['y_test_multi'], 'macro')
+    ]
+
+    for model_path, y_train, y_test, average in targets:
+        if not os.path.exists(model_path):
+            print(f" Modelo no encontrado: {model_path}")
+            continue
+
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+
+        print(f"\n Comprimiendo {model_path}...")
+        compressor = ModelCompressor(
+            model, data['X_train_original'], y_train, data['X_test_original'], y_test,
+            f1_average=average, max_f1_loss=args.max_f1_loss,
+            feature_ranking=rank_features(model, args.mi_ranking)
+        )
+        compressed_model, features = compressor.compress()
+        report = compressor.report(compressed_model, features)
+
+        output_path = model_path.replace('.pkl', '_compacto.pkl')
+        with open(output_path, 'wb') as f:
+            pickle.dump(compressed_model, f)
+        with open(output_path.replace('.pkl', '_informe.json'), 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+
+        print(f" Modelo compacto guardado: {output_path}")
+        print(f"  - Características: {report['original']['n_features']} → {report['compressed']['n_features']}")
+        print(f"  - Tamaño: {report['original']['size_bytes'] / 1e6:.2f} MB → "
+              f"{report['compressed']['size_bytes'] / 1e6:.2f} MB ({report['size_reduction'] * 100:.1f}% menos)")
+        print(f"  - Latencia (1000 filas): {report['original']['latency_1000_ms']:.2f} ms → "
+              f"{report['compressed']['latency_1000_ms']:.2f} ms (x{report['latency_speedup_1000']:.2f})")
+        print(f"  - Pérdida de F1: {report['f1_loss']:.4f}")
+
+
+if __name__ == "__main__":
+    main()